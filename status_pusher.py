@@ -7,22 +7,73 @@ a log file in a repo, and push the changeset upstream to a repo checked by a Fet
 """
 
 # standard imports
+from array import array
+import bisect
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import codecs
+import contextlib
+import csv
+import dataclasses
 import datetime
 from enum import Enum
+import fcntl
+from fnmatch import fnmatchcase
+import hashlib
+import heapq
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
 import operator
 import os
 from pathlib import PosixPath
 import pprint
-from typing import Tuple, Optional
+import random
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from urllib.parse import quote, unquote, urlsplit
+import uuid
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Optional,
+    Union,
+)
 
 # 3rd party imports
 import requests
+from pydantic import ConfigDict, TypeAdapter, ValidationError
 from pydantic.dataclasses import dataclass
 import click
 import git
 
 from loguru import logger
-from prometheus_api_client import PrometheusConnect
+from prometheus_api_client import PrometheusApiClientException, PrometheusConnect
+from urllib3.util import Retry
+
+try:
+    # dulwich is only required for the in-process `--git-backend dulwich`
+    from dulwich import porcelain as dulwich_porcelain
+    from dulwich.graph import can_fast_forward
+    from dulwich.repo import Repo as DulwichRepo
+except ImportError:
+    dulwich_porcelain = None
+
+try:
+    # boto3 is only required for the `--s3-url` output sink
+    import boto3
+except ImportError:
+    boto3 = None
 
 
 class Status(Enum):
@@ -49,7 +100,8 @@ class ConditionComparitor(Enum):
     gte = operator.ge
 
 
-@dataclass
+# store statuses as their string values, as the rest of status_pusher expects
+@dataclass(config=ConfigDict(use_enum_values=True))
 class StatusRecord:
     """
     Status record consisting of a value, an epoch timestamp and a status enum.
@@ -62,17 +114,163 @@ class StatusRecord:
     """
 
     value: Optional[float] = None
-    epoch_ts: datetime.datetime = datetime.datetime.now().astimezone().timestamp()
+    # default to the time the record is created, not the time this module was imported
+    epoch_ts: float = dataclasses.field(
+        default_factory=lambda: datetime.datetime.now().astimezone().timestamp()
+    )
     status: Status = Status.UNKNOWN.value
 
 
-def git_clone(git_url: str, git_branch: str, git_dir, depth=10) -> git.Repo:
-    """create the local git clone"""
-    if git_branch != "main":
-        raise NotImplementedError(
-            "git_clone method currently always uses the default branch"
+class CompactStatusRecord:
+    """
+    Lightweight unvalidated counterpart of StatusRecord for high volume paths, eg as yielded
+    by StatusRecordBatch. Uses __slots__, so it carries no per-instance __dict__.
+    """
+
+    __slots__ = ("value", "epoch_ts", "status")
+
+    def __init__(
+        self,
+        value: Optional[float] = None,
+        epoch_ts: Optional[float] = None,
+        status: str = Status.UNKNOWN.value,
+    ):
+        self.value = value
+        self.epoch_ts = (
+            datetime.datetime.now().astimezone().timestamp()
+            if epoch_ts is None
+            else epoch_ts
+        )
+        self.status = status
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (CompactStatusRecord, StatusRecord)):
+            return NotImplemented
+        return (self.value, self.epoch_ts, self.status) == (
+            other.value,
+            other.epoch_ts,
+            other.status,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"CompactStatusRecord(value={self.value!r}, epoch_ts={self.epoch_ts!r}, "
+            f"status={self.status!r})"
+        )
+
+
+# positions of each status in StatusRecordBatch's status code array
+_STATUS_CODES = {status.value: code for code, status in enumerate(Status)}
+_STATUS_VALUES = [status.value for status in Status]
+
+# validator for (value, epoch_ts, status) rows entering a StatusRecordBatch
+_status_rows_adapter = TypeAdapter(List[Tuple[Optional[float], float, Status]])
+
+
+class StatusRecordBatch:
+    """
+    Column oriented container of many status records, backed by typed arrays: a double per
+    value (NaN for no value), a double per epoch timestamp and a byte per status.
+
+    Rows are validated once, in bulk, when they enter the batch via from_rows or extend.
+    append_unchecked skips validation for callers that produced the values themselves,
+    eg from an already validated query response.
+    """
+
+    __slots__ = ("values", "epoch_ts", "status_codes")
+
+    def __init__(self):
+        self.values = array("d")
+        self.epoch_ts = array("d")
+        self.status_codes = array("B")
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Tuple[Optional[float], float, str]]
+    ) -> "StatusRecordBatch":
+        """build a batch from validated (value, epoch_ts, status) rows"""
+        batch = cls()
+        batch.extend(rows)
+        return batch
+
+    def extend(self, rows: Iterable[Tuple[Optional[float], float, str]]):
+        """validate (value, epoch_ts, status) rows in one pass and append them"""
+        for value, epoch_ts, status in _status_rows_adapter.validate_python(list(rows)):
+            self.append_unchecked(value, epoch_ts, status.value)
+
+    def append_unchecked(self, value: Optional[float], epoch_ts: float, status: str):
+        """append a single record without validation"""
+        self.values.append(float("nan") if value is None else value)
+        self.epoch_ts.append(epoch_ts)
+        self.status_codes.append(_STATUS_CODES[status])
+
+    def __len__(self) -> int:
+        return len(self.epoch_ts)
+
+    def __getitem__(self, i: int) -> CompactStatusRecord:
+        value = self.values[i]
+        return CompactStatusRecord(
+            None if value != value else value,  # NaN is the only value != itself
+            self.epoch_ts[i],
+            _STATUS_VALUES[self.status_codes[i]],
         )
 
+    def __iter__(self) -> Iterator[CompactStatusRecord]:
+        return (self[i] for i in range(len(self)))
+
+
+def _committer_environment(git_repo: git.Repo):
+    """
+    context manager setting the committer identity for git commands to the one GitPython
+    uses for its own commits, since eg `git pull --rebase` fails in environments without
+    a configured git identity, such as our container image
+    """
+    committer = git.Actor.committer(git_repo.config_reader())
+    return git_repo.git.custom_environment(
+        GIT_COMMITTER_NAME=committer.name, GIT_COMMITTER_EMAIL=committer.email
+    )
+
+
+def _checkout_branch(git_repo: git.Repo, git_branch: str):
+    """
+    check out git_branch, tracking the branch of the same name on origin if there is one,
+    or else as a new branch from the current HEAD, to be created on origin by the first push
+    """
+    if not git_repo.head.is_detached and git_repo.active_branch.name == git_branch:
+        return
+    remote_ref = f"origin/{git_branch}"
+    if git_branch in git_repo.heads:
+        git_repo.heads[git_branch].checkout()
+    elif remote_ref in {ref.name for ref in git_repo.remotes.origin.refs}:
+        git_repo.git.checkout("-b", git_branch, "--track", remote_ref)
+    else:
+        logger.info(f"branch {git_branch} not found on origin, creating it")
+        git_repo.git.checkout("-b", git_branch)
+
+
+def _pull_branch(git_repo: git.Repo, git_branch: str, **pull_kwargs):
+    """
+    pull git_branch from origin into the checked out branch, rebasing rather than merging,
+    so that if the remote history has been rewritten by `squash`, only our own unpushed
+    commits are replayed on top of it. Does nothing while the branch does not exist on
+    origin yet.
+    """
+    branch = git_repo.active_branch
+    if branch.tracking_branch() is None and not git_repo.git.ls_remote(
+        "--heads", "origin", git_branch
+    ):
+        logger.debug(f"branch {git_branch} does not exist on origin yet")
+        return
+
+    origin = git_repo.remotes.origin
+    with _committer_environment(git_repo):
+        origin.pull(git_branch, rebase=True, **pull_kwargs)
+    if branch.tracking_branch() is None:
+        branch.set_tracking_branch(origin.refs[git_branch])
+
+
+def git_clone(git_url: str, git_branch: str, git_dir, depth=10) -> git.Repo:
+    """create the local git clone, or update an existing one, with git_branch checked out"""
     if os.path.isdir(git_dir):
         # Pull to be sure we're up to date
         logger.debug(f"found existing directory {git_dir}")
@@ -87,29 +285,17 @@ def git_clone(git_url: str, git_branch: str, git_dir, depth=10) -> git.Repo:
         origin_urls = list(git_repo.remotes.origin.urls)
         logger.debug(f"{origin} has urls {origin_urls}")
 
-        logger.debug(f"pulling from origin {origin} with depth {depth}")
+        # an existing clone may have a different branch checked out
+        _checkout_branch(git_repo, git_branch)
 
-        # TODO
-        # - implement git_branch option
-        # - handle branch that doesn't exist yet on remote
-        # - we need to handle the case that an existing dir has a different branch checked
-        #   out - ie, always do a checkout of the specified branch.
-        # - we should separate the pull/checkout logic from the git_clone function for clarity
-        #   as git clone normally doesn't do either for an existing local repo
-        origin.pull(depth=depth)
+        logger.debug(f"pulling {git_branch} from origin {origin} with depth {depth}")
+        _pull_branch(git_repo, git_branch, depth=depth)
 
         git_repo = git.Repo(git_dir)
     else:
         git_repo = git.Repo.clone_from(git_url, git_dir)
+        _checkout_branch(git_repo, git_branch)
 
-    # check out branch
-    # TODO handle branch that doesn't exist yet on remote
-    #  gitcmd=git_repo.git
-    #  if not hasattr(git_repo.branches, git_branch):
-    #    gitcmd.checkout('-b', git_branch)
-    #  else:
-    #    gitcmd.checkout(git_branch)
-    #
     return git_repo
 
 
@@ -119,40 +305,270 @@ def epoch_to_zulu(ts: float) -> str:
     return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
+def format_log_line(timestamp: float, value: float, state: str) -> str:
+    """format a measurement as a status log line, without trailing newline"""
+    return f"{epoch_to_zulu(timestamp)}, {state}, {value}"
+
+
 def update_log_file(
     filepath: PosixPath, timestamp: float, value: float, state: str
 ) -> bool:
     """append measurement to the text file"""
-    line = f"{epoch_to_zulu(timestamp)}, {state}, {value}"
+    line = format_log_line(timestamp, value, state)
     logger.debug(f"appending to {filepath}: {line}")
     with filepath.open(mode="a+") as report:
         report.write(line + "\n")
     return True
 
 
+def parse_log_line(line: str) -> Tuple[float, str, Optional[float]]:
+    """
+    Parse a status log line as written by update_log_file into (epoch_ts, state, value).
+    A value logged as `None` is returned as None.
+    """
+    zulu, state, value = (field.strip() for field in line.split(",", 2))
+    epoch_ts = (
+        datetime.datetime.strptime(zulu, "%Y-%m-%dT%H:%M:%SZ")
+        .replace(tzinfo=datetime.timezone.utc)
+        .timestamp()
+    )
+    return (epoch_ts, state, None if value == "None" else float(value))
+
+
+# number of most recent days kept in a summary file; matches Fettle's 90 day bars
+SUMMARY_DAYS = 90
+
+
+def summary_file_path(filepath: PosixPath) -> PosixPath:
+    """
+    Path of the per-day summary companion file for a status log,
+    eg public/status/report.log -> public/status/report.summary.json
+    """
+    return filepath.with_suffix(".summary.json")
+
+
+# monthly partitions of a status log, eg report.2026-10.log for report.log
+_PARTITION_NAME = re.compile(
+    r"^(?P<stem>.+)\.(?P<month>\d{4}-\d{2})(?P<suffix>\.[^.]*)?$"
+)
+
+
+def partition_file_path(filepath: PosixPath, timestamp: float) -> PosixPath:
+    """
+    Path of the monthly partition of a status log holding a measurement at timestamp,
+    eg public/status/report.log -> public/status/report.2026-10.log
+    """
+    month = epoch_to_zulu(timestamp)[:7]
+    return filepath.with_name(f"{filepath.stem}.{month}{filepath.suffix}")
+
+
+def partitioned_log_path(partition: PosixPath) -> Optional[PosixPath]:
+    """the status log a monthly partition belongs to, or None if it is not a partition"""
+    match = _PARTITION_NAME.match(partition.name)
+    if not match:
+        return None
+    return partition.with_name(match["stem"] + (match["suffix"] or ""))
+
+
+def log_partitions(filepath: PosixPath) -> List[PosixPath]:
+    """the monthly partitions of the status log at filepath, oldest first"""
+    if not filepath.parent.is_dir():
+        return []
+    # partition names sort chronologically
+    return sorted(
+        path
+        for path in filepath.parent.iterdir()
+        if partitioned_log_path(path) == filepath
+    )
+
+
+def manifest_file_path(filepath: PosixPath) -> PosixPath:
+    """
+    Path of the manifest listing the partitions of a status log,
+    eg public/status/report.log -> public/status/report.manifest.json
+    """
+    return filepath.with_suffix(".manifest.json")
+
+
+def update_manifest_file(filepath: PosixPath) -> PosixPath:
+    """
+    Write the manifest of the partitions of the status log at filepath, returning the
+    manifest path. Any unpartitioned log written before partitioning was enabled is listed
+    first, without a month. The manifest is only rewritten when a partition is added.
+    """
+    partitions = [
+        {"month": _PARTITION_NAME.match(path.name)["month"], "path": path.name}
+        for path in log_partitions(filepath)
+    ]
+    if filepath.exists():
+        partitions.insert(0, {"month": None, "path": filepath.name})
+    manifest = json.dumps({"partitions": partitions}, indent=1, sort_keys=True)
+
+    manifest_path = manifest_file_path(filepath)
+    if not manifest_path.exists() or manifest_path.read_text() != manifest:
+        logger.debug(f"writing manifest file {manifest_path}")
+        manifest_path.write_text(manifest)
+    return manifest_path
+
+
+def _summary_add(summary: dict, timestamp: float, value: float, state: str) -> dict:
+    """add a single measurement to a summary dict, in place"""
+    day = epoch_to_zulu(timestamp)[:10]
+    counts = summary["days"].setdefault(
+        day, {status.value: 0 for status in Status} | {"uptime": 0.0}
+    )
+    counts[state if state in counts else Status.UNKNOWN.value] += 1
+    total = sum(counts[status.value] for status in Status)
+    counts["uptime"] = round(100.0 * counts[Status.SUCCESS.value] / total, 2)
+
+    if timestamp >= summary.get("last_epoch_ts", float("-inf")):
+        summary["last_epoch_ts"] = timestamp
+        summary["last_status"] = state
+        summary["last_value"] = value
+
+    # drop days that have fallen out of the window; keys are ISO dates so they sort
+    # chronologically, and there are at most SUMMARY_DAYS + 1 of them
+    for stale_day in sorted(summary["days"])[:-SUMMARY_DAYS]:
+        del summary["days"][stale_day]
+
+    return summary
+
+
+def build_summary(log_filepath: PosixPath) -> dict:
+    """
+    build a summary dict from scratch by reading a complete status log, including any
+    monthly partitions of it
+    """
+    summary = {"days": {}}
+    for path in [log_filepath] + log_partitions(log_filepath):
+        if path.exists():
+            with path.open() as log:
+                for line in log:
+                    if line.strip():
+                        epoch_ts, state, value = parse_log_line(line)
+                        _summary_add(summary, epoch_ts, value, state)
+    return summary
+
+
+def update_summary_file(
+    filepath: PosixPath, timestamp: float, value: float, state: str
+) -> PosixPath:
+    """
+    Update the per-day summary companion of the status log at filepath with a measurement,
+    returning the summary file path.
+
+    The summary holds per-day counts of each status, uptime percent and the last status, so
+    Fettle can render its daily bars without downloading the full log. Updating it only reads
+    and rewrites the bounded summary, not the log. It must be called after the measurement
+    has been appended to the log: if no summary exists yet it is built from the whole log,
+    which then already contains the new measurement.
+    """
+    summary_path = summary_file_path(filepath)
+    if summary_path.exists():
+        with summary_path.open() as f:
+            summary = _summary_add(json.load(f), timestamp, value, state)
+    else:
+        logger.debug(f"no summary file at {summary_path}; building from {filepath}")
+        summary = build_summary(filepath)
+
+    logger.debug(f"writing summary file {summary_path}")
+    with summary_path.open(mode="w") as f:
+        json.dump(summary, f, indent=1, sort_keys=True)
+    return summary_path
+
+
+def rebuild_summary_file(filepath: PosixPath) -> PosixPath:
+    """rebuild the summary companion of the status log at filepath from the whole log"""
+    summary_path = summary_file_path(filepath)
+    logger.debug(f"rebuilding summary file {summary_path} from {filepath}")
+    with summary_path.open(mode="w") as f:
+        json.dump(build_summary(filepath), f, indent=1, sort_keys=True)
+    return summary_path
+
+
+def read_log_records(filepath: PosixPath) -> StatusRecordBatch:
+    """read every record of the status log at filepath"""
+    with filepath.open() as log:
+        return StatusRecordBatch.from_rows(
+            (value, epoch_ts, state)
+            for epoch_ts, state, value in map(parse_log_line, log)
+        )
+
+
+def partition_records(
+    filepath: PosixPath, records: StatusRecordBatch
+) -> Dict[PosixPath, StatusRecordBatch]:
+    """split records by the monthly partition of the status log at filepath they belong in"""
+    partitions = {}
+    for record in records:
+        partitions.setdefault(
+            partition_file_path(filepath, record.epoch_ts), StatusRecordBatch()
+        ).append_unchecked(record.value, record.epoch_ts, record.status)
+    return partitions
+
+
+def merge_log_records(filepath: PosixPath, records: StatusRecordBatch) -> int:
+    """
+    Merge records into the status log at filepath, inserting each new line before the
+    first existing line with a later timestamp. Existing lines are kept as they are, and
+    records with the same timestamp as an existing line are dropped, so merging the same
+    records twice is harmless; the file is only written if records are added. Returns the
+    number of records added.
+    """
+    lines = []
+    if filepath.exists():
+        with filepath.open() as log:
+            lines = log.readlines()
+    line_ts = [parse_log_line(line)[0] if line.strip() else None for line in lines]
+    existing_ts = set(line_ts)
+
+    new = sorted(
+        (
+            (
+                record.epoch_ts,
+                format_log_line(record.epoch_ts, record.value, record.status),
+            )
+            for record in records
+            if record.epoch_ts not in existing_ts
+        ),
+        key=operator.itemgetter(0),
+    )
+    logger.debug(f"merging {len(new)} new records into {len(lines)} in {filepath}")
+    if not new:
+        return 0
+
+    merged = []
+    pending = deque(new)
+    for line, epoch_ts in zip(lines, line_ts):
+        while pending and epoch_ts is not None and pending[0][0] < epoch_ts:
+            merged.append(pending.popleft()[1] + "\n")
+        merged.append(line if line.endswith("\n") else line + "\n")
+    merged.extend(line + "\n" for _epoch_ts, line in pending)
+    with filepath.open(mode="w") as log:
+        log.writelines(merged)
+    return len(new)
+
+
 def commit(
     git_repo: git.Repo,
     git_branch: str,
-    filepath: str,
+    filepath: Union[str, List[str]],
     commit_message="[automated] update health report",
 ) -> git.objects.commit.Commit:
-    """commit and push changes to git"""
-    # TODO check out desired branch prior to committing
-    if git_branch != "main":
-        raise NotImplementedError(
-            "commit method currently always uses the default branch"
-        )
+    """commit and push changes to git; filepath may be a single path or a list of paths"""
+    _checkout_branch(git_repo, git_branch)
 
-    logger.debug(f"committing updates to {filepath}")
+    filepaths = filepath if isinstance(filepath, list) else [filepath]
+    logger.debug(f"committing updates to {filepaths}")
     index = git_repo.index
-    index.add([filepath])
+    index.add(filepaths)
     return index.commit(commit_message)
 
 
 def push(git_repo: git.Repo, git_branch: str, git_push_url) -> git.remote.PushInfo:
     """
-    Pull from remote, then push changes in a local git repo to remote.
-    NOTE: git_branch is NOT implemented, and the current local branch will always be used.
+    Pull git_branch from remote, then push it from a local git repo to git_push_url,
+    creating the branch there if need be.
     """
     # we can just use the gitcmd (git_repo.git) directly for everything if we want, if it's easier,
     # but we must do so for things that aren't wrapped
@@ -163,36 +579,639 @@ def push(git_repo: git.Repo, git_branch: str, git_push_url) -> git.remote.PushIn
     origin = git_repo.remotes.origin
 
     # TODO
-    # - check out desired branch prior to pushing
-    #  - set up remote tracking branch if it doesn't already exist
     # - retry if fails eg due to race condition push interleaved from another checker instance
-    if git_branch != "main":
-        raise NotImplementedError(
-            "commit method currently always uses the default branch"
-        )
+    _checkout_branch(git_repo, git_branch)
     push_origin = git_repo.remotes.push_origin
 
     # always pull before push
     origin_urls = list(git_repo.remotes.origin.urls)
     logger.debug(f"{origin} has urls {origin_urls}")
 
-    logger.debug(f"pulling from origin {origin}")
-    _pull_res: git.remote.FetchInfo = origin.pull()
+    logger.debug(f"pulling {git_branch} from origin {origin}")
+    _pull_branch(git_repo, git_branch)
 
     push_origin_urls = list(git_repo.remotes.origin.urls)
     logger.debug(f"{push_origin} has urls {push_origin_urls}")
 
     logger.debug("pushing to push_origin <REDACTED URL CONTAINING TOKEN>")
-    push_res: git.remote.PushInfo = push_origin.push()
+    push_res: git.remote.PushInfo = push_origin.push(f"HEAD:refs/heads/{git_branch}")
 
     return push_res
 
 
-def prometheus_query(query: str, prometheus_url: str) -> Tuple[float, float]:
+# commit message prefix of commits made by status_pusher, which `squash` may combine
+AUTOMATED_COMMIT_PREFIX = "[automated]"
+
+
+def _is_squashable(commit: git.Commit, cutoff_ts: float) -> bool:
+    """
+    whether a commit older than cutoff_ts may be squashed: it is either an automated
+    status_pusher commit, or a merge commit created by pulling (which carries no content of
+    its own) that only merges in automated commits of other checkers. Any other merge,
+    such as that of a pull request, is kept along with the commits it merges.
+    """
+    if commit.committed_date >= cutoff_ts:
+        return False
+    if commit.message.startswith(AUTOMATED_COMMIT_PREFIX):
+        return True
+    if len(commit.parents) < 2 or not commit.message.startswith("Merge "):
+        return False
+    # every commit merged in, not only the side parents themselves
+    first_parent = commit.parents[0].hexsha
+    return all(
+        merged.message.startswith(AUTOMATED_COMMIT_PREFIX)
+        or (len(merged.parents) > 1 and merged.message.startswith("Merge "))
+        for side_parent in commit.parents[1:]
+        for merged in commit.repo.iter_commits(f"{first_parent}..{side_parent.hexsha}")
+    )
+
+
+def is_shallow(git_repo: git.Repo) -> bool:
+    """whether git_repo is a shallow clone, as left by pulling with a depth"""
+    return git_repo.git.rev_parse("--is-shallow-repository") == "true"
+
+
+def squash_history(
+    git_repo: git.Repo, rev: str, cutoff: datetime.datetime
+) -> Optional[git.Commit]:
+    """
+    Rewrite the first-parent history of rev so that runs of automated commits older than
+    cutoff are combined into a single commit per UTC day, each with the tree of the last
+    commit it replaces, so every file ends each day with the same content as before.
+    Other commits are kept, with the same tree, message, author and dates, on top of the
+    rewritten history. No refs are changed; returns the new head commit, or None if
+    there is nothing to squash.
+    Raises ValueError for a shallow clone, as its oldest commit would become a new root
+    commit, dropping all history before it.
+    """
+    if is_shallow(git_repo):
+        raise ValueError("cannot squash the history of a shallow clone")
+    cutoff_ts = cutoff.timestamp()
+    commits = list(git_repo.iter_commits(rev, first_parent=True))[::-1]
+
+    # runs of squashable commits from the same day, and single unsquashable commits
+    units: List[List[git.Commit]] = []
+    for commit in commits:
+        day = epoch_to_zulu(commit.committed_date)[:10]
+        if (
+            units
+            and _is_squashable(commit, cutoff_ts)
+            and _is_squashable(units[-1][-1], cutoff_ts)
+            and epoch_to_zulu(units[-1][-1].committed_date)[:10] == day
+        ):
+            units[-1].append(commit)
+        else:
+            units.append([commit])
+
+    first_squash = next((i for i, unit in enumerate(units) if len(unit) > 1), None)
+    if first_squash is None:
+        logger.info(f"no automated commits before {cutoff} to squash")
+        return None
+
+    # history before the first squashed day is unchanged
+    head = units[first_squash - 1][-1] if first_squash else None
+    for unit in units[first_squash:]:
+        last = unit[-1]
+        if len(unit) > 1:
+            day = epoch_to_zulu(last.committed_date)[:10]
+            message = (
+                f"{AUTOMATED_COMMIT_PREFIX} squash {len(unit)} health report updates "
+                f"from {day}"
+            )
+            side_parents = []
+        else:
+            message = last.message
+            side_parents = list(last.parents[1:])
+        head = git.Commit.create_from_tree(
+            git_repo,
+            last.tree,
+            message,
+            parent_commits=([head] if head else []) + side_parents,
+            author=last.author,
+            committer=last.committer,
+            author_date=last.authored_datetime,
+            commit_date=last.committed_datetime,
+        )
+
+    logger.info(
+        f"squashed history of {len(commits)} commits to {len(units)} commits, "
+        f"new head {head.hexsha}"
+    )
+    return head
+
+
+class GitBackend:
+    """
+    Interface for the git operations status_pusher performs on the status repo: clone (or
+    update) the local repo, commit files, and push to a remote.
+    Implementations are registered in GIT_BACKENDS and selected with --git-backend.
+    """
+
+    name: str = None
+
+    def clone(self, git_url: str, git_branch: str, git_dir: str, depth=10):
+        """create or update the local clone of git_url in git_dir"""
+        raise NotImplementedError
+
+    def commit(
+        self,
+        filepaths: List[str],
+        commit_message="[automated] update health report",
+    ) -> str:
+        """commit filepaths to the local clone, returning the commit sha"""
+        raise NotImplementedError
+
+    def push(self, git_push_url: str):
+        """pull from origin, then push the local clone to git_push_url"""
+        raise NotImplementedError
+
+    def close(self):
+        """release the resources held by the local clone, eg open pack files"""
+
+
+class GitPythonBackend(GitBackend):
+    """GitBackend using GitPython, which runs the git executable in a subprocess"""
+
+    name = "gitpython"
+
+    def __init__(self):
+        self.git_repo: git.Repo = None
+        self.git_branch: str = None
+
+    def clone(self, git_url: str, git_branch: str, git_dir: str, depth=10) -> git.Repo:
+        self.git_branch = git_branch
+        self.git_repo = git_clone(git_url, git_branch, git_dir, depth=depth)
+        return self.git_repo
+
+    def commit(
+        self,
+        filepaths: List[str],
+        commit_message="[automated] update health report",
+    ) -> str:
+        return commit(
+            self.git_repo, self.git_branch, list(filepaths), commit_message
+        ).hexsha
+
+    def push(self, git_push_url: str) -> git.remote.PushInfo:
+        return push(self.git_repo, self.git_branch, git_push_url)
+
+    def close(self):
+        if self.git_repo is not None:
+            self.git_repo.close()
+
+
+class DulwichBackend(GitBackend):
+    """
+    GitBackend using dulwich, a pure python git implementation, so that clone, fetch,
+    commit and push run in-process rather than forking git subprocesses. Requires the
+    optional dulwich package.
+    """
+
+    name = "dulwich"
+
+    def __init__(self):
+        if dulwich_porcelain is None:
+            raise click.UsageError(
+                "the dulwich package is required for --git-backend dulwich"
+            )
+        self.repo: DulwichRepo = None
+        self.git_url: str = None
+        self.git_branch: str = None
+
+    def _run(self, porcelain_func, *args, **kwargs):
+        """call a dulwich porcelain function, logging its output instead of printing it"""
+        outstream, errstream = io.BytesIO(), io.BytesIO()
+        res = porcelain_func(*args, outstream=outstream, errstream=errstream, **kwargs)
+        for stream in (outstream, errstream):
+            if stream.getvalue():
+                logger.debug(stream.getvalue().decode(errors="replace"))
+        return res
+
+    def _pull(self, git_url: str):
+        """
+        pull from git_url, merging if histories have diverged, like `git pull`.
+        If the remote history has been rewritten (eg by `squash`) since we last fetched,
+        our own commits since then are instead rebased onto it, like `git pull --rebase`,
+        so the old history is not merged back in.
+        """
+        tracking_ref = f"refs/remotes/origin/{self.git_branch}".encode()
+        old_remote = (
+            self.repo.refs[tracking_ref] if tracking_ref in self.repo.refs else None
+        )
+
+        logger.debug(f"fetching from {git_url}")
+        dulwich_porcelain.fetch(
+            self.repo, "origin", outstream=io.StringIO(), errstream=io.BytesIO()
+        )
+        if tracking_ref not in self.repo.refs:
+            logger.debug(f"branch {self.git_branch} does not exist on origin yet")
+            return
+        new_remote = self.repo.refs[tracking_ref]
+
+        if old_remote not in (None, new_remote) and not can_fast_forward(
+            self.repo, old_remote, new_remote
+        ):
+            logger.info("remote history was rewritten; rebasing local commits onto it")
+            dulwich_porcelain.rebase(self.repo, upstream=old_remote, onto=new_remote)
+        else:
+            _merge_sha, conflicts = dulwich_porcelain.merge(self.repo, new_remote)
+            if conflicts:
+                raise RuntimeError(f"conflicts merging from {git_url}: {conflicts}")
+
+    def clone(
+        self, git_url: str, git_branch: str, git_dir: str, depth=10
+    ) -> DulwichRepo:
+        self.git_url = git_url
+        self.git_branch = git_branch
+
+        if os.path.isdir(git_dir):
+            logger.debug(f"found existing directory {git_dir}")
+            self.repo = DulwichRepo(git_dir)
+            self._checkout_branch()
+            logger.debug(f"pulling {git_branch} from {git_url}")
+            self._pull(git_url)
+        else:
+            logger.debug(f"cloning {git_url} to {git_dir}")
+            # dulwich's clone does not accept an outstream
+            self.repo = dulwich_porcelain.clone(
+                git_url, git_dir, errstream=io.BytesIO()
+            )
+            self._checkout_branch()
+        return self.repo
+
+    def _checkout_branch(self):
+        """
+        check out git_branch, starting it from origin's branch of the same name if there is
+        one, or else from the current HEAD, to be created on origin by the first push
+        """
+        branch_ref = f"refs/heads/{self.git_branch}".encode()
+        if self.repo.refs.read_ref(b"HEAD") == b"ref: " + branch_ref:
+            return
+        if branch_ref not in self.repo.refs:
+            tracking_ref = f"refs/remotes/origin/{self.git_branch}".encode()
+            if tracking_ref in self.repo.refs:
+                start = self.repo.refs[tracking_ref]
+            else:
+                logger.info(
+                    f"branch {self.git_branch} not found on origin, creating it"
+                )
+                start = self.repo.head()
+            self.repo.refs[branch_ref] = start
+        dulwich_porcelain.checkout(self.repo, self.git_branch)
+
+    def commit(
+        self,
+        filepaths: List[str],
+        commit_message="[automated] update health report",
+    ) -> str:
+        logger.debug(f"committing updates to {filepaths}")
+        # dulwich resolves relative paths against the cwd, so make them absolute
+        dulwich_porcelain.add(
+            self.repo, [str(PosixPath(self.repo.path, path)) for path in filepaths]
+        )
+        return dulwich_porcelain.commit(self.repo, commit_message).decode()
+
+    def push(self, git_push_url: str):
+        logger.debug(f"pulling from origin {self.git_url}")
+        self._pull(self.git_url)
+        logger.debug("pushing to <REDACTED URL CONTAINING TOKEN>")
+        return self._run(
+            dulwich_porcelain.push,
+            self.repo,
+            git_push_url,
+            f"refs/heads/{self.git_branch}".encode(),
+        )
+
+    def close(self):
+        # otherwise its pack files are only closed at interpreter shutdown, noisily
+        if self.repo is not None:
+            self.repo.close()
+            self.repo = None
+
+
+GIT_BACKENDS = {backend.name: backend for backend in (GitPythonBackend, DulwichBackend)}
+
+
+# default (connect, read) timeouts in seconds for metrics backend requests
+DEFAULT_QUERY_TIMEOUT = (5.0, 15.0)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a metrics backend whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single metrics backend URL.
+
+    CLOSED: calls go through, and their outcomes over the last `window` seconds are kept.
+    Once at least `min_calls` outcomes are kept and the fraction of failures reaches
+    `failure_rate`, the breaker OPENs.
+    OPEN: calls fail fast with CircuitOpenError for `reset_timeout` seconds, then the breaker
+    goes HALF_OPEN.
+    HALF_OPEN: a single trial call goes through (others still fail fast); if it succeeds the
+    breaker CLOSEs again, otherwise it re-OPENs.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        url: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 3,
+        window: float = 60.0,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.url = url
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self.state = self.CLOSED
+        self.opened_at: float = None
+        self._trial_in_flight = False
+        # (timestamp, succeeded) outcomes within the window
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, now: float):
+        logger.warning(f"opening circuit breaker for {self.url}")
+        self.state = self.OPEN
+        self.opened_at = now
+
+    def before_call(self):
+        """raise CircuitOpenError if a call to the backend should not be made now"""
+        with self._lock:
+            now = self.clock()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                logger.info(f"circuit breaker for {self.url} half-open, trying a call")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.OPEN or (
+                self.state == self.HALF_OPEN and self._trial_in_flight
+            ):
+                raise CircuitOpenError(f"circuit breaker for {self.url} is open")
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = True
+
+    def record(self, succeeded: bool):
+        """record the outcome of a call to the backend"""
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                if succeeded:
+                    logger.info(f"closing circuit breaker for {self.url}")
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, succeeded))
+            self._expire(now)
+            failures = sum(not ok for _ts, ok in self._outcomes)
+            if (
+                self.state == self.CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open(now)
+
+
+# prometheus_api_client reports any non-200 response only by its message
+_PROMETHEUS_STATUS_CODE = re.compile(r"HTTP Status Code (\d{3})")
+
+
+def _is_backend_failure(exc: Exception) -> bool:
+    """
+    whether an exception from a backend request means the backend is unhealthy, as opposed
+    to eg rejecting a bad query with a 4xx response
+    """
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500
+    if isinstance(exc, FluxQueryError):
+        return False
+    if isinstance(exc, PrometheusApiClientException):
+        match = _PROMETHEUS_STATUS_CODE.search(str(exc))
+        if match:
+            return int(match[1]) >= 500
+    return True
+
+
+class CircuitBreakerRegistry:
+    """The circuit breakers for all backend URLs, shared by every check in the process"""
+
+    def __init__(self, **breaker_kwargs):
+        self.breaker_kwargs = breaker_kwargs
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, **breaker_kwargs):
+        """set the CircuitBreaker parameters, resetting all breakers"""
+        with self._lock:
+            self.breaker_kwargs = breaker_kwargs
+            self.breakers = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        """the circuit breaker for url"""
+        with self._lock:
+            if url not in self.breakers:
+                self.breakers[url] = CircuitBreaker(url, **self.breaker_kwargs)
+            return self.breakers[url]
+
+    @contextlib.contextmanager
+    def guard(self, url: str):
+        """
+        context manager around a request to the backend at url: fails fast with
+        CircuitOpenError if its breaker is open, and records the outcome otherwise
+        """
+        breaker = self.get(url)
+        breaker.before_call()
+        try:
+            yield breaker
+        except Exception as exc:
+            breaker.record(not _is_backend_failure(exc))
+            raise
+        breaker.record(True)
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+T = TypeVar("T")
+
+
+def _percentile(values: Iterable[float], percentile: float) -> Optional[float]:
+    """the nearest-rank percentile of values, or None if there are none"""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[round(percentile / 100 * (len(values) - 1))]
+
+
+class ReplicaSelector:
+    """
+    Tracks recent request latencies of replicated metrics backend URLs, to order replicas
+    fastest first and to decide how long to wait for a replica before hedging a query to
+    another one: the `percentile` of that replica's recent latencies, or `default_delay`
+    seconds until `min_samples` latencies are known.
+    A failed request counts as taking `failure_penalty` seconds, so that failing replicas
+    are ranked last.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        default_delay: float = 1.0,
+        min_samples: int = 5,
+        max_samples: int = 100,
+        failure_penalty: float = DEFAULT_QUERY_TIMEOUT[1],
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.failure_penalty = failure_penalty
+        self.latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, percentile: float = 95.0, default_delay: float = 1.0):
+        """set the hedging policy, keeping latencies observed so far"""
+        self.percentile = percentile
+        self.default_delay = default_delay
+
+    def record(self, url: str, latency: float):
+        """record the latency in seconds of a request to url"""
+        with self._lock:
+            self.latencies.setdefault(url, deque(maxlen=self.max_samples)).append(
+                latency
+            )
+
+    def _quantile(
+        self, url: str, percentile: float, min_samples: int
+    ) -> Optional[float]:
+        with self._lock:
+            samples = list(self.latencies.get(url, ()))
+        if len(samples) < min_samples:
+            return None
+        return _percentile(samples, percentile)
+
+    def rank(self, urls: Sequence[str]) -> List[str]:
+        """
+        urls ordered by median latency, fastest first; replicas without any latency
+        samples yet go first so that they get measured
+        """
+        return sorted(urls, key=lambda url: self._quantile(url, 50, 1) or 0.0)
+
+    def hedge_delay(self, url: str) -> float:
+        """seconds to wait for a request to url before hedging to another replica"""
+        delay = self._quantile(url, self.percentile, self.min_samples)
+        return self.default_delay if delay is None else delay
+
+    def timed(self, query_fn: Callable[[str], T], url: str) -> T:
+        """call query_fn(url), recording its latency, or the failure penalty if it fails"""
+        start = time.monotonic()
+        try:
+            result = query_fn(url)
+        except Exception:
+            self.record(url, self.failure_penalty)
+            raise
+        self.record(url, time.monotonic() - start)
+        return result
+
+
+replica_selector = ReplicaSelector()
+
+
+def hedged_query(
+    query_fn: Callable[[str], T],
+    urls: Sequence[str],
+    selector: ReplicaSelector = None,
+) -> T:
+    """
+    Call query_fn(url) for replicated backend urls, returning the first successful result.
+
+    The fastest known replica is queried first. If it hasn't answered within its hedge
+    delay (a high percentile of its recent latency), the query is also sent to the next
+    replica, and so on; a replica that fails is replaced by the next one straight away.
+    Slower requests still in flight are abandoned, but their latencies are recorded when
+    they finish. Requests run in daemon threads, so abandoned ones don't keep a one-shot
+    process from exiting. If every replica fails, the last exception is raised.
+    """
+    selector = selector or replica_selector
+    remaining = selector.rank(urls)
+    if len(remaining) == 1:
+        return selector.timed(query_fn, remaining[0])
+
+    pending = set()
+    last_exc = None
+
+    def run(future: Future, url: str):
+        try:
+            future.set_result(selector.timed(query_fn, url))
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            future.set_exception(exc)
+
+    def launch() -> str:
+        url = remaining.pop(0)
+        logger.debug(f"sending query to replica {url}")
+        future = Future()
+        # not a ThreadPoolExecutor, as the interpreter waits for its threads at exit
+        threading.Thread(target=run, args=(future, url), daemon=True).start()
+        pending.add(future)
+        return url
+
+    url = launch()
+    while pending:
+        delay = selector.hedge_delay(url) if remaining else None
+        done, _not_done = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            try:
+                return future.result()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                logger.warning(f"replica query failed: {exc!r}")
+                last_exc = exc
+        if remaining:
+            if not done:
+                logger.debug(f"no answer from {url} within {delay:.3f}s, hedging")
+            url = launch()
+    raise last_exc
+
+
+def _prometheus_connect(
+    prometheus_url: str, timeout: Tuple[float, float]
+) -> PrometheusConnect:
+    """
+    a PrometheusConnect client without its default retries, which would retry a failed
+    request several times with backoff, so that the query timeout and the circuit
+    breaker alone govern how long a dead server stalls a check
+    """
+    return PrometheusConnect(
+        url=prometheus_url, disable_ssl=False, retry=Retry(total=0), timeout=timeout
+    )
+
+
+def prometheus_query(
+    query: str,
+    prometheus_url: str,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> Tuple[float, float]:
     """query prometheus using stock libraries"""
     logger.debug(f'querying {prometheus_url} with "{query}"')
-    p = PrometheusConnect(url=prometheus_url, disable_ssl=False)
-    data = p.custom_query(query=query)
+    p = _prometheus_connect(prometheus_url, timeout)
+    with circuit_breakers.guard(prometheus_url):
+        data = p.custom_query(query=query)
     # expect that only a single value is returned from the query
     assert len(data) == 1
     # expected query output like [{'metric': {}, 'value': [1729872285.678, '1']}]
@@ -203,9 +1222,13 @@ def prometheus_query(query: str, prometheus_url: str) -> Tuple[float, float]:
     return (epoch_ts, value)
 
 
-def influx_query(db_name: str, influx_url: str, query: str) -> Tuple[float, float]:
+def influx_query(
+    db_name: str,
+    influx_url: str,
+    query: str,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> Tuple[float, float]:
     """query influx using http api"""
-    qry_timeout = 15
     path = "/query?"
     url_qry_path = influx_url + path
 
@@ -217,10 +1240,11 @@ def influx_query(db_name: str, influx_url: str, query: str) -> Tuple[float, floa
     url_params = {"q": query, "db": db_name}
 
     logger.debug(f"querying {url_qry_path} with db_name: {db_name}, query: {query}")
-    response = requests.get(url_qry_path, params=url_params, timeout=qry_timeout)
+    with circuit_breakers.guard(influx_url):
+        response = requests.get(url_qry_path, params=url_params, timeout=timeout)
 
-    # raise an HTTPError exception if call failed
-    response.raise_for_status()
+        # raise an HTTPError exception if call failed
+        response.raise_for_status()
 
     # expected query output like:
     #   {
@@ -263,57 +1287,2068 @@ def influx_query(db_name: str, influx_url: str, query: str) -> Tuple[float, floa
     return (epoch_ts, value)
 
 
-@click.group()
-@click.option("--query", required=True, help="query to gather metrics with")
-@click.option(
-    "--success-condition",
-    #    required=True,
-    help="Comparison operator to determine success.\n"
-    "Metric value produced by query will be compared with the value provided by --success-value\n"
+class HashRing:
+    """
+    Consistent hash ring assigning checks to the members of a fleet of checker nodes.
+
+    Each member is placed on the ring at `vnodes` pseudo-random points; a check key is owned
+    by the first member clockwise from the key's hash, and replicas by the next distinct
+    members. Because members only own the arcs in front of their own points, adding or
+    removing a member only moves the checks on the arcs it gains or loses (about 1/n of
+    them), and every node computes the same assignment from the same member list.
+    """
+
+    def __init__(self, members: List[str], vnodes: int = 64):
+        if not members:
+            raise ValueError("a hash ring needs at least one member")
+        self.members = sorted(set(members))
+        self._ring = sorted(
+            (self._hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(vnodes)
+        )
+        self._points = [point for point, _member in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        """stable hash of a string; unlike hash() this is the same in every process"""
+        return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+
+    def owners(self, key: str, replicas: int = 1) -> List[str]:
+        """the distinct members responsible for key, primary owner first"""
+        replicas = min(replicas, len(self.members))
+        owners = []
+        start = bisect.bisect(self._points, self._hash(key))
+        for i in range(len(self._ring)):
+            member = self._ring[(start + i) % len(self._ring)][1]
+            if member not in owners:
+                owners.append(member)
+                if len(owners) == replicas:
+                    break
+        return owners
+
+
+def fleet_owns_check(
+    check_key: str, node_id: str, members: List[str], replicas: int = 1
+) -> bool:
+    """
+    Return True if fleet member node_id is among the `replicas` nodes assigned check_key
+    by consistent hashing over the fleet members.
+    """
+    if node_id not in members:
+        raise ValueError(f"fleet node id {node_id} is not in fleet members {members}")
+    return node_id in HashRing(members).owners(check_key, replicas)
+
+
+def prometheus_query_range(
+    query: str,
+    prometheus_url: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    step: str,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> List[Tuple[float, float]]:
+    """query prometheus for a range of samples, returning a list of (epoch_ts, value)"""
+    logger.debug(
+        f'querying {prometheus_url} with "{query}" from {start} to {end} step {step}'
+    )
+    p = _prometheus_connect(prometheus_url, timeout)
+    with circuit_breakers.guard(prometheus_url):
+        data = p.custom_query_range(
+            query=query, start_time=start, end_time=end, step=step
+        )
+    # expect a single series, like
+    # [{'metric': {}, 'values': [[1729872285.678, '1'], [1729872585.678, '1'], ...]}]
+    assert len(data) == 1
+
+    samples = [(float(epoch_ts), float(value)) for epoch_ts, value in data[0]["values"]]
+    logger.debug(f"returned {len(samples)} samples")
+    return samples
+
+
+def influx_query_range(
+    db_name: str,
+    influx_url: str,
+    query: str,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> List[Tuple[float, float]]:
+    """
+    query influx using http api, returning every row of the single resulting series as a
+    list of (epoch_ts, value). The query itself selects the time range and interval, eg
+    with `WHERE time > now() - 12h GROUP BY time(5m)`.
+    """
+    url_qry_path = influx_url + "/query?"
+    url_params = {"q": query, "db": db_name}
+
+    logger.debug(f"querying {url_qry_path} with db_name: {db_name}, query: {query}")
+    with circuit_breakers.guard(influx_url):
+        response = requests.get(url_qry_path, params=url_params, timeout=timeout)
+        response.raise_for_status()
+    data = response.json()
+
+    assert len(data["results"]) == 1
+    samples = [
+        (datetime.datetime.fromisoformat(time).timestamp(), value)
+        for time, value in data["results"][0]["series"][0]["values"]
+        # influx GROUP BY time() yields null for empty intervals
+        if value is not None
+    ]
+    logger.debug(f"returned {len(samples)} samples")
+    return samples
+
+
+def _parse_rfc3339(timestamp: str) -> float:
+    """epoch seconds of an RFC3339 timestamp, which Flux gives with up to nanoseconds"""
+    seconds, dot, fraction = timestamp.rstrip("Z").partition(".")
+    if dot:
+        # fromisoformat only takes up to microseconds
+        seconds = f"{seconds}.{fraction[:6]}"
+    return datetime.datetime.fromisoformat(seconds + "+00:00").timestamp()
+
+
+class FluxQueryError(ValueError):
+    """Raised when a Flux query fails with an error table, or returns no usable table"""
+
+
+def parse_flux_csv(lines: Iterable[str]) -> Iterator[Tuple[float, float]]:
+    """
+    Incrementally parse the annotated CSV response of a Flux query into (epoch_ts, value)
+    samples from its `_time` and `_value` columns.
+    The response may hold several tables, each starting with its own #annotation rows and
+    header row, and separated by blank lines. Rows with a null value are skipped.
+    """
+    columns = None
+    time_index = value_index = None
+    for row in csv.reader(lines):
+        if not any(row) or row[0].startswith("#"):
+            # a new table starts with a new header row
+            columns = None
+            continue
+        if columns is None:
+            columns = row
+            if "error" in columns:
+                # an error in the middle of a streamed response is sent as its own table
+                continue
+            if "_time" not in columns or "_value" not in columns:
+                raise FluxQueryError(
+                    f"flux result table has no _time and _value columns: {columns}"
+                )
+            time_index, value_index = columns.index("_time"), columns.index("_value")
+            continue
+        if "error" in columns:
+            raise FluxQueryError(f"flux query failed: {row[columns.index('error')]}")
+        if row[value_index]:
+            yield (_parse_rfc3339(row[time_index]), float(row[value_index]))
+
+
+@contextlib.contextmanager
+def _flux_query_lines(
+    org: str,
+    influx_url: str,
+    query: str,
+    token: Optional[str] = None,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> Iterator[Iterator[str]]:
+    """context manager streaming the gzipped annotated CSV lines of a Flux query result"""
+    url_qry_path = influx_url.rstrip("/") + "/api/v2/query"
+    headers = {
+        "Accept": "application/csv",
+        "Accept-Encoding": "gzip",
+        "Content-Type": "application/json",
+    }
+    if token:
+        headers["Authorization"] = f"Token {token}"
+    body = {
+        "query": query,
+        "type": "flux",
+        "dialect": {"header": True, "annotations": ["datatype", "group", "default"]},
+    }
+
+    logger.debug(f"querying {url_qry_path} with org: {org}, query: {query}")
+    with circuit_breakers.guard(influx_url), requests.post(
+        url_qry_path,
+        params={"org": org},
+        json=body,
+        headers=headers,
+        timeout=timeout,
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        # requests transparently decompresses the gzip content encoding while streaming
+        yield codecs.iterdecode(response.iter_lines(), "utf-8")
+
+
+def flux_query(
+    org: str,
+    influx_url: str,
+    query: str,
+    token: Optional[str] = None,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> Tuple[float, float]:
+    """
+    query InfluxDB 2.x with Flux, returning the last (epoch_ts, value) of the result, eg of
+    `from(bucket: "mybucket") |> range(start: -5m) |> filter(...) |> last()`
+    """
+    with _flux_query_lines(org, influx_url, query, token, timeout) as lines:
+        last = deque(parse_flux_csv(lines), maxlen=1)
+    if not last:
+        raise ValueError(f"flux query returned no values: {query}")
+    return last[0]
+
+
+def flux_query_range(
+    org: str,
+    influx_url: str,
+    query: str,
+    token: Optional[str] = None,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+) -> List[Tuple[float, float]]:
+    """
+    query InfluxDB 2.x with Flux, returning every row of the result as a list of
+    (epoch_ts, value). The query itself selects the time range and interval, eg with
+    `range(start: -12h) |> aggregateWindow(every: 5m, fn: last)`.
+    """
+    with _flux_query_lines(org, influx_url, query, token, timeout) as lines:
+        samples = list(parse_flux_csv(lines))
+    logger.debug(f"returned {len(samples)} samples")
+    return samples
+
+
+def evaluate_status(value: float, success_condition: str, success_value: float) -> str:
+    """
+    evaluate the named success condition for a query value, returning a Status value;
+    no value (eg the query failed) is UNKNOWN
+    """
+    if value is None:
+        return Status.UNKNOWN.value
+    return (
+        Status.SUCCESS.value
+        if ConditionComparitor[success_condition].value(value, success_value)
+        else Status.FAILED.value
+    )
+
+
+def evaluate_statuses(
+    values: List[float], success_condition: str, success_value: float
+) -> List[str]:
+    """evaluate the named success condition for many query values at once"""
+    comparitor = ConditionComparitor[success_condition].value
+    statuses = (Status.FAILED.value, Status.SUCCESS.value)
+    return [statuses[comparitor(value, success_value)] for value in values]
+
+
+@dataclass
+class CheckConfig:
+    """
+    A single status check, as configured in a checks file for the `schedule` command:
+    the equivalent of the --query, --filepath and success options plus a promq, influxq or
+    fluxq subcommand invocation, and the interval to run it at.
+    """
+
+    name: str
+    query: str
+    filepath: str
+    source: str = "prometheus"
+    # a list of urls for a replicated backend
+    url: Union[str, List[str]] = "http://prometheus:8086/"
+    db_name: str = "mydb"
+    # InfluxDB 2.x organisation and API token, for the flux source
+    org: str = ""
+    token: Optional[str] = None
+    success_condition: str = ConditionComparitor.eq.name
+    success_value: float = 1
+    # seconds
+    interval: float = 300
+
+
+_checks_adapter = TypeAdapter(List[CheckConfig])
+
+
+def load_checks(checks_path: str) -> List[CheckConfig]:
+    """load a JSON checks file containing a list of CheckConfig objects"""
+    with open(checks_path) as f:
+        checks = _checks_adapter.validate_json(f.read())
+    names = [check.name for check in checks]
+    if len(set(names)) != len(names):
+        raise ValueError(f"check names in {checks_path} are not unique: {names}")
+    return checks
+
+
+def query_check(
+    check: CheckConfig, timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT
+) -> Tuple[float, float]:
+    """run the query of a configured check against its source, hedged across replicas"""
+    urls = [check.url] if isinstance(check.url, str) else check.url
+    if check.source == "prometheus":
+        return hedged_query(
+            lambda url: prometheus_query(check.query, url, timeout), urls
+        )
+    if check.source == "influxdb":
+        return hedged_query(
+            lambda url: influx_query(check.db_name, url, check.query, timeout), urls
+        )
+    if check.source == "flux":
+        return hedged_query(
+            lambda url: flux_query(check.org, url, check.query, check.token, timeout),
+            urls,
+        )
+    raise ValueError(f"unknown source {check.source} for check {check.name}")
+
+
+def run_check(
+    check: CheckConfig, timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT
+) -> StatusRecord:
+    """
+    Query and evaluate a configured check, returning its StatusRecord.
+    A failed query, including one failed fast by an open circuit breaker, is logged and
+    results in an UNKNOWN status rather than an exception.
+    """
+    try:
+        epoch_ts, value = query_check(check, timeout)
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        logger.warning(f"query for check {check.name} failed: {exc!r}")
+        return StatusRecord(status=Status.UNKNOWN.value)
+
+    status = evaluate_status(value, check.success_condition, check.success_value)
+    logger.info(f"check {check.name} returned {value}: {status}")
+    return StatusRecord(value, epoch_ts, status)
+
+
+def append_status_record(
+    report_file: PosixPath,
+    record: StatusRecord,
+    summary: bool = False,
+    partition: bool = False,
+) -> List[PosixPath]:
+    """
+    Append a StatusRecord to the status log at report_file, or to its monthly partition and
+    the partition manifest, and to its summary. Returns the paths of the files changed.
+    """
+    log_file = (
+        partition_file_path(report_file, record.epoch_ts) if partition else report_file
+    )
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    update_log_file(log_file, record.epoch_ts, record.value, record.status)
+    logger.info(f"updated log file: {log_file}")
+    changed = [log_file]
+
+    if partition:
+        changed.append(update_manifest_file(report_file))
+    if summary:
+        summary_file = update_summary_file(
+            report_file, record.epoch_ts, record.value, record.status
+        )
+        logger.info(f"updated summary file: {summary_file}")
+        changed.append(summary_file)
+    return changed
+
+
+def write_status_records(
+    backend: GitBackend,
+    git_dir: str,
+    records: List[Tuple[str, StatusRecord]],
+    summary: bool = False,
+    git_push_url: Optional[str] = None,
+    commit_message="[automated] update health report",
+    partition: bool = False,
+    push: bool = True,
+) -> str:
+    """
+    Append (filepath, StatusRecord) pairs to their status logs (and summaries), or to their
+    monthly partitions if partition is set, then commit them all in a single commit, and
+    push if git_push_url is given. Callers that push separately pass push=False.
+    Returns the commit sha.
+    """
+    commit_files = []
+    for filepath, record in records:
+        logger.debug(f"writing report file at {filepath}")
+        logger.debug(f"Data record:\n{pprint.pformat(record)}")
+
+        report_file = PosixPath(git_dir, filepath)
+        commit_files.extend(
+            append_status_record(report_file, record, summary, partition)
+        )
+
+    commit_res = backend.commit(sorted(set(commit_files)), commit_message)
+    logger.info(f"commit result: {commit_res}")
+
+    # push repo
+    # Note that auth implementation will vary between types of remote and auth mechanism.
+    # Note also that Github PAT token can (and may actually have to be) incorporated into
+    # the URL itself, but it's not permitted to include it in the URL just for pulling
+    if not push:
+        return commit_res
+    if git_push_url:
+        push_res = backend.push(git_push_url)
+        logger.info(f"push result: {push_res}")
+    else:
+        logger.info("Will not push because git_push_url == False")
+
+    return commit_res
+
+
+def merge_status_files(
+    source_root: PosixPath,
+    target_root: PosixPath,
+    filepaths: List[str],
+    summary: bool = False,
+    partition: bool = False,
+) -> List[PosixPath]:
+    """
+    Merge the status logs (or log partitions) at filepaths relative to source_root into
+    those under target_root, then update the manifests and summaries of the logs that
+    changed. Returns the paths of all files changed under target_root.
+    """
+    changed = []
+    for filepath in filepaths:
+        log_file = PosixPath(target_root, filepath)
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        records = read_log_records(PosixPath(source_root, filepath))
+        if merge_log_records(log_file, records):
+            changed.append(log_file)
+
+    # the logs that changed partitions belong to
+    report_files = {
+        (partition and partitioned_log_path(log_file)) or log_file
+        for log_file in changed
+    }
+    for report_file in sorted(report_files):
+        if partition:
+            changed.append(update_manifest_file(report_file))
+        if summary:
+            changed.append(rebuild_summary_file(report_file))
+    return changed
+
+
+class OutputSink:
+    """
+    Interface for a destination that status records are written to. Besides the git repo,
+    records can also be written to sinks that take writes far more cheaply than a commit
+    and push, such as a directory served over HTTP, while git only receives periodic
+    snapshots of them (see GitSink).
+    """
+
+    name: str = None
+
+    def write(self, records: List[Tuple[str, StatusRecord]]) -> List[str]:
+        """write (filepath, StatusRecord) pairs, returning the filepaths changed"""
+        raise NotImplementedError
+
+
+class DirectorySink(OutputSink):
+    """
+    OutputSink appending to status logs (and summaries) in a local directory, eg the
+    document root of a static web server the Fettle frontend reads from.
+    """
+
+    name = "dir"
+
+    def __init__(self, root: str, summary: bool = False, partition: bool = False):
+        self.root = PosixPath(root)
+        self.summary = summary
+        self.partition = partition
+
+    def write(self, records: List[Tuple[str, StatusRecord]]) -> List[str]:
+        changed = set()
+        for filepath, record in records:
+            changed.update(
+                str(path.relative_to(self.root))
+                for path in append_status_record(
+                    self.root / filepath, record, self.summary, self.partition
+                )
+            )
+        logger.debug(f"wrote {len(records)} records to {self.root}")
+        return sorted(changed)
+
+    def log_files(self) -> List[str]:
+        """paths of all status logs (or log partitions) in the directory, relative to it"""
+        return sorted(
+            str(path.relative_to(self.root))
+            for path in self.root.rglob("*")
+            if path.is_file()
+            and ".git" not in path.relative_to(self.root).parts
+            and not path.name.endswith((".summary.json", ".manifest.json"))
+        )
+
+
+class S3Sink(DirectorySink):
+    """
+    OutputSink keeping status logs in an S3 compatible object store, eg AWS S3 or MinIO.
+    Objects cannot be appended to, so records are appended to a local staging copy of the
+    logs, and each changed log is then uploaded whole. Requires the optional boto3 package.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        s3_url: str,
+        staging_dir: str,
+        summary: bool = False,
+        partition: bool = False,
+        endpoint_url: Optional[str] = None,
+        client=None,
+    ):
+        super().__init__(staging_dir, summary, partition)
+        if not s3_url.startswith("s3://"):
+            raise ValueError(f"not an s3:// url: {s3_url}")
+        self.bucket, _slash, prefix = s3_url[len("s3://") :].partition("/")
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        if client is None:
+            if boto3 is None:
+                raise click.UsageError("the boto3 package is required for --s3-url")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        # uploads that failed, to retry with the next write
+        self._pending = set()
+        # shards write to the same sink from several threads
+        self._pending_lock = threading.Lock()
+
+    def write(self, records: List[Tuple[str, StatusRecord]]) -> List[str]:
+        changed = super().write(records)
+        with self._pending_lock:
+            self._pending.update(changed)
+            pending = sorted(self._pending)
+        for filepath in pending:
+            try:
+                self.upload(filepath)
+                with self._pending_lock:
+                    self._pending.discard(filepath)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                # the local staging copy is complete, and uploaded whole next time
+                logger.warning(f"failed to upload {filepath} to s3: {exc!r}")
+        return changed
+
+    def upload(self, filepath: str):
+        """upload a log or summary file from the staging directory"""
+        key = self.prefix + filepath
+        logger.debug(f"uploading {filepath} to s3://{self.bucket}/{key}")
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=(self.root / filepath).read_bytes(),
+            ContentType=(
+                "application/json" if filepath.endswith(".json") else "text/plain"
+            ),
+        )
+
+
+class GitSink(OutputSink):
+    """
+    OutputSink committing status records to the git clone in git_dir.
+
+    By default every write is a commit. Given a snapshot_sink and a snapshot_interval,
+    records are instead only written to the snapshot sink, and at most once per
+    snapshot_interval seconds all its logs are merged into the git clone in one commit,
+    so git history grows with the snapshot interval rather than the write rate. The time
+    of the last snapshot is kept in a `<git_dir>.snapshot` file, so that it holds across
+    status_pusher runs. Pushing is separate, so that a failed push does not lose the
+    record of what was committed. When several GitSinks share a snapshot sink, as the
+    shards of a ShardRouter do, owns selects the logs each of them snapshots.
+    """
+
+    name = "git"
+
+    def __init__(
+        self,
+        backend: GitBackend,
+        git_dir: str,
+        summary: bool = False,
+        git_push_url: Optional[str] = None,
+        snapshot_sink: Optional[DirectorySink] = None,
+        snapshot_interval: float = 0,
+        partition: bool = False,
+        clock: Callable[[], float] = time.time,
+        owns: Optional[Callable[[str], bool]] = None,
+    ):
+        self.backend = backend
+        self.git_dir = git_dir
+        self.owns = owns
+        self.summary = summary
+        self.partition = partition
+        self.git_push_url = git_push_url
+        self.snapshot_sink = snapshot_sink
+        self.snapshot_interval = snapshot_interval
+        self.clock = clock
+        self.snapshot_stamp = PosixPath(str(git_dir).rstrip("/") + ".snapshot")
+        self.unpushed = False
+
+    def write(self, records: List[Tuple[str, StatusRecord]]) -> List[str]:
+        if self.snapshot_sink is None or not self.snapshot_interval:
+            write_status_records(
+                self.backend,
+                self.git_dir,
+                records,
+                self.summary,
+                partition=self.partition,
+                # pushed by push(), together with any snapshot commits
+                push=False,
+            )
+            self.unpushed = True
+            return sorted({filepath for filepath, _record in records})
+        return self.snapshot()
+
+    def snapshot(self, force: bool = False) -> List[str]:
+        """
+        merge all logs of the snapshot sink into the git clone and commit them, if
+        snapshot_interval has passed since the last snapshot or force is set
+        """
+        now = self.clock()
+        if self.snapshot_stamp.exists() and not force:
+            last = float(self.snapshot_stamp.read_text())
+            if now - last < self.snapshot_interval:
+                logger.debug(
+                    f"next git snapshot due in {last + self.snapshot_interval - now:.0f}s"
+                )
+                return []
+
+        changed = merge_status_files(
+            self.snapshot_sink.root,
+            PosixPath(self.git_dir),
+            [
+                filepath
+                for filepath in self.snapshot_sink.log_files()
+                if self.owns is None or self.owns(filepath)
+            ],
+            self.summary,
+            self.partition,
+        )
+        if changed:
+            commit_res = self.backend.commit(
+                changed, "[automated] snapshot health reports"
+            )
+            logger.info(f"committed snapshot of {len(changed)} files: {commit_res}")
+            self.unpushed = True
+        else:
+            logger.info("git snapshot has no changes")
+        self.snapshot_stamp.write_text(str(now))
+        return [str(path.relative_to(self.git_dir)) for path in changed]
+
+    def push(self):
+        """push any commits made by this sink"""
+        if not self.unpushed:
+            return
+        if self.git_push_url:
+            push_res = self.backend.push(self.git_push_url)
+            logger.info(f"push result: {push_res}")
+        else:
+            logger.info("Will not push because git_push_url == False")
+        self.unpushed = False
+
+
+class LockTimeout(Exception):
+    """Raised when the lock on a shared git_dir could not be acquired in time"""
+
+
+class SharedGitDir:
+    """
+    Coordinates concurrent status_pusher processes sharing one git_dir clone.
+
+    All git operations on the clone are done while holding an exclusive lock on a
+    `<git_dir>.lock` file next to it, so that processes never race on index.lock, pulls or
+    pushes. Records are first written to a `<git_dir>.spool` directory; whichever process
+    next holds the lock writes every spooled record, from all waiting processes, in a
+    single commit and push. A process that finds its own records were already written by
+    another one while it waited for the lock has nothing left to do.
+    """
+
+    def __init__(self, git_dir: str, timeout: float = 60.0, poll_interval: float = 0.1):
+        git_dir = str(git_dir).rstrip("/")
+        self.lock_path = PosixPath(git_dir + ".lock")
+        self.spool_dir = PosixPath(git_dir + ".spool")
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    @contextlib.contextmanager
+    def lock(self):
+        """context manager holding the exclusive lock on the git_dir"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as lock_file:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError as exc:
+                    if time.monotonic() >= deadline:
+                        raise LockTimeout(
+                            f"could not lock {self.lock_path} in {self.timeout}s"
+                        ) from exc
+                    time.sleep(self.poll_interval)
+            logger.debug(f"acquired lock {self.lock_path}")
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                logger.debug(f"released lock {self.lock_path}")
+
+    def spool(self, records: List[Tuple[str, StatusRecord]]) -> List[PosixPath]:
+        """write records to the spool directory, returning the spool file paths"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for filepath, record in records:
+            name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex}.json"
+            path = self.spool_dir / name
+            tmp_path = self.spool_dir / f".{name}.tmp"
+            with tmp_path.open("w") as f:
+                json.dump({"filepath": filepath, **dataclasses.asdict(record)}, f)
+            # rename is atomic, so readers never see a partially written record
+            tmp_path.rename(path)
+            paths.append(path)
+        return paths
+
+    def _read_spool(self) -> List[Tuple[PosixPath, str, StatusRecord]]:
+        """all spooled records, oldest first; must be called holding the lock"""
+        spooled = []
+        for path in sorted(self.spool_dir.glob("*.json")):
+            with path.open() as f:
+                data = json.load(f)
+            spooled.append((path, data.pop("filepath"), StatusRecord(**data)))
+        return spooled
+
+    def submit(
+        self,
+        records: List[Tuple[str, StatusRecord]],
+        commit_fn: Callable[[List[Tuple[str, StatusRecord]]], object],
+        push_fn: Optional[Callable[[], object]] = None,
+    ) -> bool:
+        """
+        Spool records, then lock the git_dir and, unless another process already did so,
+        pass every spooled record to commit_fn, then call push_fn.
+        Returns False if our records had already been committed by another process.
+        """
+        own_paths = self.spool(records)
+        with self.lock():
+            if not any(path.exists() for path in own_paths):
+                logger.info("records were already committed by another process")
+                return False
+
+            spooled = self._read_spool()
+            logger.info(f"committing {len(spooled)} spooled records")
+            commit_fn([(filepath, record) for _path, filepath, record in spooled])
+            # the records are committed, so a failing push must not spool them again
+            for path, _filepath, _record in spooled:
+                path.unlink()
+            if push_fn:
+                push_fn()
+        return True
+
+
+def repo_health(git_dir: str) -> Dict[str, int]:
+    """
+    Object store statistics of the git repo in git_dir, from `git count-objects -v`:
+    loose object `count` and `size` (KiB), objects `in-pack`, `packs`, `size-pack` (KiB),
+    `prune-packable` loose objects and `garbage` files, plus the number of `loose-refs`
+    and `reflog-entries`.
+    """
+    git_repo = git.Repo(git_dir)
+    health = {}
+    for line in git_repo.git.count_objects("-v").splitlines():
+        key, _colon, value = line.partition(":")
+        health[key.strip()] = int(value)
+
+    git_path = PosixPath(git_repo.git_dir)
+    health["loose-refs"] = sum(
+        path.is_file() for path in (git_path / "refs").rglob("*")
+    )
+    reflog_entries = 0
+    for path in (git_path / "logs").rglob("*"):
+        if path.is_file():
+            with path.open("rb") as reflog:
+                reflog_entries += sum(1 for _line in reflog)
+    health["reflog-entries"] = reflog_entries
+    return health
+
+
+class RepoMaintainer:
+    """
+    Keeps a long-lived git_dir clone fast as automated commits and pulls accumulate.
+
+    Maintenance runs when `interval` seconds have passed since it last ran, or sooner if the
+    clone has more than `max_loose_objects` loose objects or `max_packs` packs. It expires
+    old reflog entries, packs refs, repacks incrementally (geometric repacking merges small
+    packs, leaving the big old pack alone), prunes old unreachable objects and writes the
+    commit-graph, holding the shared git_dir lock so it never races a commit or push;
+    records spooled meanwhile are committed together afterwards.
+
+    The time and report of the last run are kept in a `<git_dir>.maintenance` file, so
+    that the interval holds across status_pusher runs. Long running commands check whether
+    maintenance is due from a background thread, off the path of checks and commits.
+    """
+
+    # git subcommand arguments for each maintenance step, in order
+    STEPS = {
+        "reflog-expire": ["reflog", "expire", "--expire=30.days.ago", "--all"],
+        "pack-refs": ["pack-refs", "--all"],
+        "repack": ["repack", "-d", "-l", "--geometric=2"],
+        "prune": ["prune", "--expire=2.weeks.ago"],
+        "commit-graph": ["commit-graph", "write", "--reachable", "--split"],
+    }
+
+    def __init__(
+        self,
+        shared_git_dir: SharedGitDir,
+        git_dir: str,
+        interval: float = 86400.0,
+        max_loose_objects: int = 1000,
+        max_packs: int = 20,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.shared_git_dir = shared_git_dir
+        self.git_dir = git_dir
+        self.interval = interval
+        self.max_loose_objects = max_loose_objects
+        self.max_packs = max_packs
+        self.clock = clock
+        self.state_path = PosixPath(str(git_dir).rstrip("/") + ".maintenance")
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    def last_report(self) -> Optional[dict]:
+        """the report of the last maintenance run, if any"""
+        if not self.state_path.exists():
+            return None
+        return json.loads(self.state_path.read_text())
+
+    def due(self, health: Dict[str, int]) -> List[str]:
+        """the reasons maintenance is due given the repo health, if any"""
+        reasons = []
+        last_report = self.last_report()
+        if (
+            last_report is None
+            or self.clock() - last_report["epoch_ts"] >= self.interval
+        ):
+            reasons.append("interval")
+        if health["count"] > self.max_loose_objects:
+            reasons.append("loose objects")
+        if health["packs"] > self.max_packs:
+            reasons.append("packs")
+        return reasons
+
+    def run(self, force: bool = False) -> Optional[dict]:
+        """
+        run maintenance if it is due or force is set, returning a report with the reasons,
+        the health before and after, and the seconds each step took
+        """
+        with self.shared_git_dir.lock():
+            health = repo_health(self.git_dir)
+            reasons = ["forced"] if force else self.due(health)
+            if not reasons:
+                logger.debug(f"repo maintenance not due, repo health: {health}")
+                return None
+
+            logger.info(f"running repo maintenance ({', '.join(reasons)}): {health}")
+            git_cmd = git.Repo(self.git_dir).git
+            timings = {}
+            for step, args in self.STEPS.items():
+                start = time.monotonic()
+                git_cmd.execute(["git"] + args)
+                timings[step] = round(time.monotonic() - start, 3)
+                logger.debug(f"repo maintenance step {step} took {timings[step]}s")
+
+            report = {
+                "epoch_ts": self.clock(),
+                "reasons": reasons,
+                "health_before": health,
+                "health_after": repo_health(self.git_dir),
+                "seconds": timings,
+            }
+            self.state_path.write_text(json.dumps(report, indent=1, sort_keys=True))
+        logger.info(
+            f"repo maintenance took {sum(timings.values()):.2f}s: {timings}, "
+            f"repo health now {report['health_after']}"
+        )
+        return report
+
+    def _run(self, check_interval: float):
+        while not self._stopped.wait(check_interval):
+            try:
+                self.run()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("repo maintenance failed")
+
+    def start(self, check_interval: float = 300.0):
+        """check whether maintenance is due every check_interval in a background thread"""
+        self._thread = threading.Thread(
+            target=self._run, args=(check_interval,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """stop the background thread, waiting for any maintenance run to finish"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+
+@dataclass
+class ShardConfig:
+    """
+    A shard of the status output, as configured in a shards file for --shards: status
+    files matching any of the `match` globs (eg `team-a/*`) are committed to `git_branch`
+    of `git_url` instead of the --git-branch of --git-url, defaulting to those. A shard
+    needs its own branch or repo, so that it has its own ref to push to.
+    """
+
+    name: str
+    match: List[str]
+    git_url: Optional[str] = None
+    git_branch: Optional[str] = None
+    # defaults to --git-push-url only for shards in the --git-url repo
+    git_push_url: Optional[str] = None
+
+    def owns(self, filepath: str) -> bool:
+        """whether the status log (or log partition) at filepath belongs to this shard"""
+        log_path = partitioned_log_path(PosixPath(filepath))
+        return any(
+            fnmatchcase(filepath, pattern)
+            or (log_path is not None and fnmatchcase(str(log_path), pattern))
+            for pattern in self.match
+        )
+
+
+_shards_adapter = TypeAdapter(List[ShardConfig])
+
+# the shard of status files no configured shard matches
+DEFAULT_SHARD = "default"
+
+
+def load_shards(shards_path: str) -> List[ShardConfig]:
+    """load a JSON shards file containing a list of ShardConfig objects"""
+    with open(shards_path) as f:
+        shards = _shards_adapter.validate_json(f.read())
+    names = [shard.name for shard in shards]
+    if len(set(names)) != len(names):
+        raise ValueError(f"shard names in {shards_path} are not unique: {names}")
+    for shard in shards:
+        # names become part of the shard's git_dir path
+        if shard.name == DEFAULT_SHARD or not re.fullmatch(r"[\w-]+", shard.name):
+            raise ValueError(f"invalid shard name in {shards_path}: {shard.name!r}")
+        if shard.git_url is None and shard.git_branch is None:
+            raise ValueError(
+                f"shard {shard.name} in {shards_path} needs a git_url or git_branch"
+            )
+    return shards
+
+
+def shard_git_dir(git_dir: str, shard_name: str) -> str:
+    """
+    The git_dir of a shard's clone: git_dir itself for the default shard, and otherwise
+    `<git_dir>.shards/<name>`, so that shard clones and their own lock, spool and other
+    sibling files never clash with the `<git_dir>.*` sibling files of the default clone.
+    """
+    if shard_name == DEFAULT_SHARD:
+        return git_dir
+    shards_dir = PosixPath(str(git_dir).rstrip("/") + ".shards")
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    return str(shards_dir / shard_name)
+
+
+class Shard:
+    """
+    The warm clone of a shard in its own git_dir, with its own SharedGitDir lock and spool,
+    so that records of different shards are committed and pushed independently. Records
+    are written to the sinks shared by all shards, then to the shard's GitSink. Each shard
+    has its own RepoMaintainer, configured by maintenance_kwargs.
+    """
+
+    def __init__(
+        self,
+        config: ShardConfig,
+        git_dir: str,
+        backend: GitBackend,
+        sinks: List[OutputSink],
+        summary: bool = False,
+        partition: bool = False,
+        snapshot_interval: float = 0,
+        lock_timeout: float = 60,
+        owns: Optional[Callable[[str], bool]] = None,
+        **maintenance_kwargs,
+    ):
+        self.config = config
+        self.git_dir = git_dir
+        self.backend = backend
+        self.sinks = sinks
+        self.shared_git_dir = SharedGitDir(git_dir, lock_timeout)
+        self.git_sink = GitSink(
+            backend,
+            git_dir,
+            summary,
+            config.git_push_url,
+            sinks[0] if sinks else None,
+            snapshot_interval,
+            partition,
+            owns=owns,
+        )
+        self.maintainer = RepoMaintainer(
+            self.shared_git_dir, git_dir, **maintenance_kwargs
+        )
+
+    def open(self):
+        """clone (or update) the shard's repo in its git_dir"""
+        with self.shared_git_dir.lock():
+            git_repo = self.backend.clone(
+                self.config.git_url, self.config.git_branch, self.git_dir
+            )
+        logger.info(f"shard {self.config.name} git_repo: {git_repo}")
+        return self
+
+    def write(self, records: List[Tuple[str, StatusRecord]]):
+        """write records to the shared sinks, then commit them to the shard's clone"""
+        for sink in self.sinks:
+            sink.write(records)
+        self.git_sink.write(records)
+
+    def submit(self, records: List[Tuple[str, StatusRecord]]) -> bool:
+        """write, commit and push records, together with those of concurrent processes"""
+        return self.shared_git_dir.submit(records, self.write, self.git_sink.push)
+
+
+class ShardRouter:
+    """
+    Routes status records to shards of the status output, each a branch or repo with its
+    own warm clone and push queue, so that pushes to independent shards proceed in
+    parallel instead of serializing on a single ref. Records of files no shard matches go
+    to the default shard, the --git-branch of --git-url. Shards are opened on first use.
+
+    publish() merges the logs of all other shards into the default shard and pushes them,
+    so that Fettle, reading the default branch, sees every status file.
+
+    Between start_maintenance() and stop_maintenance(), the RepoMaintainer of every open
+    shard runs in the background, including shards opened meanwhile.
+    """
+
+    def __init__(
+        self,
+        default: ShardConfig,
+        shards: List[ShardConfig],
+        open_shard: Callable[[ShardConfig, Callable[[str], bool]], Shard],
+    ):
+        self.default = default
+        self.shards = [self._resolve(shard) for shard in shards]
+        self.open_shard = open_shard
+        self._open: Dict[str, Shard] = {}
+        self._locks = {
+            shard.name: threading.Lock() for shard in [default] + self.shards
+        }
+        # guards _open and _maintaining, so every open shard is maintained exactly once
+        self._maintenance_lock = threading.Lock()
+        self._maintaining = False
+
+    def _resolve(self, shard: ShardConfig) -> ShardConfig:
+        """fill in the repo and branch a shard leaves to the default shard"""
+        git_url = shard.git_url or self.default.git_url
+        git_push_url = shard.git_push_url
+        if git_push_url is None and git_url == self.default.git_url:
+            git_push_url = self.default.git_push_url
+        return dataclasses.replace(
+            shard,
+            git_url=git_url,
+            git_branch=shard.git_branch or self.default.git_branch,
+            git_push_url=git_push_url,
+        )
+
+    def shard_for(self, filepath: str) -> ShardConfig:
+        """the shard a status file belongs to: the first matching, else the default"""
+        for shard in self.shards:
+            if shard.owns(filepath):
+                return shard
+        return self.default
+
+    def get(self, shard: ShardConfig) -> Shard:
+        """the open shard, cloning its repo on first use"""
+        with self._locks[shard.name]:
+            if shard.name not in self._open:
+                opened = self.open_shard(
+                    shard, lambda filepath: self.shard_for(filepath) is shard
+                ).open()
+                with self._maintenance_lock:
+                    self._open[shard.name] = opened
+                    if self._maintaining:
+                        opened.maintainer.start()
+            return self._open[shard.name]
+
+    def start_maintenance(self):
+        """maintain the clones of all open shards, and those opened later, in the background"""
+        with self._maintenance_lock:
+            self._maintaining = True
+            for shard in self._open.values():
+                shard.maintainer.start()
+
+    def close(self):
+        """close the git backends of all open shards"""
+        with self._maintenance_lock:
+            shards = list(self._open.values())
+        for shard in shards:
+            shard.backend.close()
+
+    def stop_maintenance(self):
+        """stop maintaining shard clones, waiting for any maintenance runs to finish"""
+        with self._maintenance_lock:
+            self._maintaining = False
+            shards = list(self._open.values())
+        for shard in shards:
+            shard.maintainer.stop()
+
+    def submit(self, records: List[Tuple[str, StatusRecord]]) -> bool:
+        """submit records to their shards, those of different shards in parallel"""
+        by_shard: Dict[str, List[Tuple[str, StatusRecord]]] = {}
+        configs = {}
+        for filepath, record in records:
+            shard = self.shard_for(filepath)
+            configs[shard.name] = shard
+            by_shard.setdefault(shard.name, []).append((filepath, record))
+
+        def submit_shard(name: str) -> bool:
+            # opening a shard clones it, so that is done in parallel too
+            return self.get(configs[name]).submit(by_shard[name])
+
+        if not by_shard:
+            return self.get(self.default).submit(records)
+        if len(by_shard) == 1:
+            return submit_shard(next(iter(by_shard)))
+        with ThreadPoolExecutor(max_workers=len(by_shard)) as executor:
+            futures = [executor.submit(submit_shard, name) for name in sorted(by_shard)]
+        # all() over a list, so every shard's exception or result is collected
+        return all([future.result() for future in futures])
+
+    def publish(self) -> List[str]:
+        """
+        Pull every other shard and merge its logs into the default shard, then commit and
+        push them in a single commit. Logs are merged in timestamp order, skipping records
+        already published, so publishing repeatedly is harmless. Returns the filepaths
+        changed.
+        """
+        target = self.get(self.default)
+        root = PosixPath(target.git_dir)
+        with target.shared_git_dir.lock():
+            target.backend.clone(
+                self.default.git_url, self.default.git_branch, target.git_dir
+            )
+            changed = []
+            for config in self.shards:
+                if (config.git_url, config.git_branch) == (
+                    self.default.git_url,
+                    self.default.git_branch,
+                ):
+                    continue
+                shard = self.get(config)
+                with shard.shared_git_dir.lock():
+                    shard.backend.clone(
+                        config.git_url, config.git_branch, shard.git_dir
+                    )
+                    changed += merge_status_files(
+                        PosixPath(shard.git_dir),
+                        root,
+                        [
+                            filepath
+                            for filepath in DirectorySink(shard.git_dir).log_files()
+                            if config.owns(filepath)
+                        ],
+                        target.git_sink.summary,
+                        target.git_sink.partition,
+                    )
+
+            if not changed:
+                logger.info("shards have nothing new to publish")
+                return []
+            commit_res = target.backend.commit(
+                changed, "[automated] publish sharded health reports"
+            )
+            logger.info(f"published {len(changed)} files: {commit_res}")
+            target.git_sink.unpushed = True
+            target.git_sink.push()
+        return sorted({str(path.relative_to(root)) for path in changed})
+
+
+class AdaptiveScheduler:
+    """
+    Decides when each configured check runs next.
+
+    - Checks start at a deterministic offset within their interval, derived from the check
+      name, so checks with the same interval do not all query their backend at once.
+    - Each subsequent run is jittered by up to +/- `jitter` of the interval, again
+      deterministically from the check name and run count.
+    - A FAILED or DEGRADED result tightens the interval to `min_interval_factor` of the
+      configured interval, to follow an incident closely.
+    - After every `stable_runs` consecutive successes the interval is multiplied by
+      `backoff_factor`, up to `max_interval_factor` of the configured interval.
+    - An UNKNOWN result (eg the query failed) resets to the configured interval.
+    """
+
+    def __init__(
+        self,
+        checks: List[CheckConfig],
+        start: float,
+        jitter: float = 0.1,
+        min_interval_factor: float = 0.25,
+        max_interval_factor: float = 4.0,
+        backoff_factor: float = 2.0,
+        stable_runs: int = 3,
+    ):
+        self.checks = {check.name: check for check in checks}
+        self.jitter = jitter
+        self.min_interval_factor = min_interval_factor
+        self.max_interval_factor = max_interval_factor
+        self.backoff_factor = backoff_factor
+        self.stable_runs = stable_runs
+
+        self.intervals = {check.name: check.interval for check in checks}
+        self.stable_counts = {check.name: 0 for check in checks}
+        self.run_counts = {check.name: 0 for check in checks}
+        self.due_times = {
+            check.name: start + self._fraction(check.name, "offset") * check.interval
+            for check in checks
+        }
+        # heap of (due epoch_ts, check name)
+        self._queue = [(due, name) for name, due in self.due_times.items()]
+        heapq.heapify(self._queue)
+
+    @staticmethod
+    def _fraction(*key) -> float:
+        """deterministic pseudo-random number in [0, 1) derived from key"""
+        digest = hashlib.sha1(":".join(map(str, key)).encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64
+
+    def next_due(self) -> float:
+        """epoch timestamp at which the next check is due"""
+        return self._queue[0][0]
+
+    def pop_due(self, now: float) -> List[CheckConfig]:
+        """remove and return all checks due at or before now"""
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due.append(self.checks[heapq.heappop(self._queue)[1]])
+        return due
+
+    def record(self, check: CheckConfig, status: str, now: float) -> float:
+        """
+        record the status a check run produced at now, adapt its interval, and schedule
+        its next run; returns the next due epoch timestamp
+        """
+        name = check.name
+        self.run_counts[name] += 1
+
+        if status in (Status.FAILED.value, Status.DEGRADED.value):
+            self.stable_counts[name] = 0
+            self.intervals[name] = check.interval * self.min_interval_factor
+        elif status == Status.SUCCESS.value:
+            if self.intervals[name] < check.interval:
+                # recovered from an incident
+                self.intervals[name] = check.interval
+            self.stable_counts[name] += 1
+            if self.stable_counts[name] % self.stable_runs == 0:
+                self.intervals[name] = min(
+                    self.intervals[name] * self.backoff_factor,
+                    check.interval * self.max_interval_factor,
+                )
+        else:
+            self.stable_counts[name] = 0
+            self.intervals[name] = check.interval
+
+        jitter = self.jitter * (2 * self._fraction(name, self.run_counts[name]) - 1)
+        due = now + self.intervals[name] * (1 + jitter)
+        self.due_times[name] = due
+        heapq.heappush(self._queue, (due, name))
+        logger.debug(
+            f"check {name} status {status}: interval {self.intervals[name]:.1f}s, "
+            f"next due at {epoch_to_zulu(due)}"
+        )
+        return due
+
+
+def run_schedule(
+    scheduler: AdaptiveScheduler,
+    run_checks: Callable[[List[CheckConfig]], List[Tuple[CheckConfig, StatusRecord]]],
+    clock: Callable[[], float] = time.time,
+    sleep: Callable[[float], None] = time.sleep,
+    until: Optional[float] = None,
+):
+    """
+    Run checks as the scheduler makes them due, until the epoch timestamp `until` (or
+    forever). All checks due at the same time are passed to run_checks together, which
+    returns each check with its resulting StatusRecord.
+    """
+    while until is None or scheduler.next_due() <= until:
+        sleep(max(0.0, scheduler.next_due() - clock()))
+        due = scheduler.pop_due(clock())
+        if not due:
+            continue
+        for check, record in run_checks(due):
+            scheduler.record(check, record.status, clock())
+
+
+@dataclass(config=ConfigDict(use_enum_values=True))
+class AlertRoute:
+    """
+    Maps alerts to a status file for the `serve` command: alerts whose labels include all
+    the `match` labels set the status of `filepath` to `firing_status` while firing, and to
+    success once resolved.
+    """
+
+    match: Dict[str, str]
+    filepath: str
+    firing_status: Status = Status.FAILED.value
+
+
+_alert_routes_adapter = TypeAdapter(List[AlertRoute])
+
+
+def load_alert_routes(routes_path: str) -> List[AlertRoute]:
+    """load a JSON routes file containing a list of AlertRoute objects"""
+    with open(routes_path) as f:
+        return _alert_routes_adapter.validate_json(f.read())
+
+
+def _parse_alert_time(timestamp: str) -> Optional[float]:
+    """
+    epoch timestamp of an Alertmanager RFC3339 time, or None for a missing or zero time;
+    Alertmanager sends 0001-01-01T00:00:00Z for the end of a still firing alert
+    """
+    if not timestamp or timestamp.startswith("0001-"):
+        return None
+    # older pythons' fromisoformat accept neither Z nor alertmanager's nanoseconds
+    timestamp = timestamp.replace("Z", "+00:00")
+    if "." in timestamp:
+        seconds, fraction = timestamp.split(".", 1)
+        digits = len(fraction) - len(fraction.lstrip("0123456789"))
+        timestamp = f"{seconds}.{fraction[:min(digits, 6)]}{fraction[digits:]}"
+    return datetime.datetime.fromisoformat(timestamp).timestamp()
+
+
+class AlertHistory:
+    """
+    The status last recorded for each alert and status file, so that the notifications
+    Alertmanager re-sends for alerts still firing (every repeat_interval, and whenever
+    their group changes) are not appended to the status logs again. Alerts are identified
+    by their fingerprint, or else their labels and start time. Only the `max_alerts` most
+    recently recorded alerts are remembered.
+    """
+
+    def __init__(self, max_alerts: int = 10000):
+        self.max_alerts = max_alerts
+        self._recorded: Dict[tuple, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def alert_key(alert: dict) -> tuple:
+        """the identity of an alert across notifications"""
+        if alert.get("fingerprint"):
+            return (alert["fingerprint"],)
+        return (alert.get("startsAt"), tuple(sorted(alert.get("labels", {}).items())))
+
+    def record(self, filepath: str, alert: dict, record: StatusRecord) -> bool:
+        """remember record for the alert, returning False if it was already recorded"""
+        key = (filepath,) + self.alert_key(alert)
+        recorded = (record.status, record.epoch_ts)
+        with self._lock:
+            if self._recorded.get(key) == recorded:
+                return False
+            # most recently recorded last, so the oldest are dropped first
+            self._recorded.pop(key, None)
+            self._recorded[key] = recorded
+            while len(self._recorded) > self.max_alerts:
+                del self._recorded[next(iter(self._recorded))]
+        return True
+
+
+def alerts_to_records(
+    payload: dict, routes: List[AlertRoute], history: Optional[AlertHistory] = None
+) -> List[Tuple[str, StatusRecord]]:
+    """
+    Convert an Alertmanager webhook payload into (filepath, StatusRecord) pairs, one per
+    alert and matching route. Given a history, re-sent notifications of alerts whose
+    status was already recorded are dropped.
+    """
+    records = []
+    for alert in payload.get("alerts", []):
+        labels = alert.get("labels", {})
+        firing = alert.get("status") == "firing"
+        for route in routes:
+            if all(labels.get(name) == value for name, value in route.match.items()):
+                epoch_ts = _parse_alert_time(
+                    alert.get("startsAt") if firing else alert.get("endsAt")
+                )
+                record = StatusRecord(
+                    status=route.firing_status if firing else Status.SUCCESS.value
+                )
+                if epoch_ts is not None:
+                    record.epoch_ts = epoch_ts
+                if history is not None and not history.record(
+                    route.filepath, alert, record
+                ):
+                    logger.debug(f"dropping re-sent alert for {route.filepath}")
+                    continue
+                records.append((route.filepath, record))
+    return records
+
+
+class StatusBatcher:
+    """
+    Collects (filepath, StatusRecord) pairs from any thread, and passes everything
+    collected to write_fn every `interval` seconds from a single background thread, so
+    that bursts of updates become a single commit and push.
+    """
+
+    def __init__(
+        self,
+        write_fn: Callable[[List[Tuple[str, StatusRecord]]], object],
+        interval: float = 10.0,
+    ):
+        self.write_fn = write_fn
+        self.interval = interval
+        self._pending: List[Tuple[str, StatusRecord]] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    def add(self, records: List[Tuple[str, StatusRecord]]):
+        """queue records to be written with the next batch"""
+        with self._lock:
+            self._pending.extend(records)
+
+    def flush(self) -> int:
+        """write all queued records now; returns the number written"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            logger.info(f"writing batch of {len(batch)} status records")
+            try:
+                self.write_fn(sorted(batch, key=lambda item: item[1].epoch_ts))
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("failed to write batch of status records")
+        return len(batch)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        """start flushing every interval in a background thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """stop the background thread, and write anything still queued"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler for the `serve` command, accepting
+      POST /alertmanager  an Alertmanager webhook payload, mapped to status files by the
+                          server's alert routes
+      POST /status        a JSON object with filepath, status and optionally value and
+                          epoch_ts, for one of the status files in the alert routes
+    The server is expected to have `routes`, `batcher`, `alert_history` and `auth_token`
+    attributes.
+    """
+
+    def _respond(self, code: int, body: dict):
+        content = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _status_records(self, payload: dict) -> List[Tuple[str, StatusRecord]]:
+        filepath = payload.pop("filepath", None)
+        if filepath not in {route.filepath for route in self.server.routes}:
+            raise ValueError(
+                f"filepath {filepath!r} is not one of the routed filepaths"
+            )
+        return [(filepath, StatusRecord(**payload))]
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """handle a webhook"""
+        auth_token = self.server.auth_token
+        if auth_token and self.headers.get("Authorization") != f"Bearer {auth_token}":
+            self._respond(401, {"error": "unauthorized"})
+            return
+
+        handlers = {
+            "/alertmanager": lambda payload: alerts_to_records(
+                payload, self.server.routes, self.server.alert_history
+            ),
+            "/status": self._status_records,
+        }
+        if self.path not in handlers:
+            self._respond(404, {"error": f"unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            if not isinstance(payload, dict):
+                raise ValueError("expected a JSON object")
+            records = handlers[self.path](payload)
+        except (ValueError, TypeError, ValidationError) as exc:
+            self._respond(400, {"error": str(exc)})
+            return
+
+        self.server.batcher.add(records)
+        self._respond(202, {"queued": len(records)})
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def make_webhook_server(
+    host: str,
+    port: int,
+    routes: List[AlertRoute],
+    batcher: StatusBatcher,
+    auth_token: Optional[str] = None,
+) -> ThreadingHTTPServer:
+    """create (but don't start) the webhook receiver HTTP server for `serve`"""
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.routes = routes
+    server.batcher = batcher
+    server.alert_history = AlertHistory()
+    server.auth_token = auth_token
+    return server
+
+
+class VirtualClock:
+    """
+    Clock for `simulate`. Sleeping skips ahead instantly, while time spent working passes
+    at real speed, so a simulation runs as much faster than real time as the checker is
+    idle, and work that cannot keep up with the schedule still makes checks run late.
+    """
+
+    def __init__(self, start: float):
+        self.start = start
+        self._skipped = 0.0
+        self._real_start = time.monotonic()
+
+    def now(self) -> float:
+        """the current virtual epoch timestamp"""
+        return self.start + self._skipped + time.monotonic() - self._real_start
+
+    def sleep(self, seconds: float):
+        """skip ahead by seconds of virtual time"""
+        self._skipped += max(0.0, seconds)
+
+
+def _stand_in_value(check: CheckConfig, healthy: bool) -> float:
+    """a query value that the check evaluates as success if healthy, and failed if not"""
+    wanted = Status.SUCCESS.value if healthy else Status.FAILED.value
+    for value in (
+        check.success_value,
+        check.success_value + 1,
+        check.success_value - 1,
+    ):
+        if (
+            evaluate_status(value, check.success_condition, check.success_value)
+            == wanted
+        ):
+            return value
+    return check.success_value
+
+
+class StandInBackendHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler for `simulate`, standing in for the metrics backends of the configured
+    checks. Each check queries its own url path prefix, the quoted check name, with
+      GET  /<name>/api/v1/query  prometheus
+      GET  /<name>/query         InfluxDB 1.x
+      POST /<name>/api/v2/query  InfluxDB 2.x Flux
+    and is answered with the current virtual time and a value that is unhealthy with
+    probability failure_rate. The server is expected to have `checks` (by name), `clock`,
+    `failure_rate`, `latency` and `random` attributes.
+    """
+
+    def _respond(self, code: int, content: bytes, content_type="application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _sample(self) -> Tuple[str, Optional[Tuple[float, float]]]:
+        """the api path requested and a sample for the check it is for, if any"""
+        _empty, name, api_path = urlsplit(self.path).path.split("/", 2)
+        check = self.server.checks.get(unquote(name))
+        if check is None:
+            return api_path, None
+        time.sleep(self.server.latency)
+        healthy = self.server.random.random() >= self.server.failure_rate
+        return api_path, (self.server.clock(), _stand_in_value(check, healthy))
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """answer a prometheus or InfluxDB 1.x query"""
+        api_path, sample = self._sample()
+        if sample is None or api_path not in ("api/v1/query", "query"):
+            self._respond(404, b"{}")
+            return
+        epoch_ts, value = sample
+        if api_path == "query":
+            iso_time = datetime.datetime.fromtimestamp(
+                epoch_ts, datetime.timezone.utc
+            ).isoformat()
+            series = {"name": "simulated", "columns": ["time", "last"]}
+            body = {"results": [{"series": [series | {"values": [[iso_time, value]]}]}]}
+        else:
+            result = [{"metric": {}, "value": [epoch_ts, str(value)]}]
+            body = {"status": "success", "data": {"result": result}}
+        self._respond(200, json.dumps(body).encode())
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """answer an InfluxDB 2.x Flux query"""
+        api_path, sample = self._sample()
+        if sample is None or api_path != "api/v2/query":
+            self._respond(404, b"{}")
+            return
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        epoch_ts, value = sample
+        csv_rows = [
+            "#datatype,string,long,dateTime:RFC3339,double",
+            ",result,table,_time,_value",
+            f",_result,0,{epoch_to_zulu(epoch_ts)},{value}",
+        ]
+        self._respond(200, "\r\n".join(csv_rows).encode(), "text/csv")
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def make_stand_in_server(
+    checks: List[CheckConfig],
+    clock: Callable[[], float],
+    failure_rate: float = 0.1,
+    latency: float = 0.0,
+    seed: int = 0,
+) -> ThreadingHTTPServer:
+    """create (but don't start) the stand-in metrics backend server for `simulate`"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInBackendHandler)
+    server.checks = {check.name: check for check in checks}
+    server.clock = clock
+    server.failure_rate = failure_rate
+    server.latency = latency
+    server.random = random.Random(seed)
+    return server
+
+
+class TimedGitBackend(GitBackend):
+    """GitBackend wrapper recording the real duration of each commit and push"""
+
+    def __init__(self, backend: GitBackend):
+        self.backend = backend
+        self.name = backend.name
+        self.commit_seconds: List[float] = []
+        self.push_seconds: List[float] = []
+
+    def clone(self, git_url: str, git_branch: str, git_dir: str, depth=10):
+        return self.backend.clone(git_url, git_branch, git_dir, depth=depth)
+
+    def commit(
+        self,
+        filepaths: List[str],
+        commit_message="[automated] update health report",
+    ) -> str:
+        start = time.monotonic()
+        sha = self.backend.commit(filepaths, commit_message)
+        self.commit_seconds.append(time.monotonic() - start)
+        return sha
+
+    def push(self, git_push_url: str):
+        start = time.monotonic()
+        res = self.backend.push(git_push_url)
+        self.push_seconds.append(time.monotonic() - start)
+        return res
+
+    def close(self):
+        self.backend.close()
+
+
+def make_simulation_remote(remote_path: PosixPath) -> git.Repo:
+    """create a local bare repo with an initial commit on main, to push simulated results to"""
+    seed_path = remote_path.with_name(remote_path.name + ".seed")
+    seed = git.Repo.init(seed_path, initial_branch="main")
+    readme = seed_path / "README.md"
+    readme.write_text("status repo for status_pusher simulate\n")
+    seed.index.add([str(readme)])
+    seed.index.commit("initial commit")
+    remote = seed.clone(str(remote_path), bare=True)
+    shutil.rmtree(seed_path)
+    return remote
+
+
+def _tree_size(path: PosixPath) -> int:
+    """total size in bytes of the files under path"""
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def simulate_schedule(
+    checks: List[CheckConfig],
+    duration: float,
+    workdir: PosixPath,
+    git_backend: str = GitPythonBackend.name,
+    summary: bool = False,
+    partition: bool = False,
+    snapshot_interval: float = 0,
+    failure_rate: float = 0.1,
+    latency: float = 0.0,
+    timeout: Tuple[float, float] = DEFAULT_QUERY_TIMEOUT,
+    **scheduler_kwargs,
+) -> dict:
+    """
+    Simulate running the checks with `schedule` for `duration` seconds, on a VirtualClock,
+    against stand-in metrics backends and a local bare remote repo in workdir, returning a
+    report of how well the checker and status repo kept up.
+    The real query, evaluation, writing, commit and push code is used throughout; only
+    idle time is skipped, so the time spent on work is real and shows up as checks
+    running late, or missing whole intervals, once the schedule is more than one checker
+    host can keep up with.
+    """
+    workdir = PosixPath(workdir)
+    remote_path = workdir / "remote.git"
+    make_simulation_remote(remote_path)
+    git_dir = str(workdir / "clone")
+
+    clock = VirtualClock(time.time())
+    server = make_stand_in_server(checks, clock.now, failure_rate, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    checks = [
+        dataclasses.replace(check, url=f"{base_url}/{quote(check.name, safe='')}")
+        for check in checks
+    ]
+
+    backend = TimedGitBackend(GIT_BACKENDS[git_backend]())
+    shared_git_dir = SharedGitDir(git_dir)
+    with shared_git_dir.lock():
+        backend.clone(str(remote_path), "main", git_dir)
+    snapshot_sink = (
+        DirectorySink(workdir / "sink", summary, partition)
+        if snapshot_interval
+        else None
+    )
+    git_sink = GitSink(
+        backend,
+        git_dir,
+        summary,
+        str(remote_path),
+        snapshot_sink,
+        snapshot_interval,
+        partition,
+        clock=clock.now,
+    )
+    sinks = [sink for sink in (snapshot_sink, git_sink) if sink is not None]
+
+    def write_to_sinks(records: List[Tuple[str, StatusRecord]]):
+        for sink in sinks:
+            sink.write(records)
+
+    scheduler = AdaptiveScheduler(checks, clock.start, **scheduler_kwargs)
+    queue_depths, lateness, statuses = [], [], Counter()
+    last_runs: Dict[str, float] = {}
+    missed_intervals = 0
+
+    def run_and_write(due: List[CheckConfig]) -> List[Tuple[CheckConfig, StatusRecord]]:
+        nonlocal missed_intervals
+        queue_depths.append(len(due))
+        results = []
+        for check in due:
+            now = clock.now()
+            # time spent waiting behind other due checks
+            lateness.append(now - scheduler.due_times[check.name])
+            # the next run is scheduled from the end of the last one, so a check that
+            # takes too long to run, commit and push slips by whole intervals
+            if check.name in last_runs:
+                gap = now - last_runs[check.name]
+                missed_intervals += max(
+                    0, round(gap / scheduler.intervals[check.name]) - 1
+                )
+            last_runs[check.name] = now
+            record = run_check(check, timeout)
+            statuses[record.status] += 1
+            results.append((check, record))
+        shared_git_dir.submit(
+            [(check.filepath, record) for check, record in results],
+            write_to_sinks,
+            git_sink.push,
+        )
+        return results
+
+    remote_bytes_start = _tree_size(remote_path)
+    real_start = time.monotonic()
+    try:
+        run_schedule(
+            scheduler, run_and_write, clock.now, clock.sleep, clock.start + duration
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+        backend.close()
+    real_seconds = time.monotonic() - real_start
+    virtual_seconds = clock.now() - clock.start
+    remote_bytes = _tree_size(remote_path)
+
+    def rounded(value: Optional[float], digits: int = 3) -> Optional[float]:
+        return None if value is None else round(value, digits)
+
+    virtual_hours = virtual_seconds / 3600
+    return {
+        "checks": len(checks),
+        "virtual_seconds": round(virtual_seconds, 1),
+        "real_seconds": round(real_seconds, 1),
+        "speedup": round(virtual_seconds / real_seconds, 1),
+        "runs": sum(statuses.values()),
+        "statuses": dict(statuses),
+        "queue_depth_max": max(queue_depths, default=0),
+        "queue_depth_mean": rounded(
+            sum(queue_depths) / len(queue_depths) if queue_depths else None
+        ),
+        "lateness_p95_seconds": rounded(_percentile(lateness, 95)),
+        "lateness_max_seconds": rounded(max(lateness, default=None)),
+        "missed_intervals": missed_intervals,
+        "commits": len(backend.commit_seconds),
+        "commits_per_hour": round(len(backend.commit_seconds) / virtual_hours, 1),
+        "commit_p95_seconds": rounded(_percentile(backend.commit_seconds, 95)),
+        "pushes": len(backend.push_seconds),
+        "pushes_per_hour": round(len(backend.push_seconds) / virtual_hours, 1),
+        "push_p95_seconds": rounded(_percentile(backend.push_seconds, 95)),
+        "remote_bytes": remote_bytes,
+        "remote_growth_bytes_per_day": round(
+            (remote_bytes - remote_bytes_start) * 86400 / virtual_seconds
+        ),
+    }
+
+
+# subcommands that produce a single measurement in ctx.obj, which the cli group then
+# evaluates, logs, commits and pushes
+POINT_QUERY_COMMANDS = ("promq", "influxq", "fluxq")
+# subcommands that run the single check given by the --query and --filepath options
+SINGLE_CHECK_COMMANDS = POINT_QUERY_COMMANDS + ("backfill",)
+# subcommands that work in their own local repos rather than the --git-url clone
+LOCAL_COMMANDS = ("simulate",)
+
+
+@click.group()
+@click.option(
+    "--query",
+    help="query to gather metrics with. Required for promq, influxq, fluxq and backfill.",
+)
+@click.option(
+    "--success-condition",
+    #    required=True,
+    help="Comparison operator to determine success.\n"
+    "Metric value produced by query will be compared with the value provided by --success-value\n"
     "to determine success vs failure.",
     type=click.Choice(ConditionComparitor.__members__),
     default=ConditionComparitor.eq.name,
     show_default=True,
 )
 @click.option(
-    "--success-value",
-    #    required=True,
-    help="Value with which to compare query metric result to determine success.\n"
-    "Metric value produced by query will be compared this value using the comparitor operator\n"
-    "provided with --success-condition",
-    type=float,
+    "--success-value",
+    #    required=True,
+    help="Value with which to compare query metric result to determine success.\n"
+    "Metric value produced by query will be compared this value using the comparitor operator\n"
+    "provided with --success-condition",
+    type=float,
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--filepath",
+    help="filepath to append measurements to relative to root of git repo directory. "
+    "Required for promq, influxq, fluxq and backfill.",
+)
+@click.option(
+    "--git-url",
+    default="http://github.com/org/repo/",
+    show_default=True,
+    help="git repo for status files",
+)
+@click.option(
+    "--git-branch",
+    default="main",
+    show_default=True,
+    help="git branch to commit status files to, and push",
+)
+@click.option(
+    "--git-backend",
+    type=click.Choice(GIT_BACKENDS),
+    default=GitPythonBackend.name,
+    show_default=True,
+    help="git implementation: `gitpython` runs the git executable, `dulwich` performs "
+    "clone, fetch, commit and push in-process without forking git.",
+)
+@click.option(
+    "--git-dir",
+    default="/tmp/repo",
+    show_default=True,
+    help="local path for git cloned repo",
+)
+@click.option(
+    "--shards",
+    "shards_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON file with a list of shards of the status output, each with a `name`, "
+    "`match` (filepath globs) and a `git_branch` and/or `git_url` (and `git_push_url`) "
+    "to commit matching status files to instead. Each shard is cloned to "
+    "<git-dir>.shards/<name> and pushed independently; `publish` merges them into --git-branch.",
+)
+@click.option(
+    "--sink-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="also write status logs to this local directory, eg one served over HTTP. "
+    "With --s3-url, this is the staging directory for uploads.",
+)
+@click.option(
+    "--s3-url",
+    default=None,
+    help="also write status logs to an S3 compatible object store, at s3://bucket/prefix. "
+    "Requires boto3, configured with the usual AWS environment variables.",
+)
+@click.option(
+    "--s3-endpoint-url",
+    default=None,
+    help="endpoint of the S3 compatible object store, eg http://minio:9000  "
+    "[default: AWS S3]",
+)
+@click.option(
+    "--git-snapshot-interval",
+    default=0.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="with --sink-dir or --s3-url, only commit a snapshot of their status logs to git "
+    "at most every this many seconds, rather than committing every update. 0 commits "
+    "every update.",
+)
+@click.option(
+    "--lock-timeout",
+    default=60.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="seconds to wait for other status_pusher processes using the same --git-dir",
+)
+@click.option(
+    "--maintenance-interval",
+    default=86400.0,
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    help="seconds between maintenance runs (repack, prune, commit-graph) of the --git-dir "
+    "clone, by the maintain command or in the background of schedule and serve",
+)
+@click.option(
+    "--maintenance-max-loose-objects",
+    default=1000,
+    type=click.IntRange(min=0),
+    show_default=True,
+    help="run maintenance before --maintenance-interval has passed if the clone has more "
+    "loose objects than this",
+)
+@click.option(
+    "--maintenance-max-packs",
+    default=20,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="run maintenance before --maintenance-interval has passed if the clone has more "
+    "packs than this",
+)
+@click.option(
+    "--verbose",
+    default=False,
+    is_flag=True,
+    show_default=True,
+    help="add debug output",
+)
+@click.option(
+    "--summary",
+    default=False,
+    is_flag=True,
+    show_default=True,
+    help="also maintain a per-day summary file next to the log file (eg report.summary.json) "
+    "for the Fettle frontend, and commit it with the log file.",
+)
+@click.option(
+    "--partition-logs",
+    default=False,
+    is_flag=True,
+    show_default=True,
+    help="write measurements to monthly partitions of the log file (eg report.2026-10.log), "
+    "listed in a manifest file next to it (eg report.manifest.json), rather than to the "
+    "log file itself.",
+)
+@click.option(
+    "--fleet-node-id",
+    default=None,
+    help="ID of this checker node in a fleet. Together with --fleet-members, checks are "
+    "assigned to fleet nodes by consistent hashing of --filepath, and this node only runs "
+    "the checks assigned to it.",
+)
+@click.option(
+    "--fleet-members",
+    default=None,
+    help="comma separated IDs of all checker nodes in the fleet, including this one.",
+)
+@click.option(
+    "--fleet-replicas",
     default=1,
+    type=click.IntRange(min=1),
     show_default=True,
+    help="number of fleet nodes that run each check.",
 )
 @click.option(
-    "--filepath",
-    required=True,
-    help="filepath to append measurements to relative to root of git repo directory",
+    "--connect-timeout",
+    default=DEFAULT_QUERY_TIMEOUT[0],
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    help="seconds to wait to connect to a metrics backend",
 )
 @click.option(
-    "--git-url",
-    default="http://github.com/org/repo/",
+    "--read-timeout",
+    default=DEFAULT_QUERY_TIMEOUT[1],
+    type=click.FloatRange(min=0, min_open=True),
     show_default=True,
-    help="git repo for status files",
+    help="seconds to wait for a metrics backend to respond",
 )
 @click.option(
-    "--git-branch",
-    default="main",
+    "--breaker-failure-rate",
+    default=0.5,
+    type=click.FloatRange(0, 1, min_open=True),
     show_default=True,
-    help="NOT IMPLEMENTED! `main` git branch will be used.",
+    help="fraction of failed requests to a metrics backend URL within --breaker-window "
+    "that opens its circuit breaker; while open, queries to it fail fast and record an "
+    "unknown status.",
 )
 @click.option(
-    "--git-dir",
-    default="/tmp/repo",
+    "--breaker-window",
+    default=60.0,
+    type=click.FloatRange(min=0, min_open=True),
     show_default=True,
-    help="local path for git cloned repo",
+    help="seconds of request outcomes a circuit breaker considers",
 )
 @click.option(
-    "--verbose",
-    default=False,
-    is_flag=True,
+    "--breaker-reset-timeout",
+    default=30.0,
+    type=click.FloatRange(min=0),
     show_default=True,
-    help="add debug output",
+    help="seconds an open circuit breaker waits before letting a trial request through",
+)
+@click.option(
+    "--hedge-percentile",
+    default=95.0,
+    type=click.FloatRange(0, 100),
+    show_default=True,
+    help="when a metrics backend has several replica urls, a query is also sent to the "
+    "next replica if the current one has not answered within this percentile of its "
+    "recent latencies",
+)
+@click.option(
+    "--hedge-delay",
+    default=1.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="seconds to wait before hedging to the next replica while a replica's latency "
+    "is not yet known",
 )
 @click.option(
     "--git-push-url",
@@ -331,9 +3366,31 @@ def cli(
     success_value: float,
     git_url: str,
     git_branch: str,
+    git_backend: str,
     git_dir: str,
+    shards_path: str,
     filepath: str,
+    sink_dir: str,
+    s3_url: str,
+    s3_endpoint_url: str,
+    git_snapshot_interval: float,
+    lock_timeout: float,
+    maintenance_interval: float,
+    maintenance_max_loose_objects: int,
+    maintenance_max_packs: int,
     verbose: bool,
+    summary: bool,
+    partition_logs: bool,
+    fleet_node_id: str,
+    fleet_members: str,
+    fleet_replicas: int,
+    connect_timeout: float,
+    read_timeout: float,
+    breaker_failure_rate: float,
+    breaker_window: float,
+    breaker_reset_timeout: float,
+    hedge_percentile: float,
+    hedge_delay: float,
     git_push_url: str,
 ) -> bool:
     """Queries a metrics source, evaluates success criterion, and updates a status file in git"""
@@ -341,14 +3398,101 @@ def cli(
     # ensure we got a StatusRecord object in case we were invoked outside __main__
     ctx.ensure_object(StatusRecord)
 
-    # TODO handle non-default branch
-    if git_branch != "main":
-        raise NotImplementedError(
-            "status_pusher currently always uses the default branch"
+    # shared with subcommands that query metrics backends
+    ctx.meta["query_timeout"] = (connect_timeout, read_timeout)
+    circuit_breakers.configure(
+        failure_rate=breaker_failure_rate,
+        window=breaker_window,
+        reset_timeout=breaker_reset_timeout,
+    )
+    replica_selector.configure(percentile=hedge_percentile, default_delay=hedge_delay)
+
+    single_check = ctx.invoked_subcommand in SINGLE_CHECK_COMMANDS
+    if single_check:
+        for name, value in (("query", query), ("filepath", filepath)):
+            if not value:
+                raise click.MissingParameter(ctx=ctx, param_hint=f"--{name}")
+
+    members = None
+    if fleet_members:
+        if not fleet_node_id:
+            raise click.BadParameter(
+                "--fleet-node-id is required with --fleet-members",
+                param_hint="--fleet-node-id",
+            )
+        members = [member.strip() for member in fleet_members.split(",")]
+        if fleet_node_id not in members:
+            raise click.BadParameter(
+                f"{fleet_node_id} is not one of the fleet members {members}",
+                param_hint="--fleet-node-id",
+            )
+    # shared with subcommands that run several checks
+    ctx.meta["fleet_members"] = members
+
+    if members and single_check:
+        if not fleet_owns_check(filepath, fleet_node_id, members, fleet_replicas):
+            logger.info(
+                f"check for {filepath} is assigned to other fleet members; "
+                f"node {fleet_node_id} skipping it"
+            )
+            ctx.exit(0)
+        logger.debug(f"check for {filepath} is assigned to node {fleet_node_id}")
+
+    if ctx.invoked_subcommand in LOCAL_COMMANDS:
+        return
+
+    sinks = []
+    if s3_url:
+        staging_dir = sink_dir or str(git_dir).rstrip("/") + ".s3"
+        sinks.append(
+            S3Sink(s3_url, staging_dir, summary, partition_logs, s3_endpoint_url)
+        )
+    elif sink_dir:
+        sinks.append(DirectorySink(sink_dir, summary, partition_logs))
+    if git_snapshot_interval and not sinks:
+        raise click.UsageError(
+            "--git-snapshot-interval requires --sink-dir or --s3-url"
         )
 
-    git_repo = git_clone(git_url, git_branch, git_dir)
-    logger.info(f"git_repo: {git_repo}")
+    def open_shard(shard: ShardConfig, owns: Callable[[str], bool]) -> Shard:
+        return Shard(
+            shard,
+            shard_git_dir(git_dir, shard.name),
+            GIT_BACKENDS[git_backend](),
+            sinks,
+            summary,
+            partition_logs,
+            git_snapshot_interval,
+            lock_timeout,
+            owns,
+            interval=maintenance_interval,
+            max_loose_objects=maintenance_max_loose_objects,
+            max_packs=maintenance_max_packs,
+        )
+
+    router = ShardRouter(
+        ShardConfig(DEFAULT_SHARD, ["*"], git_url, git_branch, git_push_url),
+        load_shards(shards_path) if shards_path else [],
+        open_shard,
+    )
+    # close callbacks run last registered first, so this runs after the commit and push
+    ctx.call_on_close(router.close)
+    # single checks only need the clone of the shard their filepath belongs to
+    if ctx.invoked_subcommand in SINGLE_CHECK_COMMANDS and filepath:
+        shard = router.get(router.shard_for(filepath))
+    else:
+        shard = router.get(router.default)
+
+    # shared with subcommands that do their own writing, committing and pushing
+    ctx.meta["shard_router"] = router
+    ctx.meta["shard"] = shard
+    ctx.meta["git_backend"] = shard.backend
+    ctx.meta["shared_git_dir"] = shard.shared_git_dir
+    ctx.meta["submit_records"] = router.submit
+    ctx.meta["repo_maintainer"] = shard.maintainer
+
+    if ctx.invoked_subcommand not in POINT_QUERY_COMMANDS:
+        return
 
     # queries specified by subcommand now are executed, populating ctx.obj:StatusRecord
     # and finally the call_on_close handler below does the commit and push
@@ -366,12 +3510,8 @@ def cli(
         )
 
         # handle success/failure criteria
-        ctx.obj.status = (
-            Status.SUCCESS.value
-            if ConditionComparitor[success_condition].value(
-                ctx.obj.value, success_value
-            )
-            else Status.FAILED.value
+        ctx.obj.status = evaluate_status(
+            ctx.obj.value, success_condition, success_value
         )
         logger.debug(
             f"Computed {ConditionComparitor[success_condition].value}"
@@ -379,37 +3519,20 @@ def cli(
             f" == {ctx.obj.status}"
         )
 
-        logger.debug(f"writing report file at {filepath}")
-        logger.debug(f"Data record:\n{pprint.pformat(ctx.obj)}")
-
-        report_file = PosixPath(git_dir, filepath)
-        update_log_file(report_file, ctx.obj.epoch_ts, ctx.obj.value, ctx.obj.status)
-
-        logger.info(f"updated log file: {report_file}")
-
-        commit_res = commit(git_repo, git_branch, report_file)
-        logger.info(f"commit result: {commit_res}")
-
-        # push repo
-        # Note that auth implementation will vary between types of remote and auth mechanism.
-        # Note also that Github PAT token can (and may actually have to be) incorporated into
-        # the URL itself, but it's not permitted to include it in the URL just for pulling
-        if git_push_url:
-            push_res = push(git_repo, git_branch, git_push_url)
-            logger.info(f"push result: {push_res}")
-        else:
-            logger.info("Will not push because git_push_url == False")
+        router.submit([(filepath, ctx.obj)])
 
 
 @click.option(
     "--url",
-    default="http://prometheus:8086/",
+    default=["http://prometheus:8086/"],
+    multiple=True,
     show_default=True,
-    help="url for prometheus endpoint",
+    help="url for prometheus endpoint. Repeat for replicas of the same prometheus; queries "
+    "are hedged across them.",
 )
 @cli.command()
 @click.pass_context
-def promq(ctx, url: str):
+def promq(ctx, url: Tuple[str, ...]):
     """
     Prometheus query command wrapped to do pre and post git actions.
     Performs checkout, pull, prometheus_query, success condition evaluation, log result,
@@ -420,11 +3543,19 @@ def promq(ctx, url: str):
         f"and command params {ctx.params}"
     )
 
-    prom_url = ctx.params["url"]
+    prom_urls = ctx.params["url"]
     prom_query = ctx.parent.params["query"]
 
-    logger.debug(f'calling prometheus_query({"prom_query"}, {"prom_url"})')
-    epoch_ts, value = prometheus_query(prom_query, prom_url)
+    logger.debug(f'calling prometheus_query({"prom_query"}, {"prom_urls"})')
+    timeout = ctx.meta["query_timeout"]
+    try:
+        epoch_ts, value = hedged_query(
+            lambda prom_url: prometheus_query(prom_query, prom_url, timeout), prom_urls
+        )
+    except CircuitOpenError as exc:
+        # leave ctx.obj.value unset, so the cli handler records an unknown status
+        logger.warning(f"not querying prometheus: {exc}")
+        return
     logger.info(f"prometheus_query returned (epoch_ts, value): ({epoch_ts}, {value})")
 
     # populate context object for cli handler to access
@@ -440,9 +3571,11 @@ def promq(ctx, url: str):
 )
 @click.option(
     "--url",
-    default="http://influxdb:8086/",
+    default=["http://influxdb:8086/"],
+    multiple=True,
     show_default=True,
-    help="url for influxdb endpoint",
+    help="url for influxdb endpoint. Repeat for replicas of the same influxdb; queries "
+    "are hedged across them.",
 )
 @cli.command()
 @click.pass_context
@@ -458,11 +3591,22 @@ def influxq(ctx, db_name, url):
     )
 
     influxdb_db_name = ctx.params["db_name"]
-    influxdb_url = ctx.params["url"]
+    influxdb_urls = ctx.params["url"]
     influxdb_qry = ctx.parent.params["query"]
 
-    logger.debug(f'calling influxdb_query({"influxdb_qry"}, {"influxdb_url"})')
-    epoch_ts, value = influx_query(influxdb_db_name, influxdb_url, influxdb_qry)
+    logger.debug(f'calling influxdb_query({"influxdb_qry"}, {"influxdb_urls"})')
+    timeout = ctx.meta["query_timeout"]
+    try:
+        epoch_ts, value = hedged_query(
+            lambda influxdb_url: influx_query(
+                influxdb_db_name, influxdb_url, influxdb_qry, timeout
+            ),
+            influxdb_urls,
+        )
+    except CircuitOpenError as exc:
+        # leave ctx.obj.value unset, so the cli handler records an unknown status
+        logger.warning(f"not querying influxdb: {exc}")
+        return
     logger.info(f"influx_query returned (epoch_ts, value): ({epoch_ts}, {value})")
 
     # populate context object for cli handler to access
@@ -470,6 +3614,633 @@ def influxq(ctx, db_name, url):
     ctx.obj.value = value
 
 
+@click.option(
+    "--org",
+    required=True,
+    help="InfluxDB 2.x organisation to run the Flux query as",
+)
+@click.option(
+    "--token",
+    default=None,
+    help="InfluxDB 2.x API token. Prefer setting it in the environment, as "
+    "STATUS_PUSHER_FLUXQ_TOKEN.",
+)
+@click.option(
+    "--url",
+    default=["http://influxdb:8086/"],
+    multiple=True,
+    show_default=True,
+    help="url for influxdb endpoint. Repeat for replicas of the same influxdb; queries "
+    "are hedged across them.",
+)
+@cli.command()
+@click.pass_context
+def fluxq(ctx, org, token, url):
+    """
+    InfluxDB 2.x Flux query command wrapped to do pre and post git actions.
+    Performs checkout, pull, flux_query, success condition evaluation, log result,
+    commit, push. The last value of the query result is evaluated.
+    """
+    logger.debug(
+        f"fluxq command called with parent cli params {pprint.pformat(ctx.parent.params)}"
+    )
+
+    flux_qry = ctx.parent.params["query"]
+    timeout = ctx.meta["query_timeout"]
+    try:
+        epoch_ts, value = hedged_query(
+            lambda influxdb_url: flux_query(
+                org, influxdb_url, flux_qry, token, timeout
+            ),
+            url,
+        )
+    except CircuitOpenError as exc:
+        # leave ctx.obj.value unset, so the cli handler records an unknown status
+        logger.warning(f"not querying influxdb: {exc}")
+        return
+    logger.info(f"flux_query returned (epoch_ts, value): ({epoch_ts}, {value})")
+
+    # populate context object for cli handler to access
+    ctx.obj.epoch_ts = epoch_ts
+    ctx.obj.value = value
+
+
+@click.option(
+    "--since",
+    required=True,
+    type=click.DateTime(),
+    help="start of the period to backfill, in local time",
+)
+@click.option(
+    "--until",
+    default=None,
+    type=click.DateTime(),
+    help="end of the period to backfill, in local time  [default: now]",
+)
+@click.option(
+    "--step",
+    default="5m",
+    show_default=True,
+    help="interval between backfilled prometheus samples, eg `300` or `5m`. For influxdb "
+    "and flux, the query sets the interval (eg with GROUP BY time(5m)).",
+)
+@click.option(
+    "--source",
+    type=click.Choice(["prometheus", "influxdb", "flux"]),
+    default="prometheus",
+    show_default=True,
+    help="metrics source to query",
+)
+@click.option(
+    "--url",
+    default=["http://prometheus:8086/"],
+    multiple=True,
+    show_default=True,
+    help="url for the metrics source endpoint. Repeat for replicas; queries are hedged "
+    "across them.",
+)
+@click.option(
+    "--db-name",
+    default="mydb",
+    show_default=True,
+    help="database name to target with an InfluxDB query",
+)
+@click.option(
+    "--org",
+    default="",
+    help="InfluxDB 2.x organisation to run a Flux query as",
+)
+@click.option(
+    "--token",
+    default=None,
+    help="InfluxDB 2.x API token for a Flux query. Prefer setting it in the environment, "
+    "as STATUS_PUSHER_BACKFILL_TOKEN.",
+)
+@cli.command()
+@click.pass_context
+def backfill(ctx, since, until, step, source, url, db_name, org, token):
+    """
+    Fill gaps in a status log from a single range query.
+    Queries the metrics source once for every sample between --since and --until, evaluates
+    the success condition for all samples, merges the resulting records into the log in
+    timestamp order (skipping timestamps already logged), and commits and pushes them
+    together in a single commit.
+    """
+    params = ctx.parent.params
+    until = until or datetime.datetime.now()
+    since_ts, until_ts = since.astimezone().timestamp(), until.astimezone().timestamp()
+
+    if source == "prometheus":
+        samples = hedged_query(
+            lambda replica_url: prometheus_query_range(
+                params["query"],
+                replica_url,
+                since,
+                until,
+                step,
+                ctx.meta["query_timeout"],
+            ),
+            url,
+        )
+    elif source == "influxdb":
+        samples = hedged_query(
+            lambda replica_url: influx_query_range(
+                db_name, replica_url, params["query"], ctx.meta["query_timeout"]
+            ),
+            url,
+        )
+    else:
+        samples = hedged_query(
+            lambda replica_url: flux_query_range(
+                org, replica_url, params["query"], token, ctx.meta["query_timeout"]
+            ),
+            url,
+        )
+    samples = [sample for sample in samples if since_ts <= sample[0] <= until_ts]
+    logger.info(f"{source} returned {len(samples)} samples to backfill")
+
+    epoch_ts = [epoch_ts for epoch_ts, _value in samples]
+    values = [value for _epoch_ts, value in samples]
+    statuses = evaluate_statuses(
+        values, params["success_condition"], params["success_value"]
+    )
+    records = StatusRecordBatch.from_rows(zip(values, epoch_ts, statuses))
+
+    shard = ctx.meta["shard"]
+    with shard.shared_git_dir.lock():
+        report_file = PosixPath(shard.git_dir, params["filepath"])
+        if params["partition_logs"]:
+            log_batches = partition_records(report_file, records)
+        else:
+            log_batches = {report_file: records}
+
+        added, commit_files = 0, []
+        for log_file, batch in sorted(log_batches.items()):
+            log_added = merge_log_records(log_file, batch)
+            logger.info(f"added {log_added} records to log file: {log_file}")
+            if log_added:
+                added += log_added
+                commit_files.append(log_file)
+        if not added:
+            logger.info("nothing to backfill")
+            return
+
+        if params["partition_logs"]:
+            commit_files.append(update_manifest_file(report_file))
+        if params["summary"]:
+            commit_files.append(rebuild_summary_file(report_file))
+
+        commit_res = shard.backend.commit(
+            commit_files, f"[automated] backfill health report with {added} records"
+        )
+        logger.info(f"commit result: {commit_res}")
+
+        if shard.config.git_push_url:
+            push_res = shard.backend.push(shard.config.git_push_url)
+            logger.info(f"push result: {push_res}")
+        else:
+            logger.info("Will not push because git_push_url == False")
+
+
+def scheduler_options(command):
+    """click options configuring the AdaptiveScheduler, shared by schedule and simulate"""
+    for option in reversed(
+        [
+            click.option(
+                "--jitter",
+                default=0.1,
+                type=click.FloatRange(0, 1),
+                show_default=True,
+                help="fraction of its interval by which each check run is jittered",
+            ),
+            click.option(
+                "--min-interval-factor",
+                default=0.25,
+                type=click.FloatRange(0, 1, min_open=True),
+                show_default=True,
+                help="fraction of its interval a check runs at while FAILED or DEGRADED",
+            ),
+            click.option(
+                "--max-interval-factor",
+                default=4.0,
+                type=click.FloatRange(min=1),
+                show_default=True,
+                help="multiple of its interval a long stable check backs off to at most",
+            ),
+            click.option(
+                "--backoff-factor",
+                default=2.0,
+                type=click.FloatRange(min=1),
+                show_default=True,
+                help="factor by which a stable check's interval grows",
+            ),
+            click.option(
+                "--stable-runs",
+                default=3,
+                type=click.IntRange(min=1),
+                show_default=True,
+                help="consecutive successes after which a check's interval grows",
+            ),
+        ]
+    ):
+        command = option(command)
+    return command
+
+
+@click.option(
+    "--checks",
+    "checks_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON file with a list of checks, each with name, query, filepath and optionally "
+    "source (prometheus, influxdb or flux), url, db_name, org, token, success_condition, "
+    "success_value and interval (seconds).",
+)
+@scheduler_options
+@click.option(
+    "--duration",
+    default=None,
+    type=float,
+    help="seconds to run for  [default: run forever]",
+)
+@cli.command()
+@click.pass_context
+def schedule(
+    ctx,
+    checks_path,
+    jitter,
+    min_interval_factor,
+    max_interval_factor,
+    backoff_factor,
+    stable_runs,
+    duration,
+):
+    """
+    Run the checks configured in a checks file repeatedly, with adaptive intervals.
+    Checks are spread across their interval with deterministic jitter; stable checks
+    back off and failing checks are run more often. Checks that become due together are
+    committed and pushed together.
+    """
+    params = ctx.parent.params
+    checks = load_checks(checks_path)
+
+    members = ctx.meta["fleet_members"]
+    if members:
+        checks = [
+            check
+            for check in checks
+            if fleet_owns_check(
+                check.filepath,
+                params["fleet_node_id"],
+                members,
+                params["fleet_replicas"],
+            )
+        ]
+        logger.info(f"fleet node {params['fleet_node_id']} owns {len(checks)} checks")
+    if not checks:
+        logger.info("no checks to schedule")
+        return
+
+    def run_and_write(due: List[CheckConfig]) -> List[Tuple[CheckConfig, StatusRecord]]:
+        results = [
+            (check, run_check(check, ctx.meta["query_timeout"])) for check in due
+        ]
+        try:
+            ctx.meta["submit_records"](
+                [(check.filepath, record) for check, record in results]
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            # eg a rejected push or lock timeout; records committed but not pushed are
+            # pushed with the next batch, and the schedule must go on either way
+            logger.exception(f"failed to submit results of {len(results)} checks")
+        return results
+
+    now = time.time()
+    scheduler = AdaptiveScheduler(
+        checks,
+        now,
+        jitter=jitter,
+        min_interval_factor=min_interval_factor,
+        max_interval_factor=max_interval_factor,
+        backoff_factor=backoff_factor,
+        stable_runs=stable_runs,
+    )
+    # every shard checks write to is maintained, not just the default one
+    router = ctx.meta["shard_router"]
+    router.start_maintenance()
+    try:
+        run_schedule(
+            scheduler, run_and_write, until=None if duration is None else now + duration
+        )
+    finally:
+        router.stop_maintenance()
+
+
+@click.option(
+    "--checks",
+    "checks_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON checks file, as for schedule. The urls of the checks are replaced by "
+    "stand-in backends.",
+)
+@scheduler_options
+@click.option(
+    "--duration",
+    default=86400.0,
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    help="seconds of virtual time to simulate",
+)
+@click.option(
+    "--failure-rate",
+    default=0.1,
+    type=click.FloatRange(0, 1),
+    show_default=True,
+    help="fraction of stand-in backend answers that are unhealthy",
+)
+@click.option(
+    "--latency",
+    default=0.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="real seconds the stand-in backends take to answer each query",
+)
+@click.option(
+    "--workdir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="directory to keep the simulated clone and bare remote repo in  "
+    "[default: a temporary directory, removed afterwards]",
+)
+@cli.command()
+@click.pass_context
+def simulate(
+    ctx,
+    checks_path,
+    jitter,
+    min_interval_factor,
+    max_interval_factor,
+    backoff_factor,
+    stable_runs,
+    duration,
+    failure_rate,
+    latency,
+    workdir,
+):
+    """
+    Simulate the checks of a checks file to see whether a checker host and status repo
+    keep up with them.
+    Runs the checks as `schedule` would for --duration seconds of virtual time, against
+    stand-in metrics backends and a local bare remote repo, skipping idle time. Prints a
+    JSON report of queue depths, lateness and missed intervals, commit and push rates and
+    durations, and repo growth. Uses the --git-backend, --summary, --partition-logs and
+    --git-snapshot-interval options, but not --git-url.
+    """
+    params = ctx.parent.params
+    checks = load_checks(checks_path)
+
+    with contextlib.ExitStack() as stack:
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        PosixPath(workdir).mkdir(parents=True, exist_ok=True)
+        report = simulate_schedule(
+            checks,
+            duration,
+            workdir,
+            git_backend=params["git_backend"],
+            summary=params["summary"],
+            partition=params["partition_logs"],
+            snapshot_interval=params["git_snapshot_interval"],
+            failure_rate=failure_rate,
+            latency=latency,
+            timeout=ctx.meta["query_timeout"],
+            jitter=jitter,
+            min_interval_factor=min_interval_factor,
+            max_interval_factor=max_interval_factor,
+            backoff_factor=backoff_factor,
+            stable_runs=stable_runs,
+        )
+    click.echo(json.dumps(report, indent=1))
+
+
+@click.option(
+    "--older-than-days",
+    default=30,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="only squash automated commits older than this many days",
+)
+@click.option(
+    "--retries",
+    default=3,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="attempts to squash and push if the remote changes while squashing",
+)
+@cli.command()
+@click.pass_context
+def squash(ctx, older_than_days, retries):
+    """
+    Squash old automated commits in the status repo into one commit per day.
+    Rewrites the history of the remote branch so that automated commits older than
+    --older-than-days are combined per day, keeping the content of every file. The rewritten
+    history is force pushed only if the remote has not changed since it was fetched
+    (--force-with-lease), retrying otherwise, so concurrent pushes are never lost.
+    Checkers pull with rebase, so they replay only their own new commits onto the
+    rewritten history. The --git-dir clone is unshallowed first, and any of its commits
+    not pushed yet are likewise rebased onto the squashed history and pushed with it.
+    """
+    shard = ctx.meta["shard"]
+    if not isinstance(shard.backend, GitPythonBackend):
+        raise click.UsageError("squash requires --git-backend gitpython")
+    git_repo = shard.backend.git_repo
+    git_branch = shard.config.git_branch
+    git_push_url = shard.config.git_push_url
+    cutoff = datetime.datetime.now().astimezone() - datetime.timedelta(
+        days=older_than_days
+    )
+
+    with shard.shared_git_dir.lock():
+        # pulls with a depth leave a long-lived clone with only its latest commits
+        if is_shallow(git_repo):
+            logger.info("fetching the full history of the shallow clone")
+            git_repo.remotes.origin.fetch(unshallow=True)
+        if is_shallow(git_repo):
+            raise click.ClickException("the clone is still shallow, refusing to squash")
+
+        _checkout_branch(git_repo, git_branch)
+        # including records committed by checkers whose push failed
+        local_head = git_repo.head.commit
+        for attempt in range(1, retries + 1):
+            git_repo.remotes.origin.fetch()
+            remote_head = git_repo.commit(f"origin/{git_branch}")
+            logger.info(f"squashing history of {remote_head.hexsha} before {cutoff}")
+
+            new_head = squash_history(git_repo, remote_head.hexsha, cutoff)
+            if new_head is None:
+                return
+            git_repo.git.reset("--hard", local_head.hexsha)
+            unpushed = list(git_repo.iter_commits(f"{remote_head.hexsha}..HEAD"))
+            if unpushed:
+                logger.info(f"rebasing {len(unpushed)} unpushed commits onto squash")
+                try:
+                    with _committer_environment(git_repo):
+                        git_repo.git.rebase(
+                            "--onto", new_head.hexsha, remote_head.hexsha
+                        )
+                except git.exc.GitCommandError as exc:
+                    git_repo.git.rebase("--abort")
+                    raise click.ClickException(
+                        f"could not rebase {len(unpushed)} unpushed commits onto the "
+                        "squashed history; push them before squashing"
+                    ) from exc
+            else:
+                git_repo.git.reset("--hard", new_head.hexsha)
+
+            if not git_push_url:
+                logger.info("Will not push because git_push_url == False")
+                return
+            try:
+                logger.debug("force pushing to <REDACTED URL CONTAINING TOKEN>")
+                git_repo.git.push(
+                    f"--force-with-lease={git_branch}:{remote_head.hexsha}",
+                    git_push_url,
+                    f"HEAD:{git_branch}",
+                )
+                logger.info(f"pushed squashed history {git_repo.head.commit.hexsha}")
+                return
+            except git.exc.GitCommandError as exc:
+                # not logging exc itself, as its command line includes the push url
+                logger.warning(
+                    f"squash attempt {attempt} not pushed: the remote changed meanwhile or "
+                    f"the push failed (git exit status {exc.status})"
+                )
+
+    raise click.ClickException(f"could not push squashed history in {retries} attempts")
+
+
+@click.option(
+    "--routes",
+    "routes_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON file with a list of alert routes, each with `match` (labels an alert must "
+    "have), `filepath` and optionally `firing_status` (default failed).",
+)
+@click.option(
+    "--host",
+    default="0.0.0.0",
+    show_default=True,
+    help="address to listen on",
+)
+@click.option(
+    "--port",
+    default=9095,
+    type=int,
+    show_default=True,
+    help="port to listen on",
+)
+@click.option(
+    "--batch-interval",
+    default=10.0,
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    help="seconds over which received updates are collected into a single commit",
+)
+@click.option(
+    "--auth-token",
+    default=None,
+    help="if set, webhooks must send an `Authorization: Bearer <token>` header",
+)
+@cli.command()
+@click.pass_context
+def serve(ctx, routes_path, host, port, batch_interval, auth_token):
+    """
+    Receive status updates by webhook instead of polling.
+    Accepts Alertmanager webhooks on /alertmanager, mapping alerts to status files with the
+    --routes file, and simple JSON status updates on /status. Updates received within
+    --batch-interval are written, committed and pushed together. On SIGTERM, eg from
+    `docker stop`, updates already received are written before exiting.
+    """
+    routes = load_alert_routes(routes_path)
+    batcher = StatusBatcher(ctx.meta["submit_records"], batch_interval)
+    server = make_webhook_server(host, port, routes, batcher, auth_token)
+
+    router = ctx.meta["shard_router"]
+
+    def handle_sigterm(signum, _frame):
+        logger.info(f"received signal {signum}, shutting down")
+        # shutdown() waits for serve_forever() to return, which this handler interrupts
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    logger.info(f"listening on {host}:{server.server_port} with {len(routes)} routes")
+    previous_handler = signal.signal(signal.SIGTERM, handle_sigterm)
+    batcher.start()
+    router.start_maintenance()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("shutting down")
+    finally:
+        server.server_close()
+        router.stop_maintenance()
+        batcher.stop()
+        signal.signal(signal.SIGTERM, previous_handler)
+
+
+@click.option(
+    "--force",
+    default=False,
+    is_flag=True,
+    help="run maintenance even if it is not due",
+)
+@cli.command()
+@click.pass_context
+def maintain(ctx, force):
+    """
+    Maintain the --git-dir clone, if due.
+    Reports the repo health (loose objects, packs, sizes, refs and reflog entries). If
+    maintenance is due, by --maintenance-interval or a loose object or pack threshold, or
+    with --force, expires old reflog entries, packs refs, repacks, prunes and writes the
+    commit-graph, and reports the seconds each step took, as JSON. Run it from cron
+    alongside single checks; schedule and serve run it in the background.
+    The clone of every one of the --shards is maintained likewise, and reported under
+    `shards` by shard name.
+    """
+
+    def maintain_shard(shard: Shard) -> dict:
+        report = shard.maintainer.run(force=force)
+        if report is None:
+            report = {
+                "reasons": [],
+                "health": repo_health(shard.git_dir),
+                "last_run": shard.maintainer.last_report(),
+            }
+        return report
+
+    router = ctx.meta["shard_router"]
+    report = maintain_shard(ctx.meta["shard"])
+    if router.shards:
+        report["shards"] = {
+            config.name: maintain_shard(router.get(config)) for config in router.shards
+        }
+    click.echo(json.dumps(report, indent=1, sort_keys=True))
+
+
+@cli.command()
+@click.pass_context
+def publish(ctx):
+    """
+    Merge the status logs of all --shards into --git-branch of --git-url.
+    Pulls each shard's branch or repo and merges the status files it owns into the default
+    branch in timestamp order, skipping records already published, then commits and pushes
+    them in a single commit. Run it periodically, so that Fettle reading the default
+    branch sees every status file; prints the published filepaths as JSON.
+    """
+    click.echo(json.dumps(ctx.meta["shard_router"].publish(), indent=1))
+
+
 if __name__ == "__main__":
     # shared context object for subcommands to pass vals back
     status_record = StatusRecord()
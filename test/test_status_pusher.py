@@ -4,15 +4,23 @@ Test module for status_pusher.py
 
 See conftest.py for definition of git repo test fixture that is created per test method
 """
+
+import copy
 import datetime
+import gzip
+import json
 
 import git
 from git import Repo
+import pydantic
 
 import os
 from pathlib import PosixPath
 import pprint
-
+import signal
+import socket
+import threading
+import time
 
 # test tooling
 import pytest
@@ -27,6 +35,14 @@ import requests_mock
 import status_pusher as sp
 
 
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Fixture: don't share circuit breaker state between tests."""
+    sp.circuit_breakers.configure()
+    yield
+    sp.circuit_breakers.configure()
+
+
 def test_conftest_fixtures(git_repo: Repo, repo_path: PosixPath):
     """Test the conftest git repo fixture and its correct usage."""
 
@@ -63,6 +79,47 @@ def test_conftest_fixtures(git_repo: Repo, repo_path: PosixPath):
 ### Function unit tests ###
 
 
+def test_status_record_default_epoch_ts():
+    """
+    Test that the StatusRecord epoch_ts default is computed per record
+    """
+    before = datetime.datetime.now().timestamp()
+    record = sp.StatusRecord()
+    after = datetime.datetime.now().timestamp()
+    assert before <= record.epoch_ts <= after
+
+    with patch.object(sp.datetime, "datetime") as mock_datetime:
+        mock_now = mock_datetime.now.return_value.astimezone.return_value
+        mock_now.timestamp.return_value = 1.0
+        assert sp.StatusRecord().epoch_ts == 1.0
+        assert sp.CompactStatusRecord().epoch_ts == 1.0
+
+
+def test_status_record_batch():
+    """
+    Test StatusRecordBatch validation at the boundary, and iteration
+    """
+    batch = sp.StatusRecordBatch.from_rows(
+        [(1.0, 1742430572.0, "success"), ("0.5", 1742430632, "failed")]
+    )
+    batch.append_unchecked(None, 1742430692.0, "unknown")
+
+    assert len(batch) == 3
+    assert list(batch) == [
+        sp.CompactStatusRecord(1.0, 1742430572.0, "success"),
+        sp.CompactStatusRecord(0.5, 1742430632.0, "failed"),
+        sp.CompactStatusRecord(None, 1742430692.0, "unknown"),
+    ]
+    assert batch[1].status == "failed"
+    assert batch[1] == sp.StatusRecord(0.5, 1742430632.0, "failed")
+    assert batch[1] != None  # pylint: disable=singleton-comparison
+    assert batch[1] != (0.5, 1742430632.0, "failed")
+
+    with pytest.raises(pydantic.ValidationError):
+        batch.extend([(1.0, 1742430752.0, "not-a-status")])
+    assert len(batch) == 3
+
+
 def test_git_clone_no_existing_dir(
     git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath
 ):
@@ -175,6 +232,141 @@ def test_update_log_file():
     """
 
 
+def test_parse_log_line():
+    """
+    Test parse_log_line function
+    """
+    actual = sp.parse_log_line("2025-03-20T00:29:32Z, failed, 0.5\n")
+    expected = (1742430572.0, "failed", 0.5)
+    assert actual == expected
+
+    actual = sp.parse_log_line("2025-03-20T00:29:32Z, unknown, None")
+    expected = (1742430572.0, "unknown", None)
+    assert actual == expected
+
+
+def test_update_summary_file(repo_path: PosixPath):
+    """
+    Test update_summary_file function: builds the summary from the existing log on first
+    use, then updates it incrementally.
+    """
+    log_path = repo_path / "test_report.log"
+    with log_path.open("a") as f:
+        f.write("\n")
+    sp.update_log_file(log_path, 1732325020.0, 0.0, "failed")
+
+    # first call builds from the log, which already holds both records
+    summary_path = sp.update_summary_file(log_path, 1732325020.0, 0.0, "failed")
+    assert summary_path == repo_path / "test_report.summary.json"
+
+    # incremental update
+    sp.update_log_file(log_path, 1742430572.0, 1.0, "success")
+    sp.update_summary_file(log_path, 1742430572.0, 1.0, "success")
+
+    with summary_path.open() as f:
+        actual = json.load(f)
+
+    assert actual["days"]["2024-11-23"] == {
+        "success": 1,
+        "failed": 1,
+        "degraded": 0,
+        "unknown": 0,
+        "uptime": 50.0,
+    }
+    assert actual["days"]["2025-03-20"]["success"] == 1
+    assert actual["last_status"] == "success"
+    assert actual["last_value"] == 1.0
+    assert actual["last_epoch_ts"] == 1742430572.0
+
+    # the incremental summary matches one rebuilt from the full log
+    assert actual == json.loads(json.dumps(sp.build_summary(log_path)))
+
+
+def test_update_summary_file_window(tmp_path: PosixPath):
+    """
+    Test that update_summary_file only keeps the most recent SUMMARY_DAYS days
+    """
+    log_path = tmp_path / "report.log"
+    start = 1742430572.0
+    for day in range(sp.SUMMARY_DAYS + 5):
+        ts = start + day * 86400
+        sp.update_log_file(log_path, ts, 1.0, "success")
+        sp.update_summary_file(log_path, ts, 1.0, "success")
+
+    with sp.summary_file_path(log_path).open() as f:
+        actual = json.load(f)
+
+    assert len(actual["days"]) == sp.SUMMARY_DAYS
+    assert min(actual["days"]) == sp.epoch_to_zulu(start + 5 * 86400)[:10]
+
+
+def test_log_partitions(tmp_path: PosixPath):
+    """
+    Test monthly partition paths, and listing the partitions of a log in a manifest
+    """
+    report_file = tmp_path / "report.log"
+    assert sp.partition_file_path(report_file, 1742430572.0) == (
+        tmp_path / "report.2025-03.log"
+    )
+    assert sp.partitioned_log_path(tmp_path / "report.2025-03.log") == report_file
+    assert sp.partitioned_log_path(tmp_path / "report.summary.json") is None
+
+    for name in ("report.2025-04.log", "report.2025-03.log", "other.2025-03.log"):
+        (tmp_path / name).write_text("2025-03-20T00:29:32Z, success, 1.0\n")
+    assert sp.log_partitions(report_file) == [
+        tmp_path / "report.2025-03.log",
+        tmp_path / "report.2025-04.log",
+    ]
+
+    manifest_path = sp.update_manifest_file(report_file)
+    assert manifest_path == tmp_path / "report.manifest.json"
+    assert json.loads(manifest_path.read_text()) == {
+        "partitions": [
+            {"month": "2025-03", "path": "report.2025-03.log"},
+            {"month": "2025-04", "path": "report.2025-04.log"},
+        ]
+    }
+    # the summary is built from all partitions
+    assert (
+        sum(day["success"] for day in sp.build_summary(report_file)["days"].values())
+        == 2
+    )
+
+
+def test_merge_log_records(repo_path: PosixPath):
+    """
+    Test merge_log_records merges in timestamp order, skipping already logged timestamps,
+    keeps existing lines as they are, and does not write the file if nothing is added
+    """
+    log_path = repo_path / "test_report.log"
+    with log_path.open("a") as f:
+        # influx values are logged as returned
+        f.write("\n2024-11-23T01:33:40Z, success, 1\n")
+
+    records = sp.StatusRecordBatch.from_rows(
+        [
+            (0.0, 1732325320.0, "failed"),  # 2024-11-23T01:28:40Z
+            (1.0, 1732325020.0, "success"),  # 2024-11-23T01:23:40Z, already logged
+            (1.0, 1732325920.0, "success"),  # 2024-11-23T01:38:40Z
+        ]
+    )
+    assert sp.merge_log_records(log_path, records) == 2
+    mtime_ns = log_path.stat().st_mtime_ns
+    time.sleep(0.01)
+    assert sp.merge_log_records(log_path, records) == 0
+    assert log_path.stat().st_mtime_ns == mtime_ns
+
+    with log_path.open() as f:
+        actual = f.read()
+    expected = (
+        "2024-11-23T01:23:40Z, success, 1.0\n"
+        "2024-11-23T01:28:40Z, failed, 0.0\n"
+        "2024-11-23T01:33:40Z, success, 1\n"
+        "2024-11-23T01:38:40Z, success, 1.0\n"
+    )
+    assert actual == expected
+
+
 def test_commit(git_repo: Repo, repo_path: PosixPath):
     """
     Test commit function
@@ -253,6 +445,187 @@ def test_push(git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath):
     assert actual_latest_commit_msg == expected_latest_commit_msg
 
 
+@pytest.mark.parametrize("backend_name", sorted(sp.GIT_BACKENDS))
+def test_git_backend(
+    backend_name: str, git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath
+):
+    """
+    Test each GitBackend clones, updates, commits and pushes, using the conftest fixture
+    repo `git_repo` as the remote.
+    """
+    clone_path = tmp_path / "cloned_repo"
+    backend = sp.GIT_BACKENDS[backend_name]()
+    backend.clone(str(repo_path), "main", str(clone_path))
+    assert (clone_path / "test_report.log").exists()
+
+    # add a commit upstream and check cloning again updates the existing directory
+    with open(repo_path / "new_file.txt", "w") as f:
+        f.write("content of newly added file in parent repo")
+    git_repo.index.add(repo_path / "new_file.txt")
+    git_repo.index.commit("upstream commit")
+    backend.clone(str(repo_path), "main", str(clone_path))
+    assert (clone_path / "new_file.txt").exists()
+
+    # see test_push for why the remote needs another branch checked out
+    git_repo.git.checkout("-b", "temp_branch")
+
+    report_file = clone_path / "test_report.log"
+    sp.update_log_file(report_file, 1742430572.0, 1.0, "success")
+    commit_sha = backend.commit([str(report_file)], "unit-test commit message")
+    backend.push(str(repo_path))
+
+    assert git_repo.commit("main").hexsha == commit_sha
+    assert git_repo.commit("main").message.strip() == "unit-test commit message"
+    assert "2025-03-20T00:29:32Z, success, 1.0" in git_repo.git.show(
+        "main:test_report.log"
+    )
+
+
+@pytest.mark.parametrize("backend_name", sorted(sp.GIT_BACKENDS))
+def test_git_backend_branch(
+    backend_name: str, git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath
+):
+    """
+    Test each GitBackend creates a branch that doesn't exist on the remote yet with its
+    first push, and that other clones then check it out and pull it
+    """
+    # see test_push for why the remote needs another branch checked out
+    git_repo.git.checkout("-b", "temp_branch")
+    main_sha = git_repo.commit("main").hexsha
+
+    clones = [tmp_path / "clone_a", tmp_path / "clone_b"]
+    backends = [sp.GIT_BACKENDS[backend_name]() for _clone in clones]
+    backends[0].clone(str(repo_path), "status-a", str(clones[0]))
+    report_file = clones[0] / "test_report.log"
+    sp.update_log_file(report_file, 1742430572.0, 1.0, "success")
+    backends[0].commit([str(report_file)], "commit on branch")
+    backends[0].push(str(repo_path))
+
+    assert git_repo.commit("main").hexsha == main_sha
+    assert "2025-03-20T00:29:32Z" in git_repo.git.show("status-a:test_report.log")
+
+    # an existing clone of main switches to the branch
+    backends[1].clone(str(repo_path), "main", str(clones[1]))
+    backends[1].clone(str(repo_path), "status-a", str(clones[1]))
+    assert "2025-03-20T00:29:32Z" in (clones[1] / "test_report.log").read_text()
+
+    # and pushes on top of the first clone's commit, which pulls it before pushing again
+    report_file = clones[1] / "test_report.log"
+    sp.update_log_file(report_file, 1742430632.0, 1.0, "success")
+    backends[1].commit([str(report_file)], "second commit on branch")
+    backends[1].push(str(repo_path))
+    backends[0].push(str(repo_path))
+    assert git_repo.commit("status-a").message.strip() == "second commit on branch"
+    assert "2025-03-20T00:30:32Z" in (clones[0] / "test_report.log").read_text()
+
+
+def make_automated_history(
+    git_repo: Repo, repo_path: PosixPath, days: int, per_day: int
+):
+    """
+    commit `per_day` automated log updates per day for `days` days, ending 3 days ago,
+    and return the start epoch timestamp
+    """
+    start = (datetime.datetime.now() - datetime.timedelta(days=days + 3)).replace(
+        hour=6, minute=0, second=0, microsecond=0
+    )
+    log_path = repo_path / "test_report.log"
+    for day in range(days):
+        for i in range(per_day):
+            ts = start + datetime.timedelta(days=day, hours=i)
+            with log_path.open("a") as f:
+                f.write(f"\n{sp.epoch_to_zulu(ts.timestamp())}, success, 1.0")
+            git_repo.index.add([str(log_path)])
+            date = f"{int(ts.timestamp())} +0000"
+            git_repo.index.commit(
+                "[automated] update health report", author_date=date, commit_date=date
+            )
+    return start
+
+
+def test_squash_history(git_repo: Repo, repo_path: PosixPath):
+    """
+    Test squash_history combines old automated commits per day, preserving content
+    """
+    make_automated_history(git_repo, repo_path, days=5, per_day=4)
+    # a manual commit in the middle of history, and recent automated ones
+    with open(repo_path / "file_in_tree.txt", "w") as f:
+        f.write("manual edit")
+    git_repo.index.add([str(repo_path / "file_in_tree.txt")])
+    git_repo.index.commit("manual edit")
+    make_automated_history(git_repo, repo_path, days=0, per_day=0)
+    for _ in range(3):
+        sp.update_log_file(repo_path / "test_report.log", time.time(), 1.0, "success")
+        sp.commit(git_repo, "main", [str(repo_path / "test_report.log")])
+
+    old_head = git_repo.head.commit
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=2)
+    new_head = sp.squash_history(git_repo, "HEAD", cutoff)
+
+    # refs are unchanged
+    assert git_repo.head.commit == old_head
+    # content is unchanged
+    assert new_head.tree == old_head.tree
+
+    messages = [commit.message for commit in git_repo.iter_commits(new_head)][::-1]
+    # 2 fixture commits, 5 squashed days, the manual commit, 3 recent automated commits
+    assert len(messages) == 2 + 5 + 1 + 3
+    assert messages[2].startswith("[automated] squash 4 health report updates from")
+    assert messages[7] == "manual edit"
+    assert messages[8:] == ["[automated] update health report"] * 3
+
+    # nothing left to squash
+    assert sp.squash_history(git_repo, new_head.hexsha, cutoff) is None
+
+
+def test_squash_history_merges(git_repo: Repo, repo_path: PosixPath):
+    """
+    Test squash_history squashes merges made by pulling automated commits, but keeps a
+    pull request merge with the commits it merges
+    """
+    start = make_automated_history(git_repo, repo_path, days=1, per_day=2)
+
+    def commit_at(hours: int, message: str, parents: list, **kwargs) -> git.Commit:
+        date = f"{int((start + datetime.timedelta(hours=hours)).timestamp())} +0000"
+        return git_repo.index.commit(
+            message,
+            parent_commits=parents,
+            author_date=date,
+            commit_date=date,
+            **kwargs,
+        )
+
+    # a pull request merged between automated commits
+    base = git_repo.head.commit
+    (repo_path / "file_in_tree.txt").write_text("colours")
+    git_repo.index.add([str(repo_path / "file_in_tree.txt")])
+    feature = commit_at(2, "Fix dashboard colours", [base], head=False)
+    pr_merge = commit_at(3, "Merge pull request #7 from org/feature", [base, feature])
+
+    # a merge made by pulling another checker's automated commit
+    other = commit_at(4, "[automated] update health report", [pr_merge], head=False)
+    commit_at(5, "[automated] update health report", [pr_merge])
+    commit_at(6, "Merge branch 'main' of remote", [git_repo.head.commit, other])
+
+    old_head = git_repo.head.commit
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=1)
+    new_head = sp.squash_history(git_repo, "HEAD", cutoff)
+
+    assert new_head.tree == old_head.tree
+    assert git_repo.is_ancestor(feature, new_head)
+    messages = [
+        commit.message for commit in git_repo.iter_commits(new_head, first_parent=True)
+    ][::-1]
+    # 2 fixture commits, 2 squashed, the pull request merge, 2 squashed with the pull
+    assert messages[2:] == [
+        "[automated] squash 2 health report updates from "
+        + sp.epoch_to_zulu(start.timestamp())[:10],
+        "Merge pull request #7 from org/feature",
+        "[automated] squash 2 health report updates from "
+        + sp.epoch_to_zulu(start.timestamp())[:10],
+    ]
+
+
 def test_prometheus_query():
     """
     Test promtheus_query() function
@@ -313,146 +686,1757 @@ def test_influx_query():
     assert actual == expected
 
 
-#### End-to-end CLI invocation tests ###
+FLUX_CSV = """\
+#datatype,string,long,dateTime:RFC3339,double,string
+#group,false,false,false,false,true
+#default,_result,,,,
+,result,table,_time,_value,host
+,,0,2025-02-01T03:11:34.123456789Z,1,a
+,,0,2025-02-01T03:16:34Z,,a
 
+#datatype,string,long,dateTime:RFC3339,double,string
+#group,false,false,false,false,true
+#default,_result,,,,
+,result,table,_time,_value,host
+,,1,2025-02-01T03:21:34Z,0.5,"b,c"
+"""
 
-def test_promq_cli(git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath):
+
+def test_parse_flux_csv():
     """
-    Test promq() cli command method, mocking the Prometheus custom_query request,
-    and using our git repo fixture.
+    Test parse_flux_csv() parses every table of an annotated CSV response, skipping nulls
     """
-    # get a temp dir for the cloned repo
-    clone_path = tmp_path / "cloned_repo"
+    actual = list(sp.parse_flux_csv(FLUX_CSV.splitlines()))
+    assert actual == [
+        (pytest.approx(1738379494.123456), 1.0),
+        (1738380094.0, 0.5),
+    ]
 
-    # prepare to use the test fixture repo
-    repo_path_str = str(repo_path)
-    repo_branch_str = "main"
-    tmp_path_str = str(clone_path)
+    error_csv = "#datatype,string,string\n,error,reference\n,query timed out,\n"
+    with pytest.raises(sp.FluxQueryError, match="query timed out"):
+        list(sp.parse_flux_csv(error_csv.splitlines()))
 
-    # mock prometheus api call vals
-    mock_url = "https://mock.prometheus.url.local"
-    mock_query = "avg( avg_over_time(foo{service=`bar`}[5m]))"
-    mock_return_val = [{"metric": {}, "value": [1729872285.678, "1"]}]
+    with pytest.raises(sp.FluxQueryError, match="no _time and _value"):
+        list(sp.parse_flux_csv([",result,table,_value", ",_result,0,1"]))
 
-    # mock env vars
-    os_environ = {
-        "STATUS_PUSHER_GIT_DIR": tmp_path_str,
-        "STATUS_PUSHER_GIT_URL": repo_path_str,
-        "STATUS_PUSHER_PROMQ_URL": mock_url,
-        "STATUS_PUSHER_QUERY": mock_query,
-        "STATUS_PUSHER_FILEPATH": "test_report.log",
-        "STATUS_PUSHER_GIT_BRANCH": "main",
-    }
-    runner = CliRunner()
 
-    # mock prom connect; use our git fixture
-    with patch.dict(os.environ, os_environ, clear=True) as mock_env, patch.object(
-        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
-    ) as mock_prom_qry:
+def test_flux_query():
+    """
+    Test flux_query() posts the query with token auth, and parses the gzipped CSV response
+    """
+    mock_url = "https://mock.influxdb.url.local"
+    mock_query = 'from(bucket: "foo") |> range(start: -5m) |> last()'
 
-        cli_params = ["promq"]
+    with requests_mock.Mocker() as req_mock:
+        req_mock.register_uri(
+            "POST",
+            f"{mock_url}/api/v2/query?org=myorg",
+            content=gzip.compress(FLUX_CSV.encode()),
+            headers={"Content-Encoding": "gzip", "Content-Type": "text/csv"},
+        )
+        actual = sp.flux_query("myorg", mock_url, mock_query, token="secret")
+        actual_range = sp.flux_query_range("myorg", mock_url, mock_query)
 
-        status_record = sp.StatusRecord()
+    assert actual == (1738380094.0, 0.5)
+    assert len(actual_range) == 2
+    request = req_mock.request_history[0]
+    assert request.headers["Authorization"] == "Token secret"
+    assert request.headers["Accept-Encoding"] == "gzip"
+    assert request.json()["query"] == mock_query
+    assert "Authorization" not in req_mock.request_history[1].headers
 
-        # invoke cli
-        actual_result = runner.invoke(
-            sp.cli, cli_params, obj=status_record, auto_envvar_prefix="STATUS_PUSHER"
-        )
 
-        print(actual_result.output)
-        pprint.pprint(mock_prom_qry.mock_calls)
+def test_flux_query_error_table():
+    """
+    Test a Flux query failing with an error table doesn't count as a backend failure
+    """
+    mock_url = "https://mock.influxdb.url.local"
+    sp.circuit_breakers.configure(min_calls=2)
+    error_csv = "#datatype,string,string\n,error,reference\n,bad query,\n"
 
-    # assert successful exit code
-    assert actual_result.exit_code == 0
+    with requests_mock.Mocker() as req_mock:
+        req_mock.register_uri("POST", requests_mock.ANY, text=error_csv)
+        for _ in range(4):
+            with pytest.raises(sp.FluxQueryError):
+                sp.flux_query("myorg", mock_url, "bad query")
+    assert sp.circuit_breakers.get(mock_url).state == sp.CircuitBreaker.CLOSED
 
-    # assert expected calls
-    mock_prom_qry.assert_called_with(query=mock_query)
 
-    # assert status record SUCCESS
-    assert status_record.status == "success"
+def test_hash_ring_owners():
+    """
+    Test HashRing assigns every key to a stable set of distinct owners, spread across members
+    """
+    members = ["node-a", "node-b", "node-c"]
+    ring = sp.HashRing(members)
+    keys = [f"public/status/check_{i}.log" for i in range(300)]
 
-    # assert status value 1.0
-    assert status_record.value == 1.0
+    owners = {key: ring.owners(key) for key in keys}
+    # deterministic, independent of member ordering
+    assert owners == {key: sp.HashRing(members[::-1]).owners(key) for key in keys}
 
-    # TODO check our temporary git log file was updated
+    # each member gets a reasonable share of the checks
+    for member in members:
+        assert sum(owner == [member] for owner in owners.values()) > 50
 
+    # replicas are distinct, start with the primary owner, and are capped by fleet size
+    for key in keys:
+        replicas = ring.owners(key, replicas=2)
+        assert len(set(replicas)) == 2
+        assert replicas[0] == owners[key][0]
+        assert sorted(ring.owners(key, replicas=5)) == members
 
-def test_influxq_cli(
-    git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath, monkeypatch
-):
+
+def test_hash_ring_rebalance():
     """
-    Test influxq() command method, mocking the http request and using our git repo fixture.
+    Test that adding a fleet member only moves checks to the new member
     """
-    # get a temp dir for the cloned repo
-    clone_path = tmp_path / "cloned_repo"
+    keys = [f"public/status/check_{i}.log" for i in range(300)]
+    before = sp.HashRing(["node-a", "node-b", "node-c"])
+    after = sp.HashRing(["node-a", "node-b", "node-c", "node-d"])
 
-    # prepare to use the test fixture repo
-    repo_path_str = str(repo_path)
-    repo_branch_str = "main"
-    tmp_path_str = str(clone_path)
+    moved = [key for key in keys if before.owners(key) != after.owners(key)]
+    assert all(after.owners(key) == ["node-d"] for key in moved)
+    assert 0 < len(moved) < len(keys) / 2
 
-    # mock influx api call vals
-    mock_db_name = "mockdb"
-    mock_query = 'SELECT last("foo") FROM "bar" LIMIT 1'
+
+def test_fleet_owns_check():
+    """
+    Test fleet_owns_check function
+    """
+    members = ["node-a", "node-b", "node-c"]
+    check_key = "public/status/test_report.log"
+    owning = [node for node in members if sp.fleet_owns_check(check_key, node, members)]
+    assert len(owning) == 1
+
+    owning = [
+        node for node in members if sp.fleet_owns_check(check_key, node, members, 2)
+    ]
+    assert len(owning) == 2
+
+    with pytest.raises(ValueError):
+        sp.fleet_owns_check(check_key, "node-z", members)
+
+
+def test_circuit_breaker():
+    """
+    Test CircuitBreaker opens on failures, fails fast, then half-opens and closes
+    """
+    now = [0.0]
+    breaker = sp.CircuitBreaker(
+        "http://influxdb:8086/",
+        failure_rate=0.5,
+        min_calls=4,
+        window=60,
+        reset_timeout=30,
+        clock=lambda: now[0],
+    )
+
+    for succeeded in (True, False, True):
+        breaker.before_call()
+        breaker.record(succeeded)
+    assert breaker.state == breaker.CLOSED
+
+    breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(sp.CircuitOpenError):
+        breaker.before_call()
+
+    # half-open: a single trial call, which fails and re-opens the breaker
+    now[0] = 30.0
+    breaker.before_call()
+    with pytest.raises(sp.CircuitOpenError):
+        breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == breaker.OPEN
+
+    # a successful trial closes it
+    now[0] = 60.0
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == breaker.CLOSED
+    breaker.before_call()
+
+
+def test_circuit_breaker_window():
+    """
+    Test CircuitBreaker only considers outcomes within its window
+    """
+    now = [0.0]
+    breaker = sp.CircuitBreaker(
+        "http://influxdb:8086/", min_calls=2, window=60, clock=lambda: now[0]
+    )
+    breaker.record(False)
+    now[0] = 100.0
+    breaker.record(True)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == breaker.CLOSED
+
+
+def test_influx_query_circuit_breaker():
+    """
+    Test influx_query passes timeouts, and fails fast once the backend's breaker opens.
+    Client errors (4xx) don't count as backend failures.
+    """
     mock_url = "https://mock.influxdb.url.local"
-    mock_return_val = {
-        "results": [
-            {
-                "statement_id": 0,
-                "series": [
-                    {
-                        "name": "squeue",
-                        "columns": ["time", "last"],
-                        "values": [["2025-02-01T03:11:34Z", 1]],
-                    }
-                ],
-            }
-        ]
-    }
+    sp.circuit_breakers.configure(min_calls=2)
 
-    # mock env vars
-    os_environ = {
-        "STATUS_PUSHER_GIT_DIR": tmp_path_str,
-        "STATUS_PUSHER_GIT_URL": repo_path_str,
-        "STATUS_PUSHER_INFLUXQ_URL": mock_url,
-        "STATUS_PUSHER_INFLUXQ_DB_NAME": mock_db_name,
-        "STATUS_PUSHER_QUERY": mock_query,
-        "STATUS_PUSHER_FILEPATH": "test_report.log",
-        "STATUS_PUSHER_GIT_BRANCH": "main",
-    }
-    runner = CliRunner()
+    with requests_mock.Mocker() as req_mock:
+        req_mock.register_uri("GET", requests_mock.ANY, status_code=400)
+        for _ in range(3):
+            with pytest.raises(sp.requests.HTTPError):
+                sp.influx_query("mockdb", mock_url, "bad query", timeout=(1.0, 2.0))
+        assert req_mock.last_request.timeout == (1.0, 2.0)
+        assert sp.circuit_breakers.get(mock_url).state == sp.CircuitBreaker.CLOSED
+
+        req_mock.register_uri(
+            "GET", requests_mock.ANY, exc=sp.requests.ConnectTimeout("timed out")
+        )
+        # 3 failures out of 6 requests reaches the default failure rate of 0.5
+        for _ in range(3):
+            with pytest.raises(sp.requests.ConnectTimeout):
+                sp.influx_query("mockdb", mock_url, "query")
+        calls = req_mock.call_count
+
+        with pytest.raises(sp.CircuitOpenError):
+            sp.influx_query("mockdb", mock_url, "query")
+        assert req_mock.call_count == calls
+
+    # an open breaker results in an unknown status
+    check = sp.CheckConfig(
+        name="slurm",
+        query="query",
+        filepath="slurm.log",
+        source="influxdb",
+        url=mock_url,
+    )
+    assert sp.run_check(check).status == "unknown"
 
-    # mock http req; use our git fixture
-    expected_uri = (
-        f"{mock_url}/query?q={urllib.parse.quote_plus(mock_query)}&db={mock_db_name}"
+
+def test_prometheus_query_circuit_breaker():
+    """
+    Test prometheus_query counts 5xx responses as backend failures, but not a query
+    rejected with a 4xx response
+    """
+    mock_url = "https://mock.prometheus.url.local"
+    sp.circuit_breakers.configure(min_calls=2)
+
+    with requests_mock.Mocker() as req_mock:
+        req_mock.register_uri("GET", requests_mock.ANY, status_code=400)
+        for _ in range(4):
+            with pytest.raises(sp.PrometheusApiClientException):
+                sp.prometheus_query("bad query", mock_url)
+        assert sp.circuit_breakers.get(mock_url).state == sp.CircuitBreaker.CLOSED
+
+        req_mock.register_uri("GET", requests_mock.ANY, status_code=503)
+        for _ in range(4):
+            with pytest.raises(sp.PrometheusApiClientException):
+                sp.prometheus_query("query", mock_url)
+        with pytest.raises(sp.CircuitOpenError):
+            sp.prometheus_query("query", mock_url)
+
+
+def test_prometheus_query_no_retries():
+    """
+    Test prometheus_query fails straight away for a server refusing connections, rather
+    than retrying with backoff
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    sp.circuit_breakers.configure()
+
+    start = time.monotonic()
+    with pytest.raises(sp.requests.ConnectionError):
+        sp.prometheus_query("up", f"http://127.0.0.1:{port}", timeout=(0.2, 0.2))
+    assert time.monotonic() - start < 1
+
+
+def test_replica_selector():
+    """
+    Test ReplicaSelector ranks replicas by latency and derives hedge delays
+    """
+    selector = sp.ReplicaSelector(percentile=90, default_delay=0.5, min_samples=3)
+    for latency in (0.1, 0.2, 0.3, 0.4, 2.0):
+        selector.record("http://slow", latency + 1)
+        selector.record("http://fast", latency)
+
+    assert selector.rank(["http://slow", "http://fast"]) == [
+        "http://fast",
+        "http://slow",
+    ]
+    # an unmeasured replica goes first
+    assert (
+        selector.rank(["http://slow", "http://fast", "http://new"])[0] == "http://new"
     )
 
-    with patch.dict(
-        os.environ, os_environ, clear=True
-    ) as mock_env, requests_mock.Mocker() as req_mock:
-        req_mock.register_uri("GET", expected_uri, json=mock_return_val)
+    assert selector.hedge_delay("http://fast") == 2.0
+    assert selector.hedge_delay("http://new") == 0.5
 
-        cli_params = ["influxq"]
 
-        status_record = sp.StatusRecord()
+def test_hedged_query():
+    """
+    Test hedged_query takes the first good answer across replicas
+    """
+    release = threading.Event()
+
+    def query_fn(url):
+        if url == "http://hung":
+            release.wait(5)
+        if url == "http://down":
+            raise sp.requests.ConnectionError("refused")
+        return url
+
+    selector = sp.ReplicaSelector(default_delay=0.05)
+    try:
+        # the first replica hangs, so the query is hedged to the second
+        assert sp.hedged_query(query_fn, ["http://hung", "http://ok"], selector) == (
+            "http://ok"
+        )
+        # and the abandoned request doesn't keep the process from exiting
+        assert all(
+            thread.daemon
+            for thread in threading.enumerate()
+            if thread is not threading.main_thread()
+        )
+        # the first replica fails, so the second is queried without waiting
+        start = time.monotonic()
+        selector.default_delay = 5
+        assert sp.hedged_query(query_fn, ["http://down", "http://ok"], selector) == (
+            "http://ok"
+        )
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
 
-        # invoke cli
-        actual_result = runner.invoke(
-            sp.cli, cli_params, obj=status_record, auto_envvar_prefix="STATUS_PUSHER"
+    # the responsive replica is now preferred
+    assert selector.rank(["http://down", "http://ok"]) == ["http://ok", "http://down"]
+
+    with pytest.raises(sp.requests.ConnectionError):
+        sp.hedged_query(query_fn, ["http://down", "http://down"], selector)
+
+
+def test_prometheus_query_range():
+    """
+    Test prometheus_query_range() function
+    """
+    mock_url = "https://mock.prometheus.url.local"
+    mock_query = "avg( avg_over_time(foo{service=`bar`}[5m]))"
+    mock_return_val = [
+        {"metric": {}, "values": [[1729872285.678, "1"], [1729872585.678, "0"]]}
+    ]
+    start = datetime.datetime(2024, 10, 25, 9)
+    end = datetime.datetime(2024, 10, 25, 10)
+
+    with patch.object(
+        sp.PrometheusConnect, "custom_query_range", return_value=mock_return_val
+    ) as mock_prom_qry:
+        actual = sp.prometheus_query_range(mock_query, mock_url, start, end, "5m")
+        mock_prom_qry.assert_called_with(
+            query=mock_query, start_time=start, end_time=end, step="5m"
         )
 
-        # breakpoint()
-        # self.exception.request.__str__()
+    expected = [(1729872285.678, 1.0), (1729872585.678, 0.0)]
+    assert actual == expected
 
-        print(actual_result.output)
 
-    # assert successful exit code
-    assert actual_result.exit_code == 0
+def test_evaluate_statuses():
+    """
+    Test evaluate_status and evaluate_statuses functions
+    """
+    assert sp.evaluate_status(1.0, "gte", 1.0) == "success"
+    assert sp.evaluate_status(0.5, "gte", 1.0) == "failed"
+    actual = sp.evaluate_statuses([0.5, 1.0, 2.0], "lt", 1.5)
+    expected = ["success", "success", "failed"]
+    assert actual == expected
 
-    # assert status record SUCCESS
-    assert status_record.status == "success"
 
-    # assert status value 1.0
-    assert status_record.value == 1.0
+def test_load_checks(tmp_path: PosixPath):
+    """
+    Test load_checks function
+    """
+    checks_path = tmp_path / "checks.json"
+    checks_path.write_text(
+        json.dumps(
+            [
+                {"name": "ssh", "query": "up", "filepath": "ssh.log", "interval": 60},
+                {"name": "slurm", "query": "q", "filepath": "slurm.log"},
+            ]
+        )
+    )
+    actual = sp.load_checks(str(checks_path))
+    assert [check.name for check in actual] == ["ssh", "slurm"]
+    assert actual[0].interval == 60
+    assert actual[1].source == "prometheus"
 
-    # TODO check our temporary git log file was updated
+    checks_path.write_text(json.dumps([{"name": "ssh", "query": "up"}]))
+    with pytest.raises(pydantic.ValidationError):
+        sp.load_checks(str(checks_path))
+
+
+def test_run_check():
+    """
+    Test run_check evaluates the query result, and records UNKNOWN if the query fails
+    """
+    check = sp.CheckConfig(name="ssh", query="up", filepath="ssh.log")
+    mock_return_val = [{"metric": {}, "value": [1729872285.678, "0"]}]
+    with patch.object(
+        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+    ):
+        actual = sp.run_check(check)
+    assert (actual.value, actual.epoch_ts, actual.status) == (
+        0.0,
+        1729872285.678,
+        "failed",
+    )
+
+    with patch.object(
+        sp.PrometheusConnect, "custom_query", side_effect=ConnectionError("refused")
+    ):
+        actual = sp.run_check(check)
+    assert (actual.value, actual.status) == (None, "unknown")
+
+
+def test_adaptive_scheduler_spreads_checks():
+    """
+    Test AdaptiveScheduler starts checks at deterministic offsets spread over the interval
+    """
+    checks = [
+        sp.CheckConfig(name=f"check_{i}", query="up", filepath=f"check_{i}.log")
+        for i in range(20)
+    ]
+    offsets = sorted(sp.AdaptiveScheduler(checks, start=1000.0)._queue)
+
+    # deterministic
+    assert offsets == sorted(sp.AdaptiveScheduler(checks, start=1000.0)._queue)
+    # all within the first interval, and not bunched together
+    assert all(1000.0 <= ts < 1300.0 for ts, _name in offsets)
+    assert offsets[-1][0] - offsets[0][0] > 150
+
+    scheduler = sp.AdaptiveScheduler(checks, start=1000.0)
+    assert scheduler.next_due() == offsets[0][0]
+    assert len(scheduler.pop_due(1300.0)) == 20
+
+
+def test_adaptive_scheduler_intervals():
+    """
+    Test AdaptiveScheduler backs off stable checks and escalates failing ones
+    """
+    check = sp.CheckConfig(name="ssh", query="up", filepath="ssh.log", interval=100)
+    scheduler = sp.AdaptiveScheduler([check], start=0.0, jitter=0.0, stable_runs=2)
+    scheduler.pop_due(float("inf"))
+
+    intervals = []
+    for status in ["success"] * 8 + ["failed", "degraded", "success", "unknown"]:
+        scheduler.record(check, status, 0.0)
+        intervals.append(scheduler.intervals["ssh"])
+
+    expected = [100, 200, 200, 400, 400, 400, 400, 400, 25, 25, 100, 100]
+    assert intervals == expected
+
+    # jitter stays within bounds
+    scheduler = sp.AdaptiveScheduler([check], start=0.0, jitter=0.1)
+    for _ in range(20):
+        scheduler.pop_due(float("inf"))
+        assert 90 <= scheduler.record(check, "unknown", 0.0) <= 110
+
+
+def test_run_schedule():
+    """
+    Test run_schedule runs due checks together using a fake clock
+    """
+    checks = [
+        sp.CheckConfig(name="fast", query="up", filepath="fast.log", interval=10),
+        sp.CheckConfig(name="slow", query="up", filepath="slow.log", interval=30),
+    ]
+    now = [0.0]
+    runs = []
+
+    def run_checks(due):
+        runs.append((now[0], sorted(check.name for check in due)))
+        return [(check, sp.StatusRecord(1.0, now[0], "unknown")) for check in due]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    scheduler = sp.AdaptiveScheduler(checks, start=0.0, jitter=0.0)
+    sp.run_schedule(scheduler, run_checks, clock=lambda: now[0], sleep=sleep, until=95)
+
+    assert sum("fast" in names for _ts, names in runs) == 10
+    assert sum("slow" in names for _ts, names in runs) in (3, 4)
+    assert all(ts <= 95 for ts, _names in runs)
+    assert [ts for ts, _names in runs] == sorted(ts for ts, _names in runs)
+
+
+def test_simulate_schedule(tmp_path: PosixPath):
+    """
+    Test simulate_schedule runs checks of every source against stand-in backends, writing
+    to a local bare remote, far faster than real time
+    """
+    checks = [
+        sp.CheckConfig(name="web", query="up", filepath="web.log", interval=60),
+        sp.CheckConfig(
+            name="db",
+            query="SELECT last(x) FROM y",
+            filepath="db.log",
+            source="influxdb",
+            success_condition="gt",
+            success_value=0.5,
+            interval=120,
+        ),
+        sp.CheckConfig(
+            name="flux",
+            query="from()",
+            filepath="flux.log",
+            source="flux",
+            interval=300,
+        ),
+    ]
+    report = sp.simulate_schedule(
+        checks, 600, tmp_path, failure_rate=0.0, jitter=0.0, stable_runs=100
+    )
+
+    assert report["statuses"] == {"success": report["runs"]}
+    assert report["runs"] == 10 + 5 + 2
+    assert report["commits"] == report["pushes"] == 17
+    assert report["missed_intervals"] == 0
+    assert report["speedup"] > 10
+    assert report["remote_growth_bytes_per_day"] > 0
+
+    remote = Repo(tmp_path / "remote.git")
+    assert len(remote.git.show("main:web.log").splitlines()) == 10
+
+
+def test_simulate_schedule_overloaded(tmp_path: PosixPath):
+    """
+    Test simulate_schedule reports missed intervals when the checks cannot keep up
+    """
+    checks = [
+        sp.CheckConfig(name="slow", query="up", filepath="slow.log", interval=0.1)
+    ]
+    report = sp.simulate_schedule(
+        checks, 1.0, tmp_path, latency=0.3, jitter=0.0, stable_runs=100
+    )
+
+    assert report["missed_intervals"] >= report["runs"] - 1 > 0
+
+
+ALERTMANAGER_PAYLOAD = {
+    "version": "4",
+    "status": "firing",
+    "alerts": [
+        {
+            "status": "firing",
+            "labels": {"alertname": "SSHDown", "service": "ssh", "instance": "a"},
+            "startsAt": "2025-03-20T00:29:32.123456789Z",
+            "endsAt": "0001-01-01T00:00:00Z",
+        },
+        {
+            "status": "resolved",
+            "labels": {"alertname": "SlurmDegraded", "service": "slurm"},
+            "startsAt": "2025-03-20T00:00:00Z",
+            "endsAt": "2025-03-20T00:30:32Z",
+        },
+        {
+            "status": "firing",
+            "labels": {"alertname": "Unrouted"},
+            "startsAt": "2025-03-20T00:00:00Z",
+        },
+    ],
+}
+
+ALERT_ROUTES = [
+    {"match": {"service": "ssh"}, "filepath": "ssh.log"},
+    {
+        "match": {"alertname": "SlurmDegraded"},
+        "filepath": "slurm.log",
+        "firing_status": "degraded",
+    },
+]
+
+
+def test_alerts_to_records():
+    """
+    Test alerts_to_records maps firing and resolved alerts through routes
+    """
+    routes = sp._alert_routes_adapter.validate_python(ALERT_ROUTES)
+    actual = sp.alerts_to_records(ALERTMANAGER_PAYLOAD, routes)
+
+    assert [(filepath, record.status) for filepath, record in actual] == [
+        ("ssh.log", "failed"),
+        ("slurm.log", "success"),
+    ]
+    assert actual[0][1].epoch_ts == pytest.approx(1742430572.123456)
+    assert actual[1][1].epoch_ts == 1742430632.0
+
+
+def test_alerts_to_records_resent():
+    """
+    Test alerts_to_records drops notifications Alertmanager re-sends for alerts whose
+    status was already recorded, but not their later resolution
+    """
+    routes = sp._alert_routes_adapter.validate_python(ALERT_ROUTES)
+    history = sp.AlertHistory()
+    first = sp.alerts_to_records(ALERTMANAGER_PAYLOAD, routes, history)
+    assert len(first) == 2
+    assert sp.alerts_to_records(ALERTMANAGER_PAYLOAD, routes, history) == []
+
+    resolved = copy.deepcopy(ALERTMANAGER_PAYLOAD)
+    resolved["alerts"][0].update(status="resolved", endsAt="2025-03-20T00:40:00Z")
+    actual = sp.alerts_to_records(resolved, routes, history)
+    assert [(filepath, record.status) for filepath, record in actual] == [
+        ("ssh.log", "success")
+    ]
+
+
+def test_status_batcher():
+    """
+    Test StatusBatcher writes everything queued in one batch, in timestamp order
+    """
+    batches = []
+    batcher = sp.StatusBatcher(batches.append, interval=60)
+    batcher.add([("b.log", sp.StatusRecord(1.0, 20.0, "success"))])
+    batcher.add([("a.log", sp.StatusRecord(0.0, 10.0, "failed"))])
+    assert batcher.flush() == 2
+    assert batcher.flush() == 0
+
+    assert len(batches) == 1
+    assert [filepath for filepath, _record in batches[0]] == ["a.log", "b.log"]
+
+    # stop flushes anything left
+    batcher.start()
+    batcher.add([("a.log", sp.StatusRecord(1.0, 30.0, "success"))])
+    batcher.stop()
+    assert len(batches) == 2
+
+
+def test_shared_git_dir_submit(tmp_path: PosixPath):
+    """
+    Test SharedGitDir commits all spooled records once, by whichever process locks first
+    """
+    shared = sp.SharedGitDir(tmp_path / "clone", timeout=5)
+    commits, pushes = [], []
+
+    # records spooled by another process that has not got the lock yet
+    shared.spool([("b.log", sp.StatusRecord(0.0, 10.0, "failed"))])
+    assert shared.submit(
+        [("a.log", sp.StatusRecord(1.0, 20.0, "success"))],
+        commits.append,
+        lambda: pushes.append(True),
+    )
+    assert [[filepath for filepath, _record in batch] for batch in commits] == [
+        ["b.log", "a.log"]
+    ]
+    assert commits[0][0][1] == sp.StatusRecord(0.0, 10.0, "failed")
+    assert pushes == [True]
+    assert not list(shared.spool_dir.iterdir())
+
+    # processes waiting for the lock spool their records meanwhile; the first one to get
+    # the lock commits the records of both
+    commits.clear()
+    results = []
+
+    def submit(filepath: str):
+        waiter = sp.SharedGitDir(tmp_path / "clone", timeout=5, poll_interval=0.01)
+        record = sp.StatusRecord(2.0, 30.0, "success")
+        results.append(waiter.submit([(filepath, record)], commits.append))
+
+    with shared.lock():
+        waiters = [threading.Thread(target=submit, args=(f,)) for f in ("c", "d")]
+        for waiter in waiters:
+            waiter.start()
+        while len(list(shared.spool_dir.glob("*.json"))) < 2:
+            time.sleep(0.01)
+    for waiter in waiters:
+        waiter.join()
+
+    assert sorted(results) == [False, True]
+    assert len(commits) == 1
+    assert sorted(filepath for filepath, _record in commits[0]) == ["c", "d"]
+
+
+def test_shared_git_dir_lock_timeout(tmp_path: PosixPath):
+    """
+    Test SharedGitDir.lock gives up after its timeout while another holder has the lock
+    """
+    holder = sp.SharedGitDir(tmp_path / "clone")
+    waiter = sp.SharedGitDir(tmp_path / "clone", timeout=0.2, poll_interval=0.05)
+    with holder.lock():
+        with pytest.raises(sp.LockTimeout):
+            with waiter.lock():
+                pass
+    with waiter.lock():
+        pass
+
+
+def test_repo_maintainer(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test RepoMaintainer runs maintenance when due by interval or threshold, packing loose
+    objects, and reports repo health and step timings
+    """
+    clone_path = tmp_path / "cloned_repo"
+    backend = sp.GitPythonBackend()
+    backend.clone(str(repo_path), "main", str(clone_path))
+    for i in range(5):
+        sp.write_status_records(
+            backend,
+            str(clone_path),
+            [("test_report.log", sp.StatusRecord(1.0, 1742430572.0 + i, "success"))],
+        )
+
+    now = [1742430572.0]
+    maintainer = sp.RepoMaintainer(
+        sp.SharedGitDir(clone_path),
+        str(clone_path),
+        interval=3600,
+        max_loose_objects=1000,
+        clock=lambda: now[0],
+    )
+    health = sp.repo_health(str(clone_path))
+    assert health["count"] >= 15
+    assert maintainer.due(health) == ["interval"]
+
+    report = maintainer.run()
+    assert report["reasons"] == ["interval"]
+    assert list(report["seconds"]) == list(sp.RepoMaintainer.STEPS)
+    assert report["health_after"]["count"] == 0
+    assert report["health_after"]["packs"] >= 1
+    assert maintainer.last_report() == report
+
+    # not due again until the interval has passed, or a threshold is exceeded
+    now[0] += 60
+    assert maintainer.run() is None
+    maintainer.max_loose_objects = 0
+    sp.write_status_records(
+        backend,
+        str(clone_path),
+        [("test_report.log", sp.StatusRecord(1.0, 1742430600.0, "success"))],
+    )
+    assert maintainer.run()["reasons"] == ["loose objects"]
+
+
+def test_directory_sink(tmp_path: PosixPath):
+    """
+    Test DirectorySink appends records to logs and summaries under its root
+    """
+    sink = sp.DirectorySink(tmp_path / "www", summary=True)
+    changed = sink.write(
+        [
+            ("status/a.log", sp.StatusRecord(1.0, 1742430572.0, "success")),
+            ("status/a.log", sp.StatusRecord(0.0, 1742430632.0, "failed")),
+            ("b.log", sp.StatusRecord(1.0, 1742430572.0, "success")),
+        ]
+    )
+    assert changed == [
+        "b.log",
+        "b.summary.json",
+        "status/a.log",
+        "status/a.summary.json",
+    ]
+    assert (tmp_path / "www/status/a.log").read_text() == (
+        "2025-03-20T00:29:32Z, success, 1.0\n2025-03-20T00:30:32Z, failed, 0.0\n"
+    )
+    assert sink.log_files() == ["b.log", "status/a.log"]
+
+
+def test_directory_sink_partitioned(tmp_path: PosixPath):
+    """
+    Test DirectorySink with partitioning appends to monthly partitions and the manifest
+    """
+    sink = sp.DirectorySink(tmp_path, summary=True, partition=True)
+    changed = sink.write(
+        [
+            ("report.log", sp.StatusRecord(1.0, 1743465540.0, "success")),
+            ("report.log", sp.StatusRecord(0.0, 1743465600.0, "failed")),
+        ]
+    )
+    assert changed == [
+        "report.2025-03.log",
+        "report.2025-04.log",
+        "report.manifest.json",
+        "report.summary.json",
+    ]
+    assert not (tmp_path / "report.log").exists()
+    assert (tmp_path / "report.2025-04.log").read_text() == (
+        "2025-04-01T00:00:00Z, failed, 0.0\n"
+    )
+    assert sink.log_files() == ["report.2025-03.log", "report.2025-04.log"]
+    summary = json.loads((tmp_path / "report.summary.json").read_text())
+    assert sorted(summary["days"]) == ["2025-03-31", "2025-04-01"]
+
+
+def test_s3_sink(tmp_path: PosixPath):
+    """
+    Test S3Sink uploads each changed log whole, retrying failed uploads on the next write
+    """
+    boto3 = pytest.importorskip("boto3")
+    stub = pytest.importorskip("botocore.stub")
+
+    client = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    sink = sp.S3Sink("s3://status/public/", tmp_path / "staging", client=client)
+    line_1 = b"2025-03-20T00:29:32Z, success, 1.0\n"
+    line_2 = b"2025-03-20T00:30:32Z, failed, 0.0\n"
+
+    with stub.Stubber(client) as stubber:
+        stubber.add_client_error("put_object", http_status_code=503)
+        sink.write([("a.log", sp.StatusRecord(1.0, 1742430572.0, "success"))])
+        stubber.add_response(
+            "put_object",
+            {},
+            {
+                "Bucket": "status",
+                "Key": "public/a.log",
+                "Body": line_1 + line_2,
+                "ContentType": "text/plain",
+            },
+        )
+        sink.write([("a.log", sp.StatusRecord(0.0, 1742430632.0, "failed"))])
+        stubber.assert_no_pending_responses()
+
+
+def test_git_sink_snapshots(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test GitSink with a snapshot sink commits its logs at most once per snapshot interval
+    """
+    clone_path = tmp_path / "cloned_repo"
+    backend = sp.GitPythonBackend()
+    git_repo = backend.clone(str(repo_path), "main", str(clone_path))
+    initial_commits = len(list(git_repo.iter_commits()))
+
+    now = [1742430572.0]
+    dir_sink = sp.DirectorySink(tmp_path / "www")
+    git_sink = sp.GitSink(
+        backend,
+        str(clone_path),
+        snapshot_sink=dir_sink,
+        snapshot_interval=60,
+        clock=lambda: now[0],
+    )
+
+    def write(epoch_ts: float):
+        now[0] = epoch_ts
+        records = [("test_report.log", sp.StatusRecord(1.0, epoch_ts, "success"))]
+        for sink in (dir_sink, git_sink):
+            sink.write(records)
+
+    # the first write snapshots, the next is within the snapshot interval
+    write(1742430572.0)
+    write(1742430602.0)
+    assert len(list(git_repo.iter_commits())) == initial_commits + 1
+    assert "00:30:02Z" not in (clone_path / "test_report.log").read_text()
+
+    write(1742430632.0)
+    assert len(list(git_repo.iter_commits())) == initial_commits + 2
+    log = (clone_path / "test_report.log").read_text()
+    assert "00:30:02Z" in log and "00:30:32Z" in log
+    assert git_repo.head.commit.message.startswith(sp.AUTOMATED_COMMIT_PREFIX)
+
+    # nothing new to snapshot
+    assert git_sink.snapshot(force=True) == []
+
+
+def test_webhook_server(git_repo: Repo, repo_path: PosixPath):
+    """
+    Test the webhook server queues alertmanager and simple status updates, rejecting bad
+    requests, and that a batch lands in a single commit
+    """
+    routes = sp._alert_routes_adapter.validate_python(ALERT_ROUTES)
+    backend = sp.GitPythonBackend()
+    backend.git_repo, backend.git_branch = git_repo, "main"
+    batcher = sp.StatusBatcher(
+        lambda records: sp.write_status_records(backend, str(repo_path), records)
+    )
+    server = sp.make_webhook_server("127.0.0.1", 0, routes, batcher, "s3cret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    headers = {"Authorization": "Bearer s3cret"}
+
+    try:
+        response = sp.requests.post(
+            f"{url}/alertmanager", json=ALERTMANAGER_PAYLOAD, headers=headers
+        )
+        assert response.status_code == 202
+        assert response.json() == {"queued": 2}
+        # Alertmanager re-sends firing alerts every repeat_interval
+        response = sp.requests.post(
+            f"{url}/alertmanager", json=ALERTMANAGER_PAYLOAD, headers=headers
+        )
+        assert response.json() == {"queued": 0}
+
+        response = sp.requests.post(
+            f"{url}/status",
+            json={"filepath": "ssh.log", "status": "success", "epoch_ts": 1742430700},
+            headers=headers,
+        )
+        assert response.status_code == 202
+
+        # not a routed filepath, invalid status, unknown path, no token
+        for path, payload, auth, expected in [
+            ("/status", {"filepath": "../x", "status": "success"}, headers, 400),
+            ("/status", {"filepath": "ssh.log", "status": "bad"}, headers, 400),
+            ("/other", {}, headers, 404),
+            ("/status", {"filepath": "ssh.log", "status": "success"}, {}, 401),
+        ]:
+            response = sp.requests.post(f"{url}{path}", json=payload, headers=auth)
+            assert response.status_code == expected
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    commits_before = len(list(git_repo.iter_commits()))
+    assert batcher.flush() == 3
+    assert len(list(git_repo.iter_commits())) == commits_before + 1
+
+    with open(repo_path / "ssh.log") as f:
+        actual = f.read()
+    expected = (
+        "2025-03-20T00:29:32Z, failed, None\n" "2025-03-20T00:31:40Z, success, None\n"
+    )
+    assert actual == expected
+
+
+#### End-to-end CLI invocation tests ###
+
+
+def test_promq_cli(git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test promq() cli command method, mocking the Prometheus custom_query request,
+    and using our git repo fixture.
+    """
+    # get a temp dir for the cloned repo
+    clone_path = tmp_path / "cloned_repo"
+
+    # prepare to use the test fixture repo
+    repo_path_str = str(repo_path)
+    repo_branch_str = "main"
+    tmp_path_str = str(clone_path)
+
+    # mock prometheus api call vals
+    mock_url = "https://mock.prometheus.url.local"
+    mock_query = "avg( avg_over_time(foo{service=`bar`}[5m]))"
+    mock_return_val = [{"metric": {}, "value": [1729872285.678, "1"]}]
+
+    # mock env vars
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": tmp_path_str,
+        "STATUS_PUSHER_GIT_URL": repo_path_str,
+        "STATUS_PUSHER_PROMQ_URL": mock_url,
+        "STATUS_PUSHER_QUERY": mock_query,
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+        "STATUS_PUSHER_GIT_BRANCH": "main",
+    }
+    runner = CliRunner()
+
+    # mock prom connect; use our git fixture
+    with patch.dict(os.environ, os_environ, clear=True) as mock_env, patch.object(
+        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+    ) as mock_prom_qry:
+
+        cli_params = ["promq"]
+
+        status_record = sp.StatusRecord()
+
+        # invoke cli
+        actual_result = runner.invoke(
+            sp.cli, cli_params, obj=status_record, auto_envvar_prefix="STATUS_PUSHER"
+        )
+
+        print(actual_result.output)
+        pprint.pprint(mock_prom_qry.mock_calls)
+
+    # assert successful exit code
+    assert actual_result.exit_code == 0
+
+    # assert expected calls
+    mock_prom_qry.assert_called_with(query=mock_query)
+
+    # assert status record SUCCESS
+    assert status_record.status == "success"
+
+    # assert status value 1.0
+    assert status_record.value == 1.0
+
+    # TODO check our temporary git log file was updated
+
+
+def test_influxq_cli(
+    git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath, monkeypatch
+):
+    """
+    Test influxq() command method, mocking the http request and using our git repo fixture.
+    """
+    # get a temp dir for the cloned repo
+    clone_path = tmp_path / "cloned_repo"
+
+    # prepare to use the test fixture repo
+    repo_path_str = str(repo_path)
+    repo_branch_str = "main"
+    tmp_path_str = str(clone_path)
+
+    # mock influx api call vals
+    mock_db_name = "mockdb"
+    mock_query = 'SELECT last("foo") FROM "bar" LIMIT 1'
+    mock_url = "https://mock.influxdb.url.local"
+    mock_return_val = {
+        "results": [
+            {
+                "statement_id": 0,
+                "series": [
+                    {
+                        "name": "squeue",
+                        "columns": ["time", "last"],
+                        "values": [["2025-02-01T03:11:34Z", 1]],
+                    }
+                ],
+            }
+        ]
+    }
+
+    # mock env vars
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": tmp_path_str,
+        "STATUS_PUSHER_GIT_URL": repo_path_str,
+        "STATUS_PUSHER_INFLUXQ_URL": mock_url,
+        "STATUS_PUSHER_INFLUXQ_DB_NAME": mock_db_name,
+        "STATUS_PUSHER_QUERY": mock_query,
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+        "STATUS_PUSHER_GIT_BRANCH": "main",
+    }
+    runner = CliRunner()
+
+    # mock http req; use our git fixture
+    expected_uri = (
+        f"{mock_url}/query?q={urllib.parse.quote_plus(mock_query)}&db={mock_db_name}"
+    )
+
+    with patch.dict(
+        os.environ, os_environ, clear=True
+    ) as mock_env, requests_mock.Mocker() as req_mock:
+        req_mock.register_uri("GET", expected_uri, json=mock_return_val)
+
+        cli_params = ["influxq"]
+
+        status_record = sp.StatusRecord()
+
+        # invoke cli
+        actual_result = runner.invoke(
+            sp.cli, cli_params, obj=status_record, auto_envvar_prefix="STATUS_PUSHER"
+        )
+
+        # breakpoint()
+        # self.exception.request.__str__()
+
+        print(actual_result.output)
+
+    # assert successful exit code
+    assert actual_result.exit_code == 0
+
+    # assert status record SUCCESS
+    assert status_record.status == "success"
+
+    # assert status value 1.0
+    assert status_record.value == 1.0
+
+    # TODO check our temporary git log file was updated
+
+
+def test_fluxq_cli(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test fluxq() command, mocking the http request and using our git repo fixture
+    """
+    clone_path = tmp_path / "cloned_repo"
+    mock_url = "https://mock.influxdb.url.local"
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_FLUXQ_URL": mock_url,
+        "STATUS_PUSHER_FLUXQ_ORG": "myorg",
+        "STATUS_PUSHER_FLUXQ_TOKEN": "secret",
+        "STATUS_PUSHER_QUERY": 'from(bucket: "foo") |> range(start: -5m) |> last()',
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+        "STATUS_PUSHER_SUCCESS_VALUE": "0.5",
+    }
+    runner = CliRunner()
+
+    with patch.dict(os.environ, os_environ, clear=True), requests_mock.Mocker(
+        real_http=True
+    ) as req_mock:
+        req_mock.register_uri(
+            "POST", f"{mock_url}/api/v2/query?org=myorg", text=FLUX_CSV
+        )
+        status_record = sp.StatusRecord()
+        actual_result = runner.invoke(
+            sp.cli, ["fluxq"], obj=status_record, auto_envvar_prefix="STATUS_PUSHER"
+        )
+
+    assert actual_result.exit_code == 0, actual_result.output
+    assert status_record.status == "success"
+    assert status_record.value == 0.5
+    assert req_mock.last_request.headers["Authorization"] == "Token secret"
+
+
+def test_promq_cli_fleet_skips_unassigned_check(
+    repo_path: PosixPath, tmp_path: PosixPath
+):
+    """
+    Test that a fleet node exits cleanly without querying or cloning for a check
+    assigned to another node.
+    """
+    clone_path = tmp_path / "cloned_repo"
+    members = ["node-a", "node-b", "node-c"]
+    ring = sp.HashRing(members)
+    other_node = next(
+        node for node in members if ring.owners("test_report.log") != [node]
+    )
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_QUERY": "up",
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+        "STATUS_PUSHER_FLEET_NODE_ID": other_node,
+        "STATUS_PUSHER_FLEET_MEMBERS": ",".join(members),
+    }
+    runner = CliRunner()
+
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp.PrometheusConnect, "custom_query"
+    ) as mock_prom_qry:
+        actual_result = runner.invoke(
+            sp.cli, ["promq"], obj=sp.StatusRecord(), auto_envvar_prefix="STATUS_PUSHER"
+        )
+
+    assert actual_result.exit_code == 0
+    mock_prom_qry.assert_not_called()
+    assert not clone_path.exists()
+
+
+def test_promq_cli_dulwich_backend(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test promq() cli command with the in-process dulwich git backend
+    """
+    clone_path = tmp_path / "cloned_repo"
+    mock_return_val = [{"metric": {}, "value": [1742430572.0, "1"]}]
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_GIT_BACKEND": "dulwich",
+        "STATUS_PUSHER_QUERY": "up",
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+    }
+    runner = CliRunner()
+
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+    ), patch.object(
+        sp.DulwichBackend, "close", autospec=True, side_effect=sp.DulwichBackend.close
+    ) as mock_close:
+        actual_result = runner.invoke(
+            sp.cli, ["promq"], obj=sp.StatusRecord(), auto_envvar_prefix="STATUS_PUSHER"
+        )
+
+    assert actual_result.exit_code == 0
+    # the repo is closed once the record is committed
+    mock_close.assert_called_once()
+    assert mock_close.call_args.args[0].repo is None
+    cloned_repo = Repo(clone_path)
+    assert "2025-03-20T00:29:32Z, success, 1.0" in cloned_repo.git.show(
+        "HEAD:test_report.log"
+    )
+
+
+def test_promq_cli_git_snapshots(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test promq() with --sink-dir writes every update to the directory, while only
+    committing snapshots to git every --git-snapshot-interval
+    """
+    clone_path = tmp_path / "cloned_repo"
+    sink_path = tmp_path / "www"
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_SINK_DIR": str(sink_path),
+        "STATUS_PUSHER_GIT_SNAPSHOT_INTERVAL": "3600",
+        "STATUS_PUSHER_QUERY": "up",
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+    }
+    runner = CliRunner()
+
+    for epoch_ts in (1742430572.0, 1742430632.0):
+        mock_return_val = [{"metric": {}, "value": [epoch_ts, "1"]}]
+        with patch.dict(os.environ, os_environ, clear=True), patch.object(
+            sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+        ):
+            actual_result = runner.invoke(
+                sp.cli,
+                ["promq"],
+                obj=sp.StatusRecord(),
+                auto_envvar_prefix="STATUS_PUSHER",
+            )
+        assert actual_result.exit_code == 0, actual_result.output
+
+    assert (sink_path / "test_report.log").read_text() == (
+        "2025-03-20T00:29:32Z, success, 1.0\n2025-03-20T00:30:32Z, success, 1.0\n"
+    )
+    git_log = Repo(clone_path).git.show("HEAD:test_report.log")
+    assert "2025-03-20T00:29:32Z, success, 1.0" in git_log
+    assert "2025-03-20T00:30:32Z" not in git_log
+
+
+def test_backfill_cli(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test backfill() cli command merges all samples from one range query in a single commit
+    """
+    clone_path = tmp_path / "cloned_repo"
+    # 2024-11-23T01:28:40Z, 01:33:40Z, 01:38:40Z
+    mock_return_val = [
+        {
+            "metric": {},
+            "values": [[1732325320.0, "1"], [1732325620.0, "0"], [1732325920.0, "1"]],
+        }
+    ]
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_QUERY": "up",
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+    }
+    runner = CliRunner()
+    cli_params = [
+        "--summary",
+        "backfill",
+        "--since",
+        "2024-11-22 00:00:00",
+        "--until",
+        "2024-11-24 00:00:00",
+    ]
+
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp.PrometheusConnect, "custom_query_range", return_value=mock_return_val
+    ) as mock_prom_qry:
+        actual_result = runner.invoke(
+            sp.cli,
+            cli_params,
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+
+    assert actual_result.exit_code == 0
+    mock_prom_qry.assert_called_once()
+
+    cloned_repo = Repo(clone_path)
+    assert cloned_repo.head.commit.message.startswith("[automated] backfill")
+    # the fixture's two commits plus a single backfill commit
+    assert len(list(cloned_repo.iter_commits())) == 3
+
+    expected = (
+        "2024-11-23T01:23:40Z, success, 1.0\n"
+        "2024-11-23T01:28:40Z, success, 1.0\n"
+        "2024-11-23T01:33:40Z, failed, 0.0\n"
+        "2024-11-23T01:38:40Z, success, 1.0\n"
+    )
+    assert cloned_repo.git.show("HEAD:test_report.log") + "\n" == expected
+    summary = json.loads(cloned_repo.git.show("HEAD:test_report.summary.json"))
+    assert summary["days"]["2024-11-23"]["uptime"] == 75.0
+
+
+def test_schedule_cli(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test schedule() cli command runs configured checks and commits their results
+    """
+    clone_path = tmp_path / "cloned_repo"
+    checks_path = tmp_path / "checks.json"
+    checks_path.write_text(
+        json.dumps(
+            [
+                {"name": "a", "query": "a", "filepath": "a.log", "interval": 0.2},
+                {"name": "b", "query": "b", "filepath": "b.log", "interval": 0.2},
+            ]
+        )
+    )
+    mock_return_val = [{"metric": {}, "value": [1742430572.0, "1"]}]
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+    }
+    runner = CliRunner()
+    cli_params = ["schedule", "--checks", str(checks_path), "--duration", "0.5"]
+
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+    ):
+        actual_result = runner.invoke(
+            sp.cli,
+            cli_params,
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+
+    assert actual_result.exit_code == 0
+    for filepath in ("a.log", "b.log"):
+        assert "2025-03-20T00:29:32Z, success, 1.0" in Repo(clone_path).git.show(
+            f"HEAD:{filepath}"
+        )
+
+
+def test_schedule_cli_submit_fails(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test schedule() keeps running checks when submitting their results fails
+    """
+    checks_path = tmp_path / "checks.json"
+    checks_path.write_text(
+        json.dumps([{"name": "a", "query": "a", "filepath": "a.log", "interval": 0.1}])
+    )
+    mock_return_val = [{"metric": {}, "value": [1742430572.0, "1"]}]
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "cloned_repo"),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+    }
+    runner = CliRunner()
+    cli_params = ["schedule", "--checks", str(checks_path), "--duration", "0.5"]
+
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+    ), patch.object(
+        sp.ShardRouter, "submit", side_effect=git.exc.GitCommandError("push", 1)
+    ) as mock_submit:
+        actual_result = runner.invoke(
+            sp.cli,
+            cli_params,
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+
+    assert actual_result.exit_code == 0, actual_result.output
+    assert mock_submit.call_count > 1
+
+
+def test_simulate_cli(tmp_path: PosixPath):
+    """
+    Test simulate() prints a JSON report, without needing a --git-url
+    """
+    checks_file = tmp_path / "checks.json"
+    checks_file.write_text(
+        json.dumps(
+            [{"name": "web", "query": "up", "filepath": "web.log", "interval": 60}]
+        )
+    )
+    runner = CliRunner()
+    actual_result = runner.invoke(
+        sp.cli,
+        ["simulate", "--checks", str(checks_file), "--duration", "300"],
+        obj=sp.StatusRecord(),
+    )
+
+    assert actual_result.exit_code == 0, actual_result.output
+    report = json.loads(actual_result.output)
+    assert report["runs"] == report["commits"] > 0
+
+
+def test_serve_cli_sigterm(git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test serve() writes, commits and pushes updates it already accepted when stopped with
+    SIGTERM, before the batch interval has passed
+    """
+    # see test_push for why the remote needs another branch checked out
+    git_repo.git.checkout("-b", "temp_branch")
+    routes_path = tmp_path / "routes.json"
+    routes_path.write_text(json.dumps(ALERT_ROUTES))
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    def post_and_stop():
+        url = f"http://127.0.0.1:{port}/status"
+        for _attempt in range(50):
+            try:
+                response = sp.requests.post(
+                    url, json={"filepath": "ssh.log", "status": "failed"}
+                )
+                break
+            except sp.requests.ConnectionError:
+                time.sleep(0.1)
+        assert response.status_code == 202
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "cloned_repo"),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_GIT_PUSH_URL": str(repo_path),
+    }
+    runner = CliRunner()
+    client = threading.Thread(target=post_and_stop)
+    with patch.dict(os.environ, os_environ, clear=True):
+        client.start()
+        actual_result = runner.invoke(
+            sp.cli,
+            [
+                "serve",
+                "--routes",
+                str(routes_path),
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--batch-interval",
+                "60",
+            ],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+    client.join()
+
+    assert actual_result.exit_code == 0, actual_result.output
+    assert ", failed, None" in git_repo.git.show("main:ssh.log")
+
+
+def test_maintain_cli(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test maintain() maintains the clone once, and then only reports its health
+    """
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "cloned_repo"),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+    }
+    runner = CliRunner()
+
+    reports = []
+    for _run in range(2):
+        with patch.dict(os.environ, os_environ, clear=True):
+            actual_result = runner.invoke(
+                sp.cli,
+                ["maintain"],
+                obj=sp.StatusRecord(),
+                auto_envvar_prefix="STATUS_PUSHER",
+            )
+        assert actual_result.exit_code == 0, actual_result.output
+        reports.append(json.loads(actual_result.output))
+
+    assert reports[0]["reasons"] == ["interval"]
+    assert "repack" in reports[0]["seconds"]
+    assert reports[1]["reasons"] == []
+    assert reports[1]["last_run"] == reports[0]
+
+
+def test_maintain_cli_shards(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test maintain() also maintains the clone of every configured shard
+    """
+    shards_path = tmp_path / "shards.json"
+    shards_path.write_text(
+        json.dumps([{"name": "a", "match": ["team-a/*"], "git_branch": "status-a"}])
+    )
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "cloned_repo"),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+    }
+    runner = CliRunner()
+    with patch.dict(os.environ, os_environ, clear=True):
+        actual_result = runner.invoke(
+            sp.cli,
+            ["--shards", str(shards_path), "maintain"],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+    assert actual_result.exit_code == 0, actual_result.output
+    report = json.loads(actual_result.output)
+
+    assert report["reasons"] == ["interval"]
+    assert report["shards"]["a"]["reasons"] == ["interval"]
+    assert (tmp_path / "cloned_repo.shards" / "a.maintenance").exists()
+
+
+def test_shard_router_routes(tmp_path: PosixPath):
+    """
+    Test load_shards validates shards, and ShardRouter routes status files to the first
+    matching shard, filling in the repo and branch shards leave to the default shard
+    """
+    shards_path = tmp_path / "shards.json"
+    shards_path.write_text(
+        json.dumps(
+            [
+                {"name": "team-a", "match": ["team-a/*"], "git_branch": "status-a"},
+                {"name": "other", "match": ["*.log"], "git_url": "http://other/repo"},
+            ]
+        )
+    )
+    shards = sp.load_shards(str(shards_path))
+    default = sp.ShardConfig("default", ["*"], "http://repo", "main", "http://push")
+    router = sp.ShardRouter(default, shards, open_shard=None)
+
+    team_a = router.shard_for("team-a/ssh.log")
+    assert team_a.name == "team-a"
+    assert (team_a.git_url, team_a.git_branch) == ("http://repo", "status-a")
+    assert team_a.git_push_url == "http://push"
+    # a partition belongs to the shard of its log
+    assert router.shard_for("team-a/ssh.2025-03.log") is team_a
+
+    other = router.shard_for("ssh.log")
+    assert (other.git_url, other.git_branch) == ("http://other/repo", "main")
+    # the push url of the default repo is not used for another repo
+    assert other.git_push_url is None
+    assert router.shard_for("ssh.txt") is default
+
+    # shards opened while maintenance runs are maintained too
+    open_shards = {}
+
+    def open_shard(shard, _owns):
+        open_shards[shard.name] = MagicMock()
+        open_shards[shard.name].open.return_value = open_shards[shard.name]
+        return open_shards[shard.name]
+
+    router = sp.ShardRouter(default, shards, open_shard)
+    router.get(team_a)
+    router.start_maintenance()
+    router.get(other)
+    router.get(other)
+    router.stop_maintenance()
+    for shard in open_shards.values():
+        shard.maintainer.start.assert_called_once_with()
+        shard.maintainer.stop.assert_called_once_with()
+
+    for invalid in (
+        [{"name": "default", "match": ["*"], "git_branch": "b"}],
+        [{"name": "../a", "match": ["*"], "git_branch": "b"}],
+        [{"name": "a", "match": ["*"]}],
+    ):
+        shards_path.write_text(json.dumps(invalid))
+        with pytest.raises(ValueError):
+            sp.load_shards(str(shards_path))
+
+
+def test_shards_submit_and_publish(
+    git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath
+):
+    """
+    Test records of different shards are committed and pushed to their own branches, and
+    publish() then merges them into the default branch
+    """
+    # see test_push for why the remote needs another branch checked out
+    git_repo.git.checkout("-b", "temp_branch")
+    clone_path = tmp_path / "cloned_repo"
+    shards_path = tmp_path / "shards.json"
+    shards_path.write_text(
+        json.dumps(
+            [
+                {"name": "a", "match": ["team-a/*"], "git_branch": "status-a"},
+                {"name": "b", "match": ["team-b/*"], "git_branch": "status-b"},
+            ]
+        )
+    )
+    checks_path = tmp_path / "checks.json"
+    checks_path.write_text(
+        json.dumps(
+            [
+                {"name": name, "query": name, "filepath": name, "interval": 0.2}
+                for name in ("team-a/ssh.log", "team-b/ssh.log", "main.log")
+            ]
+        )
+    )
+    mock_return_val = [{"metric": {}, "value": [1742430572.0, "1"]}]
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_GIT_PUSH_URL": str(repo_path),
+    }
+    runner = CliRunner()
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp.PrometheusConnect, "custom_query", return_value=mock_return_val
+    ):
+        actual_result = runner.invoke(
+            sp.cli,
+            [
+                "--shards",
+                str(shards_path),
+                "schedule",
+                "--checks",
+                str(checks_path),
+                "--duration",
+                "0.3",
+            ],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+        assert actual_result.exit_code == 0, actual_result.output
+
+        expected = "2025-03-20T00:29:32Z, success, 1.0"
+        assert expected in git_repo.git.show("status-a:team-a/ssh.log")
+        assert expected in git_repo.git.show("status-b:team-b/ssh.log")
+        assert expected in git_repo.git.show("main:main.log")
+        assert "team-a/ssh.log" not in git_repo.git.ls_tree("-r", "main")
+        assert "team-b/ssh.log" not in git_repo.git.ls_tree("status-a")
+        assert (tmp_path / "cloned_repo.shards" / "a" / ".git").is_dir()
+        assert (tmp_path / "cloned_repo.shards" / "a.lock").exists()
+
+        actual_result = runner.invoke(
+            sp.cli,
+            ["--shards", str(shards_path), "publish"],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+        assert actual_result.exit_code == 0, actual_result.output
+        assert json.loads(actual_result.output) == ["team-a/ssh.log", "team-b/ssh.log"]
+        for filepath in ("team-a/ssh.log", "team-b/ssh.log"):
+            assert expected in git_repo.git.show(f"main:{filepath}")
+
+        # nothing new to publish the second time
+        actual_result = runner.invoke(
+            sp.cli,
+            ["--shards", str(shards_path), "publish"],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+        assert json.loads(actual_result.output) == []
+
+
+def test_promq_cli_requires_query(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test promq() cli command fails without --query
+    """
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "cloned_repo"),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+    }
+    runner = CliRunner()
+    with patch.dict(os.environ, os_environ, clear=True):
+        actual_result = runner.invoke(
+            sp.cli, ["promq"], obj=sp.StatusRecord(), auto_envvar_prefix="STATUS_PUSHER"
+        )
+    assert actual_result.exit_code == 2
+    assert "--query" in actual_result.output
+
+
+def test_promq_cli_replicas(repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test promq() cli command accepts several replica urls
+    """
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "cloned_repo"),
+        "STATUS_PUSHER_GIT_URL": str(repo_path),
+        "STATUS_PUSHER_QUERY": "up",
+        "STATUS_PUSHER_FILEPATH": "test_report.log",
+        "STATUS_PUSHER_PROMQ_URL": "https://prom-a.local https://prom-b.local",
+    }
+    mock_return_val = [{"metric": {}, "value": [1742430572.0, "1"]}]
+    runner = CliRunner()
+    status_record = sp.StatusRecord()
+
+    with patch.dict(os.environ, os_environ, clear=True), patch.object(
+        sp, "PrometheusConnect"
+    ) as mock_prom:
+        mock_prom.return_value.custom_query.return_value = mock_return_val
+        actual_result = runner.invoke(
+            sp.cli, ["promq"], obj=status_record, auto_envvar_prefix="STATUS_PUSHER"
+        )
+
+    assert actual_result.exit_code == 0
+    assert status_record.status == "success"
+    queried_urls = {call.kwargs["url"] for call in mock_prom.call_args_list}
+    assert queried_urls <= {"https://prom-a.local", "https://prom-b.local"}
+
+
+def test_squash_cli(git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath):
+    """
+    Test squash() cli command force pushes squashed history to a remote, and that a
+    checker clone with the old history then pushes without bringing it back
+    """
+    make_automated_history(git_repo, repo_path, days=3, per_day=5)
+    remote_path = tmp_path / "remote.git"
+    Repo.clone_from(str(repo_path), str(remote_path), bare=True)
+
+    # a checker with a clone of the unsquashed history
+    checker_path = tmp_path / "checker_repo"
+    checker_repo = sp.git_clone(str(remote_path), "main", str(checker_path))
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(tmp_path / "squash_repo"),
+        "STATUS_PUSHER_GIT_URL": str(remote_path),
+        "STATUS_PUSHER_GIT_PUSH_URL": str(remote_path),
+    }
+    runner = CliRunner()
+    with patch.dict(os.environ, os_environ, clear=True):
+        actual_result = runner.invoke(
+            sp.cli,
+            ["squash", "--older-than-days", "1"],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+    assert actual_result.exit_code == 0
+
+    remote_repo = Repo(remote_path)
+    assert len(list(remote_repo.iter_commits("main"))) == 2 + 3
+
+    # the checker's next measurement lands on top of the squashed history
+    sp.update_log_file(checker_path / "test_report.log", time.time(), 1.0, "success")
+    sp.commit(checker_repo, "main", [str(checker_path / "test_report.log")])
+    sp.push(checker_repo, "main", str(remote_path))
+
+    commits = list(remote_repo.iter_commits("main"))
+    assert len(commits) == 2 + 3 + 1
+    assert commits[1].message.startswith("[automated] squash 5")
+    assert commits[0].tree == checker_repo.head.commit.tree
+
+
+def test_squash_cli_long_lived_clone(
+    git_repo: Repo, repo_path: PosixPath, tmp_path: PosixPath
+):
+    """
+    Test squash() on a shallow --git-dir clone, as left by git_clone pulling with a depth,
+    keeps the history beyond the depth, and pushes a commit of the clone that had not been
+    pushed on top of the squashed history
+    """
+    make_automated_history(git_repo, repo_path, days=3, per_day=10)
+    remote_path = tmp_path / "remote.git"
+    Repo.clone_from(str(repo_path), str(remote_path), bare=True)
+
+    clone_path = tmp_path / "cloned_repo"
+    sp.git_clone(str(remote_path), "main", str(clone_path))
+    clone_repo = sp.git_clone(str(remote_path), "main", str(clone_path))
+    assert sp.is_shallow(clone_repo)
+
+    # a record whose push failed
+    sp.update_log_file(clone_path / "test_report.log", time.time(), 1.0, "success")
+    unpushed = sp.commit(clone_repo, "main", [str(clone_path / "test_report.log")])
+
+    os_environ = {
+        "STATUS_PUSHER_GIT_DIR": str(clone_path),
+        "STATUS_PUSHER_GIT_URL": str(remote_path),
+        "STATUS_PUSHER_GIT_PUSH_URL": str(remote_path),
+    }
+    runner = CliRunner()
+    with patch.dict(os.environ, os_environ, clear=True):
+        actual_result = runner.invoke(
+            sp.cli,
+            ["squash", "--older-than-days", "1"],
+            obj=sp.StatusRecord(),
+            auto_envvar_prefix="STATUS_PUSHER",
+        )
+    assert actual_result.exit_code == 0, actual_result.output
+
+    commits = list(Repo(remote_path).iter_commits("main"))
+    # 2 fixture commits, 3 squashed days and the unpushed commit
+    assert len(commits) == 2 + 3 + 1
+    assert all(
+        commit.message.startswith("[automated] squash 10 health report updates")
+        for commit in commits[1:4]
+    )
+    assert commits[0].tree == unpushed.tree
+    assert commits[0].hexsha == Repo(clone_path).head.commit.hexsha
+
+    # a shallow clone is never squashed
+    clone_repo.git.fetch("--depth=2", "origin")
+    with pytest.raises(ValueError):
+        sp.squash_history(clone_repo, "HEAD", datetime.datetime.now())
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""
+Benchmark the validated pydantic StatusRecord against the compact record types used on
+high volume paths (CompactStatusRecord and StatusRecordBatch), printing timings and sizes
+on stdout.
+"""
+
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import status_pusher as sp  # noqa: E402
+
+N_RECORDS = 10000
+REPEAT = 5
+
+ROWS = [(float(i % 2), 1742430572.0 + 60 * i, "success") for i in range(N_RECORDS)]
+
+
+def build_status_records():
+    """one validated pydantic StatusRecord per row"""
+    return [
+        sp.StatusRecord(value, epoch_ts, status) for value, epoch_ts, status in ROWS
+    ]
+
+
+def build_compact_records():
+    """one unvalidated slotted CompactStatusRecord per row"""
+    return [
+        sp.CompactStatusRecord(value, epoch_ts, status)
+        for value, epoch_ts, status in ROWS
+    ]
+
+
+def build_batch():
+    """a single StatusRecordBatch, validated once in bulk"""
+    return sp.StatusRecordBatch.from_rows(ROWS)
+
+
+def allocated_bytes(build) -> int:
+    """bytes still allocated after building and holding the result"""
+    tracemalloc.start()
+    result = build()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+if __name__ == "__main__":
+    print(f"{N_RECORDS} records, best of {REPEAT}")
+    for build in (build_status_records, build_compact_records, build_batch):
+        seconds = min(timeit.repeat(build, number=1, repeat=REPEAT))
+        print(
+            f"{build.__name__:24} {seconds * 1e3:9.2f} ms "
+            f"{allocated_bytes(build) / 1024:9.1f} KiB"
+        )